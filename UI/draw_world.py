@@ -3,12 +3,17 @@
 Class to print the state of the world
 """
 
+from concurrent.futures import ProcessPoolExecutor
 from enum import IntEnum
+import itertools
 import math
+from types import SimpleNamespace
 import matplotlib.pyplot as plt
 import matplotlib.lines as lines
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 from matplotlib.patches import RegularPolygon, Rectangle
 from celluloid import Camera
+from PIL import Image
 
 
 ROBOT_HOME = (2, 7.5)
@@ -309,6 +314,14 @@ class WorldUI:
         self.text_ax.plot()
 
 
+    def get_variable_artists(self):
+        """
+        Returns the artists that change with the world state.
+        """
+        return [self.var_map[MapVars.ROBOT_OBJ], self.var_map[MapVars.ROBOT_LABLE]] + \
+            self.var_map[MapVars.LIGHT_OBJ] + self.var_map[MapVars.HEAVY_OBJ] + self.var_tab
+
+
     def save_world(self, name):
         """
         Save the world with added patches to file.
@@ -325,7 +338,7 @@ class WorldUI:
         Save an animated gif of the world, one frame per tick
         """
         animation = self.camera.animate()
-        animation.save(path, writer='imagemagick')
+        animation.save(path, writer='pillow')
 
 
     def animate_state(self, world_state):
@@ -444,3 +457,77 @@ class WorldUI:
         self.map_ax.plot()
         self.text_ax.plot()
         self.camera.snap()
+
+
+def get_record_state(record):
+    """
+    Returns a record of a trace_recorder trace as an object with the fields of a world state.
+    """
+    values = {name: record[name].item() for name in record.dtype.names}
+    robot_pos = SimpleNamespace(x=values.pop('robot_x'), y=values.pop('robot_y'))
+    return SimpleNamespace(robot_pos=robot_pos, **values)
+
+
+def iterate_frames(trace):
+    """
+    Yields one palette image for each record of a trace.
+    The static map is drawn once, each frame restores it and draws only the variable artists on top.
+    All frames share the palette of a frame with every item shown, so that colors are only looked up.
+    """
+    world = WorldUI()
+    artists = world.get_variable_artists()
+    for artist in artists:
+        artist.set_animated(True)
+    world.map_ax.plot()
+    world.text_ax.plot()
+    canvas = FigureCanvasAgg(world.figure)
+    canvas.draw()
+    background = canvas.copy_from_bbox(world.figure.bbox)
+
+    def draw_frame():
+        canvas.restore_region(background)
+        for artist in artists:
+            world.figure.draw_artist(artist)
+        frame = Image.frombuffer('RGBA', canvas.get_width_height(), canvas.buffer_rgba(), 'raw', 'RGBA', 0, 1)
+        return frame.convert('RGB')
+
+    try:
+        world.update_items(MAX_ITEMS, MAX_ITEMS)
+        palette = draw_frame().quantize()
+        for record in trace:
+            world.add_state(get_record_state(record))
+            yield draw_frame().quantize(palette=palette, dither=Image.Dither.NONE)
+    finally:
+        plt.close(world.figure)
+
+
+def render_frames(trace):
+    """
+    Returns the frames of a trace as a list, for rendering in other processes.
+    """
+    return list(iterate_frames(trace))
+
+
+def render_trace(trace, path='./animation.gif', fps=5, workers=1, chunk_size=50):
+    """
+    Save an animation of a trace from trace_recorder, one frame per record.
+    The file is written by Pillow in the format of the extension, like gif, webp or png.
+    With several workers, chunks of chunk_size records are rendered in parallel processes.
+    Nothing is saved for an empty trace.
+    """
+    if workers > 1 and len(trace) > chunk_size:
+        chunks = [trace[i:i + chunk_size] for i in range(0, len(trace), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            save_frames(itertools.chain.from_iterable(executor.map(render_frames, chunks)), path, fps)
+    else:
+        save_frames(iterate_frames(trace), path, fps)
+
+
+def save_frames(frames, path, fps=5):
+    """
+    Save an iterable of images as an animation with Pillow, without keeping all frames in memory.
+    """
+    frames = iter(frames)
+    first = next(frames, None)
+    if first is not None:
+        first.save(path, save_all=True, append_images=frames, duration=round(1000 / fps), loop=0, optimize=False)
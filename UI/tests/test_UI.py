@@ -2,8 +2,11 @@
 """
 Test routines for the UI
 """
+import numpy as np
+from PIL import Image
 import UI.draw_world as ui
 import simulation.conveyor_kitting as simulation
+import simulation.trace_recorder as trace_recorder
 
 def test_object():
     """
@@ -123,3 +126,29 @@ def test_animate():
     state.cnv_n_heavy = 1
     world.animate_state(state)
     world.animate(path='UI/tests/animation.gif')
+
+def test_render_trace():
+    """
+    Test rendering an animation from a recorded trace, serially and in parallel.
+    """
+    trace = np.zeros(3, dtype=trace_recorder.TRACE_DTYPE)
+    trace['tick'] = [1, 2, 3]
+    trace['robot_x'] = [23, 21, 12]
+    trace['robot_y'] = [12, 7.5, 3]
+    trace['cnv_n_light'] = [3, 1, 0]
+    trace['cnv_n_heavy'] = [4, 1, 10]
+
+    state = ui.get_record_state(trace[1])
+    assert state.tick == 2
+    assert (state.robot_pos.x, state.robot_pos.y) == (21, 7.5)
+    assert state.cnv_n_light == 1
+
+    ui.render_trace(trace, path='UI/tests/trace.gif')
+    ui.render_trace(trace, path='UI/tests/trace_parallel.gif', workers=2, chunk_size=2)
+    with Image.open('UI/tests/trace.gif') as serial, Image.open('UI/tests/trace_parallel.gif') as parallel:
+        assert serial.n_frames == 3
+        assert parallel.n_frames == 3
+        for frame in range(3):
+            serial.seek(frame)
+            parallel.seek(frame)
+            assert np.array_equal(np.asarray(serial.convert('RGB')), np.asarray(parallel.convert('RGB')))
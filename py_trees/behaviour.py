@@ -57,7 +57,15 @@ class Behaviour(object):
        * :ref:`The Lifecycle Demo <py-trees-demo-behaviour-lifecycle-program>`
        * :ref:`The Action Behaviour Demo <py-trees-demo-action-behaviour-program>`
 
+    .. note::
+
+       The id, logger and blackboards are only created when first accessed, since most
+       behaviours in short lived trees never use them.
+
     """
+    __slots__ = ('_id', 'name', '_blackboards', 'qualified_name', 'status', '_iterator', 'parent', 'children',
+                 '_logger', 'feedback_message', 'blackbox_level', '__weakref__')
+
     def __init__(
         self,
         name: typing.Union[str, common.Name]=common.Name.AUTO_GENERATED
@@ -66,18 +74,61 @@ class Behaviour(object):
             name = self.__class__.__name__
         if not isinstance(name, str):
             raise TypeError("a behaviour name should be a string, but you passed in {}".format(type(name)))
-        self.id = uuid.uuid4()  # used to uniquely identify this node (helps with removing children from a tree)
+        self._id = None  # created on first access, see id
         self.name: str = name
-        self.blackboards: typing.List[blackboard.Client] = []
+        self._blackboards = None  # created on first access, see blackboards
         self.qualified_name = "{}/{}".format(self.__class__.__qualname__, self.name)  # convenience
         self.status = common.Status.INVALID
-        self.iterator = self.tick()
+        self._iterator = None  # created on first access, see iterator
         self.parent: typing.Optional[Behaviour] = None  # will get set if a behaviour is added to a composite
         self.children: typing.List[Behaviour] = []  # only set by composite behaviours
-        self.logger = logging.Logger(name)
+        self._logger = None  # created on first access, see logger
         self.feedback_message = ""  # useful for debugging, or human readable updates, but not necessary to implement
         self.blackbox_level = common.BlackBoxLevel.NOT_A_BLACKBOX
 
+    ############################################
+    # Lazily Created Attributes
+    ############################################
+
+    @property
+    def id(self) -> uuid.UUID:
+        """
+        Unique identifier of the behaviour, used e.g. when removing children from a tree.
+        """
+        if self._id is None:
+            self._id = uuid.uuid4()
+        return self._id
+
+    @id.setter
+    def id(self, value: uuid.UUID):
+        self._id = value
+
+    @property
+    def logger(self) -> logging.Logger:
+        """
+        Logger prefixing messages with the name of the behaviour.
+        """
+        if self._logger is None:
+            self._logger = logging.Logger(self.name)
+        return self._logger
+
+    @logger.setter
+    def logger(self, value: logging.Logger):
+        self._logger = value
+
+    @property
+    def blackboards(self) -> typing.List[blackboard.Client]:
+        """
+        Blackboard clients attached to the behaviour.
+        """
+        if self._blackboards is None:
+            self._blackboards = []
+        return self._blackboards
+
+    @blackboards.setter
+    def blackboards(self, value: typing.List[blackboard.Client]):
+        self._blackboards = value
+
     ############################################
     # User Customisable Callbacks
     ############################################
@@ -267,12 +318,13 @@ class Behaviour(object):
         .. warning:: Override this method only in exceptional circumstances, prefer overriding :meth:`~py_trees.behaviour.Behaviour.update` instead.
 
         """
-        self.logger.debug("%s.tick()" % (self.__class__.__name__))
+        if logging.level < logging.Level.INFO:
+            self.logger.debug("%s.tick()" % (self.__class__.__name__))
         if self.status != common.Status.RUNNING:
             self.initialise()
         # don't set self.status yet, terminate() may need to check what the current state is first
         new_status = self.update()
-        if new_status not in list(common.Status):
+        if new_status not in common.VALID_STATUSES:
             self.logger.error("A behaviour returned an invalid status, setting to INVALID [%s][%s]" % (new_status, self.name))
             new_status = common.Status.INVALID
         if new_status != common.Status.RUNNING:
@@ -280,6 +332,35 @@ class Behaviour(object):
         self.status = new_status
         yield self
 
+    def tick_direct(self):
+        """
+        Tick this behaviour and its children with plain recursive calls instead of the
+        generator mechanism of :meth:`~py_trees.behaviour.Behaviour.tick`. Statuses end up
+        exactly the same as with :meth:`~py_trees.behaviour.Behaviour.tick_once`, but
+        the traversed nodes are not yielded, so visitors cannot be run on them.
+
+        Behaviours overriding :meth:`~py_trees.behaviour.Behaviour.tick` without also
+        overriding this method are ticked through their generator.
+
+        Returns:
+            :class:`~py_trees.common.Status`: the new status of the behaviour
+        """
+        if type(self).tick is not Behaviour.tick:
+            self.tick_once()
+            return self.status
+        if logging.level < logging.Level.INFO:
+            self.logger.debug("%s.tick_direct()" % (self.__class__.__name__))
+        if self.status != common.Status.RUNNING:
+            self.initialise()
+        new_status = self.update()
+        if new_status not in common.VALID_STATUSES:
+            self.logger.error("A behaviour returned an invalid status, setting to INVALID [%s][%s]" % (new_status, self.name))
+            new_status = common.Status.INVALID
+        if new_status != common.Status.RUNNING:
+            self.stop(new_status)
+        self.status = new_status
+        return new_status
+
     def iterate(self, direct_descendants=False):
         """
         Generator that provides iteration over this behaviour and all its children.
@@ -325,10 +406,26 @@ class Behaviour(object):
 
         .. warning:: Override this method only in exceptional circumstances, prefer overriding :meth:`~py_trees.behaviour.Behaviour.terminate` instead.
         """
-        self.logger.debug("%s.stop(%s)" % (self.__class__.__name__, "%s->%s" % (self.status, new_status) if self.status != new_status else "%s" % new_status))
+        if logging.level < logging.Level.INFO:
+            self.logger.debug("%s.stop(%s)" % (self.__class__.__name__, "%s->%s" % (self.status, new_status) if self.status != new_status else "%s" % new_status))
         self.terminate(new_status)
         self.status = new_status
-        self.iterator = self.tick()
+        self._iterator = None
+
+    @property
+    def iterator(self):
+        """
+        A generator ticking this behaviour, see :meth:`~py_trees.behaviour.Behaviour.tick`.
+        It is reset by :meth:`~py_trees.behaviour.Behaviour.stop` and only created when
+        accessed, so that stopping does not have to build a generator every time.
+        """
+        if self._iterator is None:
+            self._iterator = self.tick()
+        return self._iterator
+
+    @iterator.setter
+    def iterator(self, iterator):
+        self._iterator = iterator
 
     ############################################
     # Public - introspection API
@@ -45,6 +45,10 @@ class Status(enum.Enum):
     """Behaviour is uninitialised and inactive, i.e. this is the status before first entry, and after a higher priority switch has occurred."""
 
 
+VALID_STATUSES = frozenset(Status)
+"""All statuses, for validating the status returned by a behaviour without building a list on every tick."""
+
+
 class Duration(enum.Enum):
     """
     Naming conventions.
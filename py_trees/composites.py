@@ -62,6 +62,7 @@ import typing
 
 from py_trees import behaviour
 from py_trees import common
+from py_trees import logging
 
 ##############################################################################
 # Composites
@@ -77,17 +78,20 @@ class Composite(behaviour.Behaviour):
         name (:obj:`str`): the composite behaviour name
         children ([:class:`~py_trees.behaviour.Behaviour`]): list of children to add
     """
+    __slots__ = ('current_child', 'current_index', 'high_water')
+
     def __init__(self,
                  name: typing.Union[str, common.Name]=common.Name.AUTO_GENERATED,
                  children: typing.List[behaviour.Behaviour]=None
                  ):
         super(Composite, self).__init__(name)
         if children is not None:
-            for child in children:
-                self.add_child(child)
+            self.add_children(children)
         else:
             self.children = []
         self.current_child = None
+        self.current_index = None  # index of the current child, checked against current_child before use
+        self.high_water = len(self.children) - 1  # children after this index are all INVALID
 
     ############################################
     # Worker Overrides
@@ -106,17 +110,19 @@ class Composite(behaviour.Behaviour):
         Args:
             new_status (:class:`~py_trees.common.Status`): behaviour will transition to this new status
         """
-        self.logger.debug("%s.stop()[%s]" % (self.__class__.__name__, "%s->%s" % (self.status, new_status) if self.status != new_status else "%s" % new_status))
+        if logging.level < logging.Level.INFO:
+            self.logger.debug("%s.stop()[%s]" % (self.__class__.__name__, "%s->%s" % (self.status, new_status) if self.status != new_status else "%s" % new_status))
         # priority interrupted
         if new_status == common.Status.INVALID:
             self.current_child = None
             for child in self.children:
                 child.stop(new_status)
+            self.high_water = -1
         # This part just replicates the Behaviour.stop function. We replicate it here so that
         # the Behaviour logging doesn't duplicate the composite logging here, just a bit cleaner this way.
         self.terminate(new_status)
         self.status = new_status
-        self.iterator = self.tick()
+        self._iterator = None
 
     def tip(self):
         """
@@ -130,6 +136,38 @@ class Composite(behaviour.Behaviour):
         else:
             return super().tip()
 
+    def get_current_index(self):
+        """
+        Index of the current child. This is constant time when the current child was set
+        while ticking, otherwise the children are searched.
+
+        Returns:
+            :obj:`int`: index of the current child
+
+        Raises:
+            ValueError: if there is no current child
+        """
+        index = self.current_index
+        if index is None or index >= len(self.children) or self.children[index] is not self.current_child:
+            index = self.children.index(self.current_child)
+            self.current_index = index
+        return index
+
+    def stop_lower_priority(self, index):
+        """
+        Invalidate the children after index that are not already invalid. Only children up to
+        the high water mark may have been ticked since they were last invalidated, so the
+        children after it are skipped.
+
+        Args:
+            index (:obj:`int`): index of the last child to keep, -1 to invalidate all children
+        """
+        for child in itertools.islice(self.children, index + 1, self.high_water + 1):
+            if child.status != common.Status.INVALID:
+                child.stop(common.Status.INVALID)
+        if index < self.high_water:
+            self.high_water = index
+
     ############################################
     # Children
     ############################################
@@ -148,25 +186,37 @@ class Composite(behaviour.Behaviour):
         Returns:
             uuid.UUID: unique id of the child
         """
-        if not isinstance(child, behaviour.Behaviour):
-            raise TypeError("children must be behaviours, but you passed in {}".format(type(child)))
-        self.children.append(child)
-        if child.parent is not None:
-            raise RuntimeError("behaviour '{}' already has parent '{}'".format(child.name, child.parent.name))
-        child.parent = self
+        self._append_child(child)
         return child.id
 
     def add_children(self, children):
         """
-        Append a list of children to the current list.
+        Append a list of children to the current list. Unlike :meth:`add_child`
+        this does not need the ids of the children, so they are not created.
 
         Args:
             children ([:class:`~py_trees.behaviour.Behaviour`]): list of children to add
+
+        Raises:
+            TypeError: if a child is not an instance of :class:`~py_trees.behaviour.Behaviour`
+            RuntimeError: if a child already has a parent
         """
         for child in children:
-            self.add_child(child)
+            self._append_child(child)
         return self
 
+    def _append_child(self, child):
+        """
+        Append child to the children, checking that it is a behaviour without a parent.
+        """
+        if not isinstance(child, behaviour.Behaviour):
+            raise TypeError("children must be behaviours, but you passed in {}".format(type(child)))
+        self.children.append(child)
+        self.high_water = len(self.children) - 1
+        if child.parent is not None:
+            raise RuntimeError("behaviour '{}' already has parent '{}'".format(child.name, child.parent.name))
+        child.parent = self
+
     def remove_child(self, child):
         """
         Remove the child behaviour from this composite.
@@ -185,6 +235,7 @@ class Composite(behaviour.Behaviour):
             child.stop(common.Status.INVALID)
         child_index = self.children.index(child)
         self.children.remove(child)
+        self.high_water = len(self.children) - 1
         child.parent = None
         return child_index
 
@@ -200,6 +251,7 @@ class Composite(behaviour.Behaviour):
         # makes sure to delete it for this class and all references to it
         #   http://stackoverflow.com/questions/850795/clearing-python-lists
         del self.children[:]
+        self.high_water = -1
 
     def replace_child(self, child, replacement):
         """
@@ -242,6 +294,7 @@ class Composite(behaviour.Behaviour):
             uuid.UUID: unique id of the child
         """
         self.children.insert(0, child)
+        self.high_water = len(self.children) - 1
         child.parent = self
         return child.id
 
@@ -258,6 +311,7 @@ class Composite(behaviour.Behaviour):
             uuid.UUID: unique id of the child
         """
         self.children.insert(index, child)
+        self.high_water = len(self.children) - 1
         child.parent = self
         return child.id
 
@@ -292,6 +346,8 @@ class Selector(Composite):
         children ([:class:`~py_trees.behaviour.Behaviour`]): list of children to add
     """
 
+    __slots__ = ('memory',)
+
     def __init__(self, name="Selector", memory=False, children=None):
         super(Selector, self).__init__(name, children)
         self.memory = memory
@@ -305,13 +361,16 @@ class Selector(Composite):
         Yields:
             :class:`~py_trees.behaviour.Behaviour`: a reference to itself or one of its children
         """
-        self.logger.debug("%s.tick()" % self.__class__.__name__)
+        if logging.level < logging.Level.INFO:
+            self.logger.debug("%s.tick()" % self.__class__.__name__)
         # initialise
         if self.status != common.Status.RUNNING:
             # selector specific initialisation - leave initialise() free for users to
             # re-implement without having to make calls to super()
-            self.logger.debug("%s.tick() [!RUNNING->reset current_child]" % self.__class__.__name__)
+            if logging.level < logging.Level.INFO:
+                self.logger.debug("%s.tick() [!RUNNING->reset current_child]" % self.__class__.__name__)
             self.current_child = self.children[0] if self.children else None
+            self.current_index = 0
 
             # reset the children - don't need to worry since they will be handled
             # a) prior to a remembered starting point, or
@@ -332,7 +391,7 @@ class Selector(Composite):
 
         # starting point
         if self.memory:
-            index = self.children.index(self.current_child)
+            index = self.get_current_index()
             # clear out preceding status' - not actually necessary but helps
             # visualise the case of memory vs no memory
             for child in itertools.islice(self.children, None, index):
@@ -342,31 +401,79 @@ class Selector(Composite):
 
         # actual work
         previous = self.current_child
-        for child in itertools.islice(self.children, index, None):
+        for index, child in enumerate(itertools.islice(self.children, index, None), index):
+            if index > self.high_water:
+                self.high_water = index
             for node in child.tick():
                 yield node
                 if node is child:
                     if node.status == common.Status.RUNNING or node.status == common.Status.SUCCESS:
                         self.current_child = child
+                        self.current_index = index
                         self.status = node.status
                         if previous is None or previous != self.current_child:
                             # we interrupted, invalidate everything at a lower priority
-                            passed = False
-                            for child in self.children:
-                                if passed:
-                                    if child.status != common.Status.INVALID:
-                                        child.stop(common.Status.INVALID)
-                                passed = True if child == self.current_child else passed
+                            self.stop_lower_priority(index)
                         yield self
                         return
         # all children failed, set failure ourselves and current child to the last bugger who failed us
         self.status = common.Status.FAILURE
         try:
             self.current_child = self.children[-1]
+            self.current_index = len(self.children) - 1
         except IndexError:
             self.current_child = None
         yield self
 
+    def tick_direct(self):
+        """
+        Same as :meth:`~py_trees.composites.Selector.tick` but without the generator mechanism,
+        see :meth:`~py_trees.behaviour.Behaviour.tick_direct`.
+
+        Returns:
+            :class:`~py_trees.common.Status`: the new status of the selector
+        """
+        if type(self).tick is not Selector.tick:
+            return behaviour.Behaviour.tick_direct(self)
+        if logging.level < logging.Level.INFO:
+            self.logger.debug("%s.tick_direct()" % self.__class__.__name__)
+        if self.status != common.Status.RUNNING:
+            self.current_child = self.children[0] if self.children else None
+            self.current_index = 0
+            self.initialise()
+
+        self.update()
+
+        if not self.children:
+            self.current_child = None
+            self.stop(common.Status.FAILURE)
+            return self.status
+
+        if self.memory:
+            index = self.get_current_index()
+            for child in itertools.islice(self.children, None, index):
+                child.stop(common.Status.INVALID)
+        else:
+            index = 0
+
+        previous = self.current_child
+        for index, child in enumerate(itertools.islice(self.children, index, None), index):
+            if index > self.high_water:
+                self.high_water = index
+            status = child.tick_direct()
+            if status == common.Status.RUNNING or status == common.Status.SUCCESS:
+                self.current_child = child
+                self.current_index = index
+                self.status = status
+                if previous is None or previous != self.current_child:
+                    # we interrupted, invalidate everything at a lower priority
+                    self.stop_lower_priority(index)
+                return status
+        self.status = common.Status.FAILURE
+        self.current_child = self.children[-1]
+        self.current_index = len(self.children) - 1
+        return self.status
+
     def stop(self, new_status=common.Status.INVALID):
         """
         Stopping a selector requires setting the current child to none. Note that it
@@ -413,6 +520,8 @@ class Sequence(Composite):
         children: list of children to add
 
     """
+    __slots__ = ('memory',)
+
     def __init__(
         self,
         name: str="Sequence",
@@ -429,19 +538,19 @@ class Sequence(Composite):
         Yields:
             :class:`~py_trees.behaviour.Behaviour`: a reference to itself or one of its children
         """
-        self.logger.debug("%s.tick()" % self.__class__.__name__)
+        if logging.level < logging.Level.INFO:
+            self.logger.debug("%s.tick()" % self.__class__.__name__)
 
         # initialise
         index = 0
         if self.status != common.Status.RUNNING or not self.memory:
             self.current_child = self.children[0] if self.children else None
-            for child in self.children:
-                if child.status != common.Status.INVALID:
-                    child.stop(common.Status.INVALID)
+            self.current_index = 0
+            self.stop_lower_priority(-1)
             # user specific initialisation
             self.initialise()
         else:  # self.memory is True and status is RUNNING
-            index = self.children.index(self.current_child)
+            index = self.get_current_index()
 
         # customised work
         self.update()
@@ -455,6 +564,8 @@ class Sequence(Composite):
 
         # actual work
         for child in itertools.islice(self.children, index, None):
+            if index > self.high_water:
+                self.high_water = index
             for node in child.tick():
                 yield node
                 if node is child and node.status != common.Status.SUCCESS:
@@ -465,12 +576,57 @@ class Sequence(Composite):
                 # advance if there is 'next' sibling
                 self.current_child = self.children[index + 1]
                 index += 1
+                self.current_index = index
             except IndexError:
                 pass
 
         self.stop(common.Status.SUCCESS)
         yield self
 
+    def tick_direct(self):
+        """
+        Same as :meth:`~py_trees.composites.Sequence.tick` but without the generator mechanism,
+        see :meth:`~py_trees.behaviour.Behaviour.tick_direct`.
+
+        Returns:
+            :class:`~py_trees.common.Status`: the new status of the sequence
+        """
+        if type(self).tick is not Sequence.tick:
+            return behaviour.Behaviour.tick_direct(self)
+        if logging.level < logging.Level.INFO:
+            self.logger.debug("%s.tick_direct()" % self.__class__.__name__)
+
+        index = 0
+        if self.status != common.Status.RUNNING or not self.memory:
+            self.current_child = self.children[0] if self.children else None
+            self.current_index = 0
+            self.stop_lower_priority(-1)
+            self.initialise()
+        else:
+            index = self.get_current_index()
+
+        self.update()
+
+        if not self.children:
+            self.current_child = None
+            self.stop(common.Status.SUCCESS)
+            return self.status
+
+        for child in itertools.islice(self.children, index, None):
+            if index > self.high_water:
+                self.high_water = index
+            status = child.tick_direct()
+            if status != common.Status.SUCCESS:
+                self.status = status
+                return status
+            if index + 1 < len(self.children):
+                self.current_child = self.children[index + 1]
+                index += 1
+                self.current_index = index
+
+        self.stop(common.Status.SUCCESS)
+        return self.status
+
 
 ##############################################################################
 # Parallel
@@ -513,6 +669,8 @@ class Parallel(Composite):
     .. seealso::
        * :ref:`Context Switching Demo <py-trees-demo-context-switching-program>`
     """
+    __slots__ = ('policy',)
+
     def __init__(self,
                  name: typing.Union[str, common.Name]=common.Name.AUTO_GENERATED,
                  policy: common.ParallelPolicy.Base=common.ParallelPolicy.SuccessOnAll(),
@@ -582,6 +740,68 @@ class Parallel(Composite):
                 yield node
 
         # determine new status
+        new_status = self.policy_status()
+        # this parallel may have children that are still running
+        # so if the parallel itself has reached a final status, then
+        # these running children need to be terminated so they don't dangle
+        if new_status != common.Status.RUNNING:
+            self.stop(new_status)
+        self.status = new_status
+        yield self
+
+    def tick_direct(self):
+        """
+        Same as :meth:`~py_trees.composites.Parallel.tick` but without the generator mechanism,
+        see :meth:`~py_trees.behaviour.Behaviour.tick_direct`.
+
+        Returns:
+            :class:`~py_trees.common.Status`: the new status of the parallel
+
+        Raises:
+            RuntimeError: if the policy configuration was invalid
+        """
+        if type(self).tick is not Parallel.tick:
+            return behaviour.Behaviour.tick_direct(self)
+        if logging.level < logging.Level.INFO:
+            self.logger.debug("%s.tick_direct()" % self.__class__.__name__)
+        self.validate_policy_configuration()
+
+        # reset
+        if self.status != common.Status.RUNNING:
+            for child in self.children:
+                if child.status != common.Status.INVALID:
+                    child.stop(common.Status.INVALID)
+            self.current_child = None
+            self.initialise()
+
+        # nothing to do
+        if not self.children:
+            self.current_child = None
+            self.stop(common.Status.SUCCESS)
+            return self.status
+
+        for child in self.children:
+            if self.policy.synchronise and child.status == common.Status.SUCCESS:
+                continue
+            child.tick_direct()
+
+        new_status = self.policy_status()
+        if new_status != common.Status.RUNNING:
+            self.stop(new_status)
+        self.status = new_status
+        return new_status
+
+    def policy_status(self):
+        """
+        Determine the status of the parallel from the statuses of its children after they
+        were ticked, and set the current child accordingly.
+
+        Returns:
+            :class:`~py_trees.common.Status`: the new status of the parallel
+
+        Raises:
+            RuntimeError: if the policy is not recognised
+        """
         new_status = common.Status.RUNNING
         self.current_child = self.children[-1]
         try:
@@ -604,13 +824,7 @@ class Parallel(Composite):
                     self.current_child = self.policy.children[-1]
             else:
                 raise RuntimeError("this parallel has been configured with an unrecognised policy [{}]".format(type(self.policy)))
-        # this parallel may have children that are still running
-        # so if the parallel itself has reached a final status, then
-        # these running children need to be terminated so they don't dangle
-        if new_status != common.Status.RUNNING:
-            self.stop(new_status)
-        self.status = new_status
-        yield self
+        return new_status
 
     def stop(self, new_status: common.Status=common.Status.INVALID):
         """
@@ -86,6 +86,7 @@ from typing import Callable, List, Set, Union  # noqa
 from py_trees import behaviour
 from py_trees import blackboard
 from py_trees import common
+from py_trees import logging
 
 ##############################################################################
 # Classes
@@ -104,6 +105,8 @@ class Decorator(behaviour.Behaviour):
     Raises:
         TypeError: if the child is not an instance of :class:`~py_trees.behaviour.Behaviour`
     """
+    __slots__ = ('decorated',)
+
     def __init__(
             self,
             child: behaviour.Behaviour,
@@ -127,7 +130,8 @@ class Decorator(behaviour.Behaviour):
         Yields:
             :class:`~py_trees.behaviour.Behaviour`: a reference to itself or one of its children
         """
-        self.logger.debug("%s.tick()" % self.__class__.__name__)
+        if logging.level < logging.Level.INFO:
+            self.logger.debug("%s.tick()" % self.__class__.__name__)
         # initialise just like other behaviours/composites
         if self.status != common.Status.RUNNING:
             self.initialise()
@@ -137,7 +141,7 @@ class Decorator(behaviour.Behaviour):
             yield node
         # resume normal proceedings for a Behaviour's tick
         new_status = self.update()
-        if new_status not in list(common.Status):
+        if new_status not in common.VALID_STATUSES:
             self.logger.error("A behaviour returned an invalid status, setting to INVALID [%s][%s]" % (new_status, self.name))
             new_status = common.Status.INVALID
         if new_status != common.Status.RUNNING:
@@ -145,6 +149,30 @@ class Decorator(behaviour.Behaviour):
         self.status = new_status
         yield self
 
+    def tick_direct(self):
+        """
+        Same as :meth:`~py_trees.decorators.Decorator.tick` but without the generator mechanism,
+        see :meth:`~py_trees.behaviour.Behaviour.tick_direct`.
+
+        Returns:
+            :class:`~py_trees.common.Status`: the new status of the decorator
+        """
+        if type(self).tick is not Decorator.tick:
+            return behaviour.Behaviour.tick_direct(self)
+        if logging.level < logging.Level.INFO:
+            self.logger.debug("%s.tick_direct()" % self.__class__.__name__)
+        if self.status != common.Status.RUNNING:
+            self.initialise()
+        self.decorated.tick_direct()
+        new_status = self.update()
+        if new_status not in common.VALID_STATUSES:
+            self.logger.error("A behaviour returned an invalid status, setting to INVALID [%s][%s]" % (new_status, self.name))
+            new_status = common.Status.INVALID
+        if new_status != common.Status.RUNNING:
+            self.stop(new_status)
+        self.status = new_status
+        return new_status
+
     def stop(self, new_status):
         """
         As with other composites, it checks if the child is running
@@ -153,7 +181,8 @@ class Decorator(behaviour.Behaviour):
         Args:
             new_status (:class:`~py_trees.common.Status`): the behaviour is transitioning to this new status
         """
-        self.logger.debug("%s.stop(%s)" % (self.__class__.__name__, new_status))
+        if logging.level < logging.Level.INFO:
+            self.logger.debug("%s.stop(%s)" % (self.__class__.__name__, new_status))
         self.terminate(new_status)
         # priority interrupt handling
         if new_status == common.Status.INVALID:
@@ -349,10 +349,14 @@ class BehaviourTree(object):
         for visitor in self.visitors:
             visitor.initialise()
 
-        # tick
-        for node in self.root.tick():
-            for visitor in [visitor for visitor in self.visitors if not visitor.full]:
-                node.visit(visitor)
+        # tick, visitors that are not full need to see every traversed node
+        visitors_not_full = [visitor for visitor in self.visitors if not visitor.full]
+        if visitors_not_full:
+            for node in self.root.tick():
+                for visitor in visitors_not_full:
+                    node.visit(visitor)
+        else:
+            self.root.tick_direct()
 
         for node in self.root.iterate():
             for visitor in [visitor for visitor in self.visitors if visitor.full]:
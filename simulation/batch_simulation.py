@@ -0,0 +1,544 @@
+"""
+Vectorized simulation of many kitting episodes in lockstep.
+The world state of all episodes is kept as NumPy arrays and every action is
+applied to the masked subset of episodes in one step. Results are identical
+to running conveyor_kitting.Simulation once per episode.
+"""
+import abc
+import random
+import re
+import numpy as np
+
+import simulation.behavior_tree as behavior_tree
+import simulation.conveyor_kitting as sm
+import simulation.fitness_function as fitness_function
+
+#Status codes used in the status arrays of batch nodes
+INVALID = 0
+SUCCESS = 1
+FAILURE = 2
+RUNNING = 3
+
+class BatchSimulation:
+    # pylint: disable=too-many-instance-attributes
+    """
+    Simulation of a batch of episodes, one per seed, stored as struct of arrays
+    """
+    def __init__(self, seeds, spawn_schedules=None):
+        self.seeds = list(seeds)
+        n_episodes = len(self.seeds)
+        self.n_episodes = n_episodes
+        self.rngs = [random.Random(seed) for seed in self.seeds]
+        self.seeded_schedule = [spawn_schedules is None and seed is not None for seed in self.seeds]
+        if spawn_schedules is None:
+            spawn_schedules = [sm.get_spawn_schedule(seed) if seed is not None else \
+                               sm.make_spawn_schedule(self.rngs[i], sm.EPISODE_LENGTH) \
+                               for i, seed in enumerate(self.seeds)]
+        self.episode_schedules = [bytes(schedule) for schedule in spawn_schedules]
+        self.spawn_schedule = np.zeros((n_episodes, 0), dtype=np.uint8)
+        self.extend_spawn_schedule(max([len(schedule) for schedule in self.episode_schedules], default=0))
+
+        default = sm.WorldState()
+        self.tick = np.zeros(n_episodes, dtype=np.int64)
+        self.pos_x = np.full(n_episodes, default.robot_pos.x, dtype=np.float64)
+        self.pos_y = np.full(n_episodes, default.robot_pos.y, dtype=np.float64)
+        self.battery_level = np.full(n_episodes, default.battery_level, dtype=np.int64)
+        self.carried_weight = np.zeros(n_episodes, dtype=np.int64)
+        self.carried_light = np.zeros(n_episodes, dtype=np.int64)
+        self.carried_heavy = np.zeros(n_episodes, dtype=np.int64)
+        self.cnv_n_light = np.zeros(n_episodes, dtype=np.int64)
+        self.cnv_n_heavy = np.zeros(n_episodes, dtype=np.int64)
+        self.delivered_heavy = np.zeros(n_episodes, dtype=np.int64)
+        self.delivered_light = np.zeros(n_episodes, dtype=np.int64)
+        self.blocked_heavy = np.zeros(n_episodes, dtype=np.int64)
+        self.blocked_light = np.zeros(n_episodes, dtype=np.int64)
+        self.ready_for_action = np.zeros(n_episodes, dtype=bool) #At most one action each tick
+
+    def extend_spawn_schedule(self, length):
+        """
+        Makes the schedule array cover at least the given number of ticks.
+        Episodes are extended the same way conveyor_kitting.Simulation extends its schedule.
+        """
+        for i, seed in enumerate(self.seeds):
+            schedule = self.episode_schedules[i]
+            if len(schedule) < length:
+                if self.seeded_schedule[i]:
+                    schedule = sm.get_spawn_schedule(seed, length)
+                else:
+                    schedule += sm.make_spawn_schedule(self.rngs[i], length - len(schedule))
+                self.episode_schedules[i] = schedule
+        length = max(length, self.spawn_schedule.shape[1])
+        self.spawn_schedule = np.zeros((self.n_episodes, length), dtype=np.uint8)
+        for i, schedule in enumerate(self.episode_schedules):
+            self.spawn_schedule[i, :len(schedule)] = np.frombuffer(schedule[:length], dtype=np.uint8)
+
+    def get_state(self, episode):
+        """ Returns the world state of one episode """
+        return sm.WorldState(tick=int(self.tick[episode]),
+                             robot_pos=sm.Pos(float(self.pos_x[episode]), float(self.pos_y[episode])),
+                             battery_level=int(self.battery_level[episode]),
+                             carried_weight=int(self.carried_weight[episode]),
+                             carried_light=int(self.carried_light[episode]),
+                             carried_heavy=int(self.carried_heavy[episode]),
+                             cnv_n_light=int(self.cnv_n_light[episode]),
+                             cnv_n_heavy=int(self.cnv_n_heavy[episode]),
+                             delivered_heavy=int(self.delivered_heavy[episode]),
+                             delivered_light=int(self.delivered_light[episode]),
+                             blocked_heavy=int(self.blocked_heavy[episode]),
+                             blocked_light=int(self.blocked_light[episode]))
+
+    def get_simulation(self, episode):
+        """ Returns a scalar simulation continuing from the current state of one episode """
+        simulation = sm.Simulation(seed=self.seeds[episode], spawn_schedule=self.episode_schedules[episode])
+        simulation.seeded_schedule = self.seeded_schedule[episode]
+        simulation.rng = self.rngs[episode]
+        simulation.state = self.get_state(episode)
+        simulation.ready_for_action = bool(self.ready_for_action[episode])
+        return simulation
+
+    def get_feedback(self):
+        """ Dummy to fit template """
+        self.ready_for_action[:] = True
+        return True
+
+    def send_references(self):
+        """ Step all episodes where no action was taken """
+        self.step(self.ready_for_action.copy())
+
+    def step(self, mask):
+        """
+        Step the masked episodes one timestep
+        """
+        episodes = np.flatnonzero(mask)
+        if len(episodes) == 0:
+            return
+        ticks = self.tick[episodes]
+        if ticks.max() >= self.spawn_schedule.shape[1]:
+            self.extend_spawn_schedule(max(2 * self.spawn_schedule.shape[1], int(ticks.max()) + 1, \
+                                           sm.EPISODE_LENGTH))
+        spawns = self.spawn_schedule[episodes, ticks]
+
+        #Add objects on conveyor according to spawn schedule
+        heavy = episodes[(spawns & sm.SPAWN_HEAVY) != 0]
+        room = self.cnv_n_heavy[heavy] < sm.MAX_HEAVY
+        self.cnv_n_heavy[heavy[room]] += 1
+        self.blocked_heavy[heavy[~room]] += 1
+        light = episodes[(spawns & sm.SPAWN_LIGHT) != 0]
+        room = self.cnv_n_light[light] < sm.MAX_LIGHT
+        self.cnv_n_light[light[room]] += 1
+        self.blocked_light[light[~room]] += 1
+
+        #Deplete battery
+        self.battery_level[episodes] = np.maximum(self.battery_level[episodes] - 1, 0)
+
+        #Only one action per tick
+        self.ready_for_action[episodes] = False
+        self.tick[episodes] += 1
+
+    def at_station(self, station):
+        """ Checks for all episodes if robot is currently at given station """
+        station_pos = sm.get_pos(station)
+        return (self.pos_x == station_pos.x) & (self.pos_y == station_pos.y)
+
+    def idle(self, mask):
+        """
+        Robot does nothing
+        """
+        self.step(mask)
+        return mask
+
+    def charge(self, mask):
+        """
+        Robot attemps to charge at station, returns mask of episodes where it did
+        """
+        success = mask & (self.at_station(sm.Stations.CHARGE1) | self.at_station(sm.Stations.CHARGE2))
+        self.battery_level[success] += 10
+        self.step(success)
+        self.battery_level[success] = np.minimum(self.battery_level[success], sm.MAX_BATTERY)
+        return success
+
+    def moveto(self, station, mask):
+        """
+        Moves robot towards given position, returns mask of episodes where it did
+        """
+        success = mask & (self.battery_level > 0)
+        self.move_towards(station, success)
+        self.step(success)
+        return success
+
+    def move_towards(self, station, mask):
+        """
+        Moves towards given station with the same path planning as conveyor_kitting.move_towards
+        """
+        station_pos = sm.get_pos(station)
+        x = self.pos_x[mask]
+        y = self.pos_y[mask]
+        x_differs = x != station_pos.x
+        y_differs = y != station_pos.y
+        move_x = (y_differs & x_differs & ((x < 12) | (x > 21))) | (~y_differs & x_differs)
+        move_y = y_differs & ~move_x
+        x[move_x] = np.where(x[move_x] < station_pos.x, \
+                             np.minimum(x[move_x] + sm.ROBOT_SPEED, station_pos.x), \
+                             np.maximum(x[move_x] - sm.ROBOT_SPEED, station_pos.x))
+        y[move_y] = np.where(y[move_y] < station_pos.y, \
+                             np.minimum(y[move_y] + sm.ROBOT_SPEED, station_pos.y), \
+                             np.maximum(y[move_y] - sm.ROBOT_SPEED, station_pos.y))
+        self.pos_x[mask] = x
+        self.pos_y[mask] = y
+        self.battery_level[mask] -= (x_differs | y_differs)
+
+    def pick(self, mask):
+        """
+        Picks up an object if possible, returns mask of episodes where it did
+        """
+        powered = mask & (self.battery_level > 0)
+        heavy = powered & self.at_station(sm.Stations.CONVEYOR_HEAVY) & (self.cnv_n_heavy > 0) & \
+                (self.carried_weight + sm.HEAVY_WEIGHT <= sm.MAX_WEIGHT)
+        light = powered & ~heavy & self.at_station(sm.Stations.CONVEYOR_LIGHT) & (self.cnv_n_light > 0) & \
+                (self.carried_weight + sm.LIGHT_WEIGHT <= sm.MAX_WEIGHT)
+
+        self.carried_weight[heavy] += sm.HEAVY_WEIGHT
+        self.carried_heavy[heavy] += 1
+        self.cnv_n_heavy[heavy] -= 1
+        self.carried_weight[light] += sm.LIGHT_WEIGHT
+        self.carried_light[light] += 1
+        self.cnv_n_light[light] -= 1
+        success = heavy | light
+        self.battery_level[success] -= 1
+        self.step(success)
+        return success
+
+    def place(self, mask):
+        """
+        Places objects if possible, returns mask of episodes where it did
+        """
+        success = mask & (self.battery_level > 0) & self.at_station(sm.Stations.DELIVERY)
+        self.delivered_light[success] += self.carried_light[success]
+        self.delivered_heavy[success] += self.carried_heavy[success]
+        self.carried_weight[success] -= sm.LIGHT_WEIGHT * self.carried_light[success] + \
+                                        sm.HEAVY_WEIGHT * self.carried_heavy[success]
+        self.carried_light[success] = 0
+        self.carried_heavy[success] = 0
+        self.battery_level[success] -= 1
+        self.step(success)
+        return success
+
+class BatchNode(abc.ABC):
+    """
+    Base class for nodes ticked for a batch of episodes at once.
+    Holds one status per episode.
+    """
+    def __init__(self, name, world_interface):
+        self.name = name
+        self.world_interface = world_interface
+        self.status = np.full(world_interface.n_episodes, INVALID, dtype=np.int8)
+        self.children = []
+
+    @abc.abstractmethod
+    def tick(self, mask):
+        """ Ticks the node in the masked episodes """
+
+    def stop(self, mask):
+        """ Invalidates the node in the masked episodes """
+        self.status[mask] = INVALID
+
+class BatchComparison(BatchNode):
+    """
+    Condition comparing a world state variable against a constant
+    """
+    def __init__(self, name, world_interface, variable):
+        super().__init__(name, world_interface)
+        self.variable = variable
+        self.lower = '<' in name
+        self.value = int(re.findall(r'\d+', name)[0])
+
+    def tick(self, mask):
+        variable = getattr(self.world_interface, self.variable)[mask]
+        success = variable < self.value if self.lower else variable > self.value
+        self.status[mask] = np.where(success, SUCCESS, FAILURE)
+
+class BatchConstant(BatchNode):
+    """
+    Condition that always succeeds or always fails
+    """
+    def __init__(self, name, world_interface, success):
+        super().__init__(name, world_interface)
+        self.result = SUCCESS if success else FAILURE
+
+    def tick(self, mask):
+        self.status[mask] = self.result
+
+class BatchAtStation(BatchNode):
+    """
+    Check if robot is at given station
+    """
+    def __init__(self, name, world_interface, station):
+        super().__init__(name, world_interface)
+        self.station = sm.get_station_from_string(station)
+
+    def tick(self, mask):
+        self.status[mask] = np.where(self.world_interface.at_station(self.station)[mask], SUCCESS, FAILURE)
+
+class BatchAction(BatchNode):
+    """
+    Action that returns RUNNING when acting and FAILURE when the simulation refuses.
+    Episodes where another action was already taken this tick return RUNNING.
+    """
+    @abc.abstractmethod
+    def act(self, mask):
+        """ Performs the action in the masked episodes, returns where it succeeded """
+
+    def tick(self, mask):
+        acting = mask & self.world_interface.ready_for_action
+        success = self.act(acting)
+        self.status[mask] = RUNNING
+        self.status[acting & ~success] = FAILURE
+
+class BatchIdle(BatchAction):
+    """
+    Do nothing
+    """
+    def act(self, mask):
+        return self.world_interface.idle(mask)
+
+class BatchCharge(BatchAction):
+    """
+    Charge robot, successful once battery is full
+    """
+    def act(self, mask):
+        return self.world_interface.charge(mask)
+
+    def tick(self, mask):
+        full = mask & (self.world_interface.battery_level >= sm.MAX_BATTERY)
+        super().tick(mask & ~full)
+        self.status[full] = SUCCESS
+
+class BatchMoveTo(BatchAction):
+    """
+    Move towards station, successful once there
+    """
+    def __init__(self, name, world_interface, station):
+        super().__init__(name, world_interface)
+        self.station = sm.get_station_from_string(station)
+
+    def act(self, mask):
+        return self.world_interface.moveto(self.station, mask)
+
+    def tick(self, mask):
+        arrived = mask & self.world_interface.at_station(self.station)
+        super().tick(mask & ~arrived)
+        self.status[arrived] = SUCCESS
+
+class BatchPick(BatchAction):
+    """
+    Pick up an object
+    """
+    def act(self, mask):
+        return self.world_interface.pick(mask)
+
+class BatchPlace(BatchAction):
+    """
+    Places all objects held at current position
+    """
+    def act(self, mask):
+        return self.world_interface.place(mask)
+
+class BatchComposite(BatchNode):
+    """
+    Base class for control nodes, keeps the index of the current child per episode
+    """
+    def __init__(self, name, world_interface, memory=False):
+        super().__init__(name, world_interface)
+        self.memory = memory
+        self.current = np.full(world_interface.n_episodes, -1, dtype=np.int64)
+
+    def stop(self, mask):
+        self.current[mask] = -1
+        for child in self.children:
+            child.stop(mask & (child.status != INVALID))
+        self.status[mask] = INVALID
+
+    def stop_lower_priority(self, index, mask):
+        """ Invalidates children after index in the masked episodes """
+        if mask.any():
+            for child in self.children[index + 1:]:
+                child.stop(mask & (child.status != INVALID))
+
+class BatchSelector(BatchComposite):
+    """
+    Fallback node, mirrors py_trees.composites.Selector
+    """
+    def tick(self, mask):
+        self.current[mask & (self.status != RUNNING)] = 0
+        index = self.current.copy()
+        if self.memory:
+            for i, child in enumerate(self.children):
+                child.stop(mask & (i < index) & (child.status != INVALID))
+        else:
+            index[:] = 0
+        previous = self.current.copy()
+
+        pending = mask.copy()
+        for i, child in enumerate(self.children):
+            active = pending & (index <= i)
+            if not active.any():
+                continue
+            child.tick(active)
+            done = active & ((child.status == RUNNING) | (child.status == SUCCESS))
+            self.current[done] = i
+            self.status[done] = child.status[done]
+            self.stop_lower_priority(i, done & (previous != i))
+            pending &= ~done
+        self.status[pending] = FAILURE
+        self.current[pending] = len(self.children) - 1
+
+class BatchSequence(BatchComposite):
+    """
+    Sequence node, mirrors py_trees.composites.Sequence
+    """
+    def tick(self, mask):
+        entering = mask & (self.status != RUNNING) if self.memory else mask
+        self.current[entering] = 0
+        for child in self.children:
+            child.stop(entering & (child.status != INVALID))
+        index = self.current.copy()
+
+        pending = mask.copy()
+        for i, child in enumerate(self.children):
+            active = pending & (index <= i)
+            if not active.any():
+                continue
+            child.tick(active)
+            halted = active & (child.status != SUCCESS)
+            self.status[halted] = child.status[halted]
+            pending &= ~halted
+            if i + 1 < len(self.children):
+                self.current[active & ~halted] = i + 1
+        self.status[pending] = SUCCESS
+
+class BatchRSequence(BatchComposite):
+    """
+    Reactive sequence, mirrors behaviors.RSequence
+    """
+    def tick(self, mask):
+        previous = self.current.copy()
+        pending = mask.copy()
+        for i, child in enumerate(self.children):
+            if not pending.any():
+                break
+            child.tick(pending)
+            done = pending & ((child.status == RUNNING) | (child.status == FAILURE))
+            self.current[done] = i
+            self.status[done] = child.status[done]
+            self.stop_lower_priority(i, done & (previous != i))
+            pending &= ~done
+        self.status[pending] = SUCCESS
+        self.current[pending] = len(self.children) - 1
+
+def get_node_from_string(string, world_interface):
+    # pylint: disable=too-many-return-statements, too-many-branches
+    """
+    Returns a batch node given the string, recognizing strings like behaviors.get_node_from_string
+    """
+    if string in ('true?', 'false?'):
+        return BatchConstant(string, world_interface, string == 'true?'), False
+    if 'at station ' in string:
+        return BatchAtStation(string, world_interface, string[11:]), False
+    if 'battery level ' in string:
+        return BatchComparison(string, world_interface, 'battery_level'), False
+    if 'carried weight ' in string:
+        return BatchComparison(string, world_interface, 'carried_weight'), False
+    if 'carried light ' in string:
+        return BatchComparison(string, world_interface, 'carried_light'), False
+    if 'carried heavy ' in string:
+        return BatchComparison(string, world_interface, 'carried_heavy'), False
+    if 'conveyor light ' in string:
+        return BatchComparison(string, world_interface, 'cnv_n_light'), False
+    if 'conveyor heavy ' in string:
+        return BatchComparison(string, world_interface, 'cnv_n_heavy'), False
+
+    if 'idle' in string:
+        return BatchIdle(string, world_interface), False
+    if 'charge' in string:
+        return BatchCharge(string, world_interface), False
+    if 'move to' in string:
+        return BatchMoveTo(string, world_interface, string[7:]), False
+    if 'pick' in string:
+        return BatchPick(string, world_interface), False
+    if 'place' in string:
+        return BatchPlace(string, world_interface), False
+
+    if string == 'f(':
+        return BatchSelector('Fallback', world_interface, memory=False), True
+    if string == 'fm(':
+        return BatchSelector('Fallback', world_interface, memory=True), True
+    if string == 's(':
+        return BatchRSequence('Sequence', world_interface), True
+    if string == 'sm(':
+        return BatchSequence('Sequence', world_interface, memory=True), True
+    raise Exception("Unexpected character", string)
+
+class BatchTree:
+    """
+    A behavior tree ticked for all episodes of a batch simulation at once
+    """
+    def __init__(self, string, world_interface):
+        bt = behavior_tree.BT(string)
+        self.depth = bt.depth()
+        self.length = bt.length()
+        self.world_interface = world_interface
+        self.failed = np.zeros(world_interface.n_episodes, dtype=bool)
+        self.timeout = False
+
+        string = string[:]
+        self.root, has_children = get_node_from_string(string.pop(0), world_interface)
+        if has_children:
+            self.create_from_string(string, self.root)
+
+    def create_from_string(self, string, node):
+        """
+        Generates the tree from a string in the same way as PyTree.create_from_string
+        """
+        while len(string) > 0:
+            if string[0] == ')':
+                string.pop(0)
+                return node
+
+            newnode, has_children = get_node_from_string(string.pop(0), self.world_interface)
+            if has_children:
+                newnode = self.create_from_string(string, newnode)
+            node.children.append(newnode)
+
+        return node
+
+    def run_bt(self, max_ticks=200):
+        """
+        Ticks the tree max_ticks times in every episode, which is what PyTree.run_bt
+        does with its default limits on failures and successes
+        """
+        all_episodes = np.ones(self.world_interface.n_episodes, dtype=bool)
+        straight_fails = np.zeros(self.world_interface.n_episodes, dtype=np.int64)
+        for _ in range(max_ticks):
+            self.world_interface.get_feedback()
+            self.root.tick(all_episodes)
+            self.world_interface.send_references()
+            straight_fails = np.where(self.root.status == FAILURE, straight_fails + 1, 0)
+
+        self.timeout = True
+        self.failed = straight_fails >= max_ticks
+        return max_ticks
+
+    def get_episode(self, episode):
+        """ Returns the results of one episode """
+        return fitness_function.EpisodeTree(self.depth, self.length, bool(self.failed[episode]), self.timeout)
+
+def get_fitness(individual, seeds, max_ticks=200, fitness_coeff=None):
+    """
+    Runs the individual once for each seed in one batch and returns the fitness of each episode
+    """
+    world_interface = BatchSimulation(seeds)
+    tree = BatchTree(individual, world_interface)
+    ticks = tree.run_bt(max_ticks=max_ticks)
+    return [fitness_function.compute_fitness(world_interface.get_simulation(episode), \
+                                             tree.get_episode(episode), ticks, fitness_coeff) \
+            for episode in range(world_interface.n_episodes)]
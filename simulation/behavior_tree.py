@@ -2,6 +2,7 @@
 """
 Class for handling string representations of behavior trees
 """
+import hashlib
 import random
 import re
 import yaml
@@ -77,6 +78,40 @@ global ALL_NODES
 All list of all the nodes
 """
 
+global FALLBACK_SET
+global SEQUENCE_SET
+global CONTROL_SET
+global CONDITION_SET
+global ACTION_SET
+global ATOMIC_FALLBACK_SET
+global ATOMIC_SEQUENCE_SET
+global UP_SET
+global LEAF_SET
+global BEHAVIOR_SET
+global ALL_SET
+"""
+Frozensets of the lists above for constant time membership checks,
+the lists are kept for their order when choosing random nodes
+"""
+
+global PARAMETERIZED_CONDITION_CACHE
+"""
+Cache of parsed tokens, maps a token to the name of its parameterized condition or None
+if the token is not a parameterized condition node
+"""
+
+TRUE_NODE = 'true?'
+FALSE_NODE = 'false?'
+"""
+Conditions that always succeed and always fail. They are not in the settings,
+canonicalize writes them in place of subtrees that are constant.
+"""
+
+SETTINGS_FILE = None
+"""
+Path of the most recently loaded settings file, used when setting up worker processes
+"""
+
 def load_settings_from_file(file):
     # pylint: disable=too-many-statements
     """
@@ -94,7 +129,9 @@ def load_settings_from_file(file):
     global LEAF_NODES
     global BEHAVIOR_NODES
     global ALL_NODES
+    global SETTINGS_FILE
 
+    SETTINGS_FILE = file
     FALLBACK_NODES = []
     SEQUENCE_NODES = []
     CONTROL_NODES = []
@@ -165,6 +202,37 @@ def load_settings_from_file(file):
         pass
     ALL_NODES += UP_NODE
     LEAF_NODES += BEHAVIOR_NODES
+    build_node_sets()
+
+def build_node_sets():
+    """
+    Builds the frozensets of the node lists and clears the token cache
+    """
+    global FALLBACK_SET
+    global SEQUENCE_SET
+    global CONTROL_SET
+    global CONDITION_SET
+    global ACTION_SET
+    global ATOMIC_FALLBACK_SET
+    global ATOMIC_SEQUENCE_SET
+    global UP_SET
+    global LEAF_SET
+    global BEHAVIOR_SET
+    global ALL_SET
+    global PARAMETERIZED_CONDITION_CACHE
+
+    FALLBACK_SET = frozenset(FALLBACK_NODES)
+    SEQUENCE_SET = frozenset(SEQUENCE_NODES)
+    CONTROL_SET = frozenset(CONTROL_NODES)
+    CONDITION_SET = frozenset(CONDITION_NODES)
+    ACTION_SET = frozenset(ACTION_NODES)
+    ATOMIC_FALLBACK_SET = frozenset(ATOMIC_FALLBACK_NODES)
+    ATOMIC_SEQUENCE_SET = frozenset(ATOMIC_SEQUENCE_NODES)
+    UP_SET = frozenset(UP_NODE)
+    LEAF_SET = frozenset(LEAF_NODES)
+    BEHAVIOR_SET = frozenset(BEHAVIOR_NODES)
+    ALL_SET = frozenset(ALL_NODES)
+    PARAMETERIZED_CONDITION_CACHE = {}
 
 def get_action_list():
     """
@@ -173,15 +241,26 @@ def get_action_list():
     global ACTION_NODES
     return ACTION_NODES
 
+def get_parameterized_condition_name(node):
+    """
+    Returns the name in PARAMETERIZED_CONDITION_NODES of a parameterized condition node,
+    None if node is not a parameterized condition node. Results are cached per token.
+    """
+    try:
+        return PARAMETERIZED_CONDITION_CACHE[node]
+    except KeyError:
+        name = re.sub(r'\d+', '', node).replace(' > ', '').replace(' < ', '').replace('.', '').replace('?', '')
+        if name not in PARAMETERIZED_CONDITION_NODES:
+            name = None
+        PARAMETERIZED_CONDITION_CACHE[node] = name
+        return name
+
 def is_parameterized_condition_node(node):
     """
     Returns True if node is in PARAMETERIZED_CONDITION_NODES,
     False otherwise
     """
-    if re.sub(r'\d+', '', node).replace(' > ', '').replace(' < ', '').replace('.', '').replace('?', '') \
-       in PARAMETERIZED_CONDITION_NODES:
-        return True
-    return False
+    return get_parameterized_condition_name(node) is not None
 
 def add_random_parameter(node):
     """
@@ -207,7 +286,7 @@ def is_condition_node(node):
     Returns True if node is condition node,
     False otherwise
     """
-    if node in CONDITION_NODES or is_parameterized_condition_node(node):
+    if node in CONDITION_SET or is_parameterized_condition_node(node):
         return True
     return False
 
@@ -227,7 +306,7 @@ def is_leaf_node(node):
     Returns True if node is condition node,
     False otherwise
     """
-    if node in LEAF_NODES or is_parameterized_condition_node(node):
+    if node in LEAF_SET or is_parameterized_condition_node(node):
         return True
     return False
 
@@ -247,10 +326,69 @@ def is_valid_node(node):
     Returns True if node is valid node,
     False otherwise
     """
-    if node in ALL_NODES or is_parameterized_condition_node(node):
+    if node in ALL_SET or is_parameterized_condition_node(node):
         return True
     return False
 
+def get_allowed_children(node):
+    """
+    Returns whether fallbacks and sequences are allowed as children of control node
+    """
+    return node not in FALLBACK_SET, node not in SEQUENCE_SET
+
+def is_allowed_child(node, fallback_allowed, sequence_allowed):
+    """
+    Returns True if node may be a child of a control node allowing
+    fallbacks and sequences as given
+    """
+    if node in FALLBACK_SET or node in ATOMIC_FALLBACK_SET:
+        return fallback_allowed
+    if node in SEQUENCE_SET or node in ATOMIC_SEQUENCE_SET:
+        return sequence_allowed
+    return True
+
+def get_canonical_condition(node, ranges=None):
+    """
+    Returns the normal form of a parameterized condition node, with the value written as the
+    integer that behaviors reads from it. ranges maps names of parameterized conditions to the
+    lowest and highest value that their variable takes in the world, which the min and max in the
+    settings do not say. Conditions that can never or will always succeed within the range of
+    their variable are returned as False or True.
+    """
+    values = re.findall(r'\d+', node)
+    if len(values) == 0:
+        return node
+    name = get_parameterized_condition_name(node)
+    value = int(values[0])
+    lower = '<' in node
+    canonical = name + (' < ' if lower else ' > ') + str(value) + '?'
+    if ranges is None or name not in ranges:
+        return canonical
+    minval, maxval = ranges[name]
+    if lower:
+        if value <= minval:
+            return False
+        if value > maxval:
+            return True
+    else:
+        if value >= maxval:
+            return False
+        if value < minval:
+            return True
+    return canonical
+
+def get_constant_condition(value):
+    """
+    Returns TRUE_NODE if value is True and FALSE_NODE otherwise
+    """
+    return TRUE_NODE if value else FALSE_NODE
+
+def get_hash(bt):
+    """
+    Returns a stable hash of a bt string
+    """
+    return hashlib.sha256(repr(tuple(bt)).encode()).hexdigest()
+
 class BT:
     """
     Class for handling string representations of behavior trees
@@ -260,7 +398,27 @@ class BT:
         """
         Creates a bt
         """
-        self.bt = bt[:]
+        self._bt = bt[:]
+        self.index = None
+
+    @property
+    def bt(self):
+        """
+        The bt string as a list of nodes. Setting it drops the index tables,
+        code changing the list in place from outside the class must call invalidate_index.
+        """
+        return self._bt
+
+    @bt.setter
+    def bt(self, bt):
+        self._bt = bt
+        self.index = None
+
+    def invalidate_index(self):
+        """
+        Drops the index tables of get_index, called by every method that changes bt in place
+        """
+        self.index = None
 
     def set(self, bt):
         """
@@ -271,116 +429,140 @@ class BT:
 
     def random(self, length):
         """
-        Creates a random bt of the given length
-        Tries to follow some of the rules for valid trees to speed up the process
+        Creates a random valid bt of the given length.
+        The tree is built top down one node at a time, only choosing nodes that are allowed where they are placed,
+        so no trees are rejected. Like random_candidate, a control node is closed after each action.
+        The last child of every control node is a behavior or a control node.
+        """
+        if length == 1:
+            self.bt = [random.choice(BEHAVIOR_NODES)]
+            return self.bt
+
+        self.bt = [random.choice(CONTROL_NODES)]
+        stack = [get_allowed_children(self.bt[0])]
+        for remaining in range(length - 1, 0, -1):
+            if remaining == 1:
+                #Last node must be able to end all open control nodes
+                node = random.choice([node for node in BEHAVIOR_NODES if is_allowed_child(node, *stack[-1])])
+            else:
+                node = BT.random_node()
+                while not is_allowed_child(node, *stack[-1]) or \
+                      (node == self.bt[-1] and is_condition_node(node)):
+                    node = BT.random_node()
+            self.bt.append(node)
+
+            if node in CONTROL_SET:
+                stack.append(get_allowed_children(node))
+            elif node in ACTION_SET and len(stack) > 1:
+                self.bt.append(UP_NODE[0])
+                stack.pop()
+        self.bt += [UP_NODE[0]] * len(stack)
+
+        return self.bt
+
+    def random_rejection(self, length):
+        """
+        Creates a random bt of the given length by drawing candidates
+        with random_candidate until one is valid
         """
         self.bt = []
         while not self.is_valid():
-            if length == 1:
-                self.bt = [random.choice(BEHAVIOR_NODES)]
-            else:
-                self.bt = [random.choice(CONTROL_NODES)]
-                for _ in range(length - 1):
-                    if self.bt[-1] in CONTROL_NODES:
+            self.random_candidate(length)
+        return self.bt
+
+    def random_candidate(self, length):
+        """
+        Creates a random bt of the given length that may not be valid
+        Tries to follow some of the rules for valid trees to speed up the process
+        """
+        if length == 1:
+            self.bt = [random.choice(BEHAVIOR_NODES)]
+        else:
+            self.bt = [random.choice(CONTROL_NODES)]
+            for _ in range(length - 1):
+                if self.bt[-1] in CONTROL_SET:
+                    child = [BT.random_node()]
+                    while child in UP_NODE:
                         child = [BT.random_node()]
-                        while child in UP_NODE:
-                            child = [BT.random_node()]
-                        self.bt += child
-                    else:
-                        self.bt += [BT.random_node()]
-
-                    if self.bt[-1] in ACTION_NODES:
-                        self.bt += [UP_NODE[0]]
-
-                for _ in range(length - self.length() - 1):
-                    # add nodes to match the number of individuals defined in length
-                    # this is required when random node gives 'up' nodes
-                    # condition nodes make it more likely to be valid
-                    self.bt += [get_random_condition_node()]
-                if self.length() < length:
-                    self.bt += [random.choice(BEHAVIOR_NODES)]
-                self.close()
+                    self.bt += child
+                else:
+                    self.bt += [BT.random_node()]
+
+                if self.bt[-1] in ACTION_SET:
+                    self.bt += [UP_NODE[0]]
+
+            for _ in range(length - self.length() - 1):
+                # add nodes to match the number of individuals defined in length
+                # this is required when random node gives 'up' nodes
+                # condition nodes make it more likely to be valid
+                self.bt += [get_random_condition_node()]
+            if self.length() < length:
+                self.bt += [random.choice(BEHAVIOR_NODES)]
+            self.close()
 
         return self.bt
 
     def is_valid(self):
         """
         Checks if bt is a valid behavior tree.
-        Checks are somewhat in order of likelihood to fail.
         """
-        valid = True
+        return self.find_violation() is None
 
-        #Empty string
+    def find_violation(self):
+        # pylint: disable=too-many-return-statements
+        """
+        Checks all rules for valid trees in a single pass over the bt.
+        Returns the index and a description of the first node breaking a rule,
+        or None if the bt is valid. The index is the length of the bt if up nodes are missing.
+        """
         if len(self.bt) <= 0:
-            valid = False
-
-        # The first element cannot be a leaf if after it there are other elements
-        elif (self.bt[0] not in CONTROL_NODES) and (len(self.bt) != 1):
-            valid = False
-
-        else:
-            for i in range(len(self.bt) - 1):
-                #'up' directly after a control node
-                if (self.bt[i] in CONTROL_NODES) and (self.bt[i+1] in UP_NODE):
-                    valid = False
+            return 0, 'empty tree'
+
+        stack = []
+        previous = None
+        for i, node in enumerate(self.bt):
+            if i > 0 and not stack:
+                return i, 'node after the root'
+            if node in UP_SET:
+                if not stack:
+                    return i, 'up without control node'
+                if previous in CONTROL_SET:
+                    return i, 'up directly after control node'
+                stack.pop()
+            else:
+                if not is_valid_node(node):
+                    return i, 'unknown node'
                 #Identical condition nodes directly after one another - waste
-                elif self.bt[i] == self.bt[i+1] and is_condition_node(self.bt[i]):
-                    valid = False
-                # check for non-BT elements
-                elif not is_valid_node(self.bt[i]):
-                    valid = False
-
-            if valid:
-                # Check on the bt depth: to be > 0
-                depth = self.depth()
-                if (depth < 0) or (depth == 0 and len(self.bt) > 1):
-                    valid = False
-
-            if valid and self.bt[0] in CONTROL_NODES:
-                fallback_allowed = True
-                sequence_allowed = True
-                if self.bt[0] in FALLBACK_NODES:
-                    fallback_allowed = False
-                elif self.bt[0] in SEQUENCE_NODES:
-                    sequence_allowed = False
-                valid = self.is_subtree_valid(self.bt[1:], fallback_allowed, sequence_allowed)
-        return valid
-
-    def is_subtree_valid(self, string, fallback_allowed, sequence_allowed):
-        # pylint: disable=too-many-return-statements, too-many-branches
+                if node == previous and is_condition_node(node):
+                    return i, 'identical conditions'
+                if stack and not is_allowed_child(node, *stack[-1]):
+                    return i, 'fallback in fallback' if stack[-1][1] else 'sequence in sequence'
+                if node in CONTROL_SET:
+                    stack.append(get_allowed_children(node))
+            previous = node
+
+        if stack:
+            return len(self.bt), 'missing up'
+        return None
+
+    @staticmethod
+    def is_subtree_valid(string, fallback_allowed, sequence_allowed):
         """
         Checks whether the subtree starting with string[0] is valid according to a couple rules
         1. Fallbacks must not be children of fallbacks
         2. Sequences must not be children of sequences
-        """
-        while len(string) > 0:
-            node = string.pop(0)
-
-            if node in UP_NODE:
-                return True
-            if node in ATOMIC_FALLBACK_NODES:
-                if not fallback_allowed:
-                    return False
-            elif node in ATOMIC_SEQUENCE_NODES:
-                if not sequence_allowed:
-                    return False
-            elif node in CONTROL_NODES:
-                if node in FALLBACK_NODES:
-                    if fallback_allowed:
-                        if not self.is_subtree_valid(string, False, True):
-                            return False
-                    else:
-                        return False
-                elif node in SEQUENCE_NODES:
-                    if sequence_allowed:
-                        if not self.is_subtree_valid(string, True, False):
-                            return False
-                    else:
-                        return False
-                else:
-                    if not self.is_subtree_valid(string, True, True):
-                        return False
-
+        Returns True when the up node closing the subtree is reached. String is not modified.
+        """
+        stack = [(fallback_allowed, sequence_allowed)]
+        for node in string:
+            if node in UP_SET:
+                stack.pop()
+                if not stack:
+                    return True
+            elif not is_allowed_child(node, *stack[-1]):
+                return False
+            elif node in CONTROL_SET:
+                stack.append(get_allowed_children(node))
         return False
 
     def close(self):
@@ -391,13 +573,13 @@ class BT:
 
         #Make sure tree always ends with up node if starts with control node
         if len(self.bt) > 0:
-            if self.bt[0] in CONTROL_NODES and self.bt[len(self.bt)-1] not in UP_NODE:
+            if self.bt[0] in CONTROL_SET and self.bt[len(self.bt)-1] not in UP_SET:
                 self.bt += UP_NODE
 
         for node in self.bt:
-            if node in CONTROL_NODES:
+            if node in CONTROL_SET:
                 open_subtrees += 1
-            elif node in UP_NODE:
+            elif node in UP_SET:
                 open_subtrees -= 1
 
         if open_subtrees > 0:
@@ -407,29 +589,144 @@ class BT:
             for _ in range(-open_subtrees):
                 #Do not remove the very last node, and only up nodes
                 for j in range(len(self.bt) - 2, 0, -1): # pragma: no branch, we will always find an up
-                    if self.bt[j] in UP_NODE:
+                    if self.bt[j] in UP_SET:
                         self.bt.pop(j)
                         break
+        self.invalidate_index()
 
     def trim(self):
         """
         Removes control nodes with only one child
         """
-        for index in range(len(self.bt) -1, -1, -1):
-            if self.bt[index] in CONTROL_NODES:
-                children = self.find_children(index)
-                if len(children) <= 1:
-                    up_node_index = self.find_up_node(index)
-                    self.bt.pop(up_node_index)
-                    if len(children) == 1:
-                        parent = self.find_parent(index)
-                        if parent is not None and self.bt[parent] == self.bt[children[0]]:
+        parents, children, _ = self.get_index()
+        removed = [False] * len(self.bt)
+        #Number of children after trimming, and number of nodes that replace the node in its parent
+        n_children = [0] * len(self.bt)
+        n_replacing = [1] * len(self.bt)
+        #The node that replaces the node in its parent when there is only one
+        replacing = list(range(len(self.bt)))
+
+        #Children are always after their parents so they are trimmed first
+        for index in range(len(self.bt) - 1, -1, -1):
+            if self.bt[index] in CONTROL_SET:
+                n_children[index] = sum(n_replacing[child] for child in children[index])
+                if n_children[index] <= 1:
+                    removed[index] = True
+                    removed[self.find_up_node(index)] = True
+                    n_replacing[index] = n_children[index]
+                    if n_children[index] == 1:
+                        child = [replacing[child] for child in children[index] if n_replacing[child] == 1][0]
+                        replacing[index] = child
+                        parent = parents[index]
+                        if parent is not None and self.bt[parent] == self.bt[child]:
                             #Parent and only child will be identical control nodes,
                             #child can be removed
-                            up_node_index = self.find_up_node(children[0])
-                            self.bt.pop(up_node_index)
-                            self.bt.pop(children[0])
-                    self.bt.pop(index)
+                            removed[child] = True
+                            removed[self.find_up_node(child)] = True
+                            n_replacing[index] = n_children[child]
+
+        self.bt[:] = [node for node, remove in zip(self.bt, removed) if not remove]
+        self.invalidate_index()
+
+    def canonicalize(self, ranges=None):
+        """
+        Rewrites the bt into a normal form that behaves the same in every tick:
+        Parameterized conditions are normalized and constant ones removed where possible,
+        nested control nodes of the same type are merged, children that can never be
+        reached and repeated conditions are removed, and control nodes with only one child
+        are replaced by the child. Conditions are constant if they always or never succeed
+        within ranges, see get_canonical_condition, and constant subtrees that can't be removed
+        are written as TRUE_NODE or FALSE_NODE. Assumes a valid bt. Returns the new bt.
+        """
+        subtree, _ = self.get_nested(0)
+        subtree = BT.simplify(subtree, ranges)
+        self.bt = BT.get_flat(subtree)
+        return self.bt
+
+    def canonical_hash(self, ranges=None):
+        """
+        Returns a stable hash of the normal form of the bt, equal for bts that behave the same
+        """
+        return get_hash(BT(self.bt).canonicalize(ranges))
+
+    def get_nested(self, index):
+        """
+        Returns the subtree at index as a nested list, [control node, child, child...]
+        for control nodes and the node itself for leaves, and the index after the subtree
+        """
+        node = self.bt[index]
+        if node not in CONTROL_SET:
+            return node, index + 1
+        subtree = [node]
+        index += 1
+        while index < len(self.bt) and self.bt[index] not in UP_SET:
+            child, index = self.get_nested(index)
+            subtree.append(child)
+        return subtree, index + 1
+
+    @staticmethod
+    def get_flat(subtree):
+        """
+        Returns the bt string of a nested subtree
+        """
+        if isinstance(subtree, bool):
+            return [get_constant_condition(subtree)]
+        if isinstance(subtree, str):
+            return [subtree]
+        bt = [subtree[0]]
+        for child in subtree[1:]:
+            bt += BT.get_flat(child)
+        return bt + [UP_NODE[0]]
+
+    @staticmethod
+    def simplify(subtree, ranges=None):
+        """
+        Simplifies a nested subtree, see canonicalize.
+        Returns True or False for subtrees that always succeed or fail without doing anything.
+        """
+        if isinstance(subtree, str):
+            if subtree in (TRUE_NODE, FALSE_NODE):
+                return subtree == TRUE_NODE
+            if is_parameterized_condition_node(subtree):
+                return get_canonical_condition(subtree, ranges)
+            return subtree
+
+        node = subtree[0]
+        children = []
+        for child in subtree[1:]:
+            child = BT.simplify(child, ranges)
+            if isinstance(child, list) and child[0] == node:
+                children += child[1:]
+            else:
+                children.append(child)
+
+        if node in FALLBACK_SET:
+            neutral = False
+        elif node in SEQUENCE_SET:
+            neutral = True
+        else:
+            return [node] + children
+
+        simplified = []
+        for child in children:
+            if child is neutral:
+                continue
+            if isinstance(child, bool):
+                #All later children are unreachable
+                if len(simplified) == 0:
+                    return child
+                simplified.append(child)
+                break
+            if isinstance(child, str) and len(simplified) > 0 and child == simplified[-1] and is_condition_node(child):
+                #Repeated condition gives the same result, nothing has been done in between
+                continue
+            simplified.append(child)
+
+        if len(simplified) == 0:
+            return neutral
+        if len(simplified) == 1:
+            return simplified[0]
+        return [node] + simplified
 
     def depth(self):
         """
@@ -439,12 +736,12 @@ class BT:
         max_depth = 0
 
         for i in range(len(self.bt)):
-            if self.bt[i] in CONTROL_NODES:
+            if self.bt[i] in CONTROL_SET:
                 depth += 1
                 max_depth = max(depth, max_depth)
-            elif self.bt[i] in UP_NODE:
+            elif self.bt[i] in UP_SET:
                 depth -= 1
-                if (depth < 0) or (depth == 0 and i is not len(self.bt) - 1):
+                if (depth < 0) or (depth == 0 and i != len(self.bt) - 1):
                     return -1
 
         if depth != 0:
@@ -458,7 +755,7 @@ class BT:
         """
         length = 0
         for node in self.bt:
-            if node not in UP_NODE:
+            if node not in UP_SET:
                 length += 1
         return length
 
@@ -479,22 +776,22 @@ class BT:
         """
         Changes node at index
         """
-        if self.bt[index] in UP_NODE:
+        if self.bt[index] in UP_SET:
             return
 
         if new_node is None:
             new_node = BT.random_node()
 
         # Change control node to leaf node, remove whole subtree
-        if self.bt[index] in CONTROL_NODES and is_leaf_node(new_node):
+        if self.bt[index] in CONTROL_SET and is_leaf_node(new_node):
             self.delete_node(index)
             self.bt.insert(index, new_node)
 
         # Change leaf node to control node. Add up and extra condition/behavior node child
-        elif new_node in CONTROL_NODES and is_leaf_node(self.bt[index]):
+        elif new_node in CONTROL_SET and is_leaf_node(self.bt[index]):
             old_node = self.bt[index]
             self.bt[index] = new_node
-            if old_node in BEHAVIOR_NODES:
+            if old_node in BEHAVIOR_SET:
                 self.bt.insert(index + 1, get_random_leaf_node())
                 self.bt.insert(index + 2, old_node)
             else: #CONDITION_NODE
@@ -503,6 +800,7 @@ class BT:
             self.bt.insert(index + 3, UP_NODE[0])
         else:
             self.bt[index] = new_node
+        self.invalidate_index()
 
     def add_node(self, index, new_node=None):
         """
@@ -510,7 +808,7 @@ class BT:
         """
         if new_node is None:
             new_node = BT.random_node()
-        if new_node in CONTROL_NODES:
+        if new_node in CONTROL_SET:
             if index == 0:
                 #Adding new control node to encapsulate entire tree
                 self.bt.insert(index, new_node)
@@ -522,84 +820,74 @@ class BT:
                 self.bt.insert(index + 3, UP_NODE[0])
         else:
             self.bt.insert(index, new_node)
+        self.invalidate_index()
 
     def delete_node(self, index):
         """
         Deletes node at index
         """
-        if self.bt[index] in UP_NODE:
+        if self.bt[index] in UP_SET:
             return
 
-        if self.bt[index] in CONTROL_NODES:
-            up_node_index = self.find_up_node(index)
-            for i in range(up_node_index, index, -1):
-                self.bt.pop(i)
-
-        self.bt.pop(index)
+        if self.bt[index] in CONTROL_SET:
+            del self.bt[index : self.find_up_node(index) + 1]
+        else:
+            self.bt.pop(index)
+        self.invalidate_index()
+
+    def get_index(self):
+        """
+        Returns tables of parents, children and up nodes of all nodes, built in one pass.
+        The tables are kept until the bt is changed, see invalidate_index.
+        Up nodes have the control node they close as parent.
+        """
+        if self.index is None:
+            parents = [None] * len(self.bt)
+            children = [[] for _ in self.bt]
+            up_nodes = [None] * len(self.bt)
+            open_nodes = []
+            for i, node in enumerate(self.bt):
+                if node in UP_SET:
+                    if open_nodes:
+                        parents[i] = open_nodes.pop()
+                        up_nodes[parents[i]] = i
+                    continue
+                if open_nodes:
+                    parents[i] = open_nodes[-1]
+                    children[open_nodes[-1]].append(i)
+                if node in CONTROL_SET:
+                    open_nodes.append(i)
+            self.index = (parents, children, up_nodes)
+        return self.index
 
     def find_parent(self, index):
         """
         Returns index of the closest parent to the node at input index
         """
-        if index == 0:
-            return None
-
-        parent = index
-        siblings_left = 0
-        while parent > 0:
-            parent -= 1
-            if self.bt[parent] in CONTROL_NODES:
-                if siblings_left == 0:
-                    return parent
-                siblings_left -= 1
-            elif self.bt[parent] in UP_NODE:
-                siblings_left += 1
-        return None
+        return self.get_index()[0][index]
 
     def find_children(self, index):
         """
         Finds all children to the node at index
         """
-        children = []
-        if self.bt[index] in CONTROL_NODES:
-            child = index + 1
-            level = 0
-            while level >= 0:
-                if self.bt[child] in UP_NODE:
-                    level -= 1
-                elif level == 0:
-                    children.append(child)
-
-                if self.bt[child] in CONTROL_NODES:
-                    level += 1
-                child += 1
-
-        return children
+        return self.get_index()[1][index][:]
 
     def find_up_node(self, index):
         """
         Returns index of the up node connected to the control node at input index
         """
-        if self.bt[index] not in CONTROL_NODES:
+        if self.bt[index] not in CONTROL_SET:
             raise Exception('Invalid call. Node at index not a control node')
 
         if index == 0:
-            if self.bt[len(self.bt)-1] in UP_NODE:
-                index = len(self.bt) - 1
-            else:
-                raise Exception('Changing invalid BT. Missing up.')
-        else:
-            level = 1
-            while level > 0:
-                index += 1
-                if index == len(self.bt):
-                    raise Exception('Changing invalid BT. Missing up.')
-                if self.bt[index] in CONTROL_NODES:
-                    level += 1
-                elif self.bt[index] in UP_NODE:
-                    level -= 1
-
-        return index
+            if self.bt[len(self.bt)-1] in UP_SET:
+                return len(self.bt) - 1
+            raise Exception('Changing invalid BT. Missing up.')
+
+        up_node_index = self.get_index()[2][index]
+        if up_node_index is None:
+            raise Exception('Changing invalid BT. Missing up.')
+        return up_node_index
 
     def get_subtree(self, index):
         """
@@ -607,7 +895,7 @@ class BT:
         """
         subtree = []
 
-        if self.bt[index] in CONTROL_NODES:
+        if self.bt[index] in CONTROL_SET:
             subtree = self.bt[index : self.find_up_node(index) + 1]
         elif is_leaf_node(self.bt[index]):
             subtree = [self.bt[index]]
@@ -620,8 +908,8 @@ class BT:
         """
         Insert subtree at given index
         """
-        for i in range(len(subtree)):
-            self.bt.insert(index + i, subtree.pop(0))
+        self.bt[index:index] = subtree
+        self.invalidate_index()
 
     def swap_subtrees(self, bt2, index1, index2):
         """
@@ -631,17 +919,13 @@ class BT:
         subtree2 = bt2.get_subtree(index2)
 
         if subtree1 != [] and subtree2 != []:
-            # Remove subtrees that will be replaced
-            for _ in range(len(subtree1)):
-                self.bt.pop(index1)
-            for _ in range(len(subtree2)):
-                bt2.bt.pop(index2)
-
-            self.insert_subtree(subtree2, index1)
-            bt2.insert_subtree(subtree1, index2)
+            self.bt[index1 : index1 + len(subtree1)] = subtree2
+            bt2.bt[index2 : index2 + len(subtree2)] = subtree1
+            self.invalidate_index()
+            bt2.invalidate_index()
 
     def is_subtree(self, index):
         """
         Checks if node at index is root of a subtree
         """
-        return bool(0 <= index < len(self.bt) and self.bt[index] not in UP_NODE)
+        return bool(0 <= index < len(self.bt) and self.bt[index] not in UP_SET)
@@ -15,7 +15,9 @@ def get_node_from_string(string, world_interface, verbose=False):
     """
     has_children = False
 
-    if 'at station ' in string:
+    if string in ('true?', 'false?'):
+        node = Constant(string, string == 'true?')
+    elif 'at station ' in string:
         node = AtStation(string, world_interface, string[11:])
     elif 'battery level ' in string:
         node = BatteryLevel(string, world_interface, re.findall(r'\d+', string))
@@ -77,6 +79,8 @@ class AtStation(pt.behaviour.Behaviour):
     """
     Check if robot is at given station
     """
+    __slots__ = ('world_interface', 'station')
+
     def __init__(self, name, world_interface, station):
         self.world_interface = world_interface
         self.station = sm.get_station_from_string(station)
@@ -87,10 +91,23 @@ class AtStation(pt.behaviour.Behaviour):
             return pt.common.Status.SUCCESS
         return pt.common.Status.FAILURE
 
+    def get_steady_ticks(self, forecast):
+        """
+        Returns for how many ticks of a forecast from the world interface the condition keeps its status
+        """
+        success = self.status == pt.common.Status.SUCCESS
+        for ticks, station in enumerate(forecast['station']):
+            if (station == self.station) != success:
+                return ticks
+        return len(forecast['station'])
+
 class ComparisonCondition(pt.behaviour.Behaviour):
     """
     Class template for conditions comparing against constants
     """
+    __slots__ = ('world_interface', 'lower', 'value')
+    variable = None #Name of the compared state variable, set by subclasses
+
     def __init__(self, name, world_interface, value):
         self.world_interface = world_interface
         self.lower = is_lower_than(name)
@@ -104,10 +121,26 @@ class ComparisonCondition(pt.behaviour.Behaviour):
             return pt.common.Status.SUCCESS
         return pt.common.Status.FAILURE
 
+    def get_steady_ticks(self, forecast):
+        """
+        Returns for how many ticks of a forecast from the world interface the condition keeps its status.
+        Variables that are not in the forecast do not change.
+        """
+        values = forecast.get(self.variable)
+        if values is None:
+            return len(forecast['station'])
+        for ticks, value in enumerate(values):
+            if self.compare(value) != self.status:
+                return ticks
+        return len(values)
+
 class BatteryLevel(ComparisonCondition):
     """
     Checks battery level
     """
+    __slots__ = ()
+    variable = 'battery_level'
+
     def update(self):
         return self.compare(self.world_interface.state.battery_level)
 
@@ -115,6 +148,9 @@ class CarriedWeight(ComparisonCondition):
     """
     Check the currently carried weight
     """
+    __slots__ = ()
+    variable = 'carried_weight'
+
     def update(self):
         return self.compare(self.world_interface.state.carried_weight)
 
@@ -122,6 +158,9 @@ class CarriedLight(ComparisonCondition):
     """
     Check the currently carried number of light objects
     """
+    __slots__ = ()
+    variable = 'carried_light'
+
     def update(self):
         return self.compare(self.world_interface.state.carried_light)
 
@@ -129,6 +168,9 @@ class CarriedHeavy(ComparisonCondition):
     """
     Check the currently carried number of heavy objects
     """
+    __slots__ = ()
+    variable = 'carried_heavy'
+
     def update(self):
         return self.compare(self.world_interface.state.carried_heavy)
 
@@ -136,6 +178,9 @@ class ConveyorLight(ComparisonCondition):
     """
     Check the current number of light objects on conveyor
     """
+    __slots__ = ()
+    variable = 'cnv_n_light'
+
     def update(self):
         return self.compare(self.world_interface.state.cnv_n_light)
 
@@ -143,13 +188,35 @@ class ConveyorHeavy(ComparisonCondition):
     """
     Check the current number of heavy objects on conveyor
     """
+    __slots__ = ()
+    variable = 'cnv_n_heavy'
+
     def update(self):
         return self.compare(self.world_interface.state.cnv_n_heavy)
 
+class Constant(pt.behaviour.Behaviour):
+    """
+    Condition that always succeeds or always fails
+    """
+    __slots__ = ('result',)
+
+    def __init__(self, name, success):
+        self.result = pt.common.Status.SUCCESS if success else pt.common.Status.FAILURE
+        super(Constant, self).__init__(name)
+
+    def update(self):
+        return self.result
+
+    def get_steady_ticks(self, forecast):
+        """ Returns for how many ticks of a forecast the condition keeps its status, which is all of them """
+        return len(forecast['station'])
+
 class SmBehavior(pt.behaviour.Behaviour):
     """
     Class template for state machine behaviors
     """
+    __slots__ = ('world_interface', 'state', 'verbose')
+
     def __init__(self, name, world_interface, verbose=False):
         self.world_interface = world_interface
         self.state = None
@@ -176,6 +243,8 @@ class Idle(SmBehavior):
     """
     Do nothing
     """
+    __slots__ = ()
+
     def initialise(self):
         self.state = pt.common.Status.RUNNING
 
@@ -192,6 +261,8 @@ class Charge(SmBehavior):
     """
     Charge robot
     """
+    __slots__ = ()
+
     def initialise(self):
         self.state = pt.common.Status.RUNNING
 
@@ -215,6 +286,8 @@ class MoveTo(SmBehavior):
     """
     Move towards station
     """
+    __slots__ = ('station',)
+
     def __init__(self, name, world_interface, station, verbose=False):
         self.station = sm.get_station_from_string(station)
         super(MoveTo, self).__init__(name, world_interface, verbose)
@@ -227,6 +300,18 @@ class MoveTo(SmBehavior):
         if self.world_interface.at_station(self.station):
             self.success()
 
+    def get_forecast(self, max_ticks):
+        """
+        Returns the world interface forecast of the next ticks in which this behavior keeps moving
+        """
+        return self.world_interface.forecast_move(self.station, max_ticks)
+
+    def macro_step(self, ticks):
+        """
+        Moves for the given number of ticks at once, as ticking this behavior while RUNNING would
+        """
+        self.world_interface.macro_move(self.station, ticks)
+
     def update(self):
         self.check_for_success()
         super(MoveTo, self).update()
@@ -242,6 +327,8 @@ class Pick(SmBehavior):
     """
     Pick up an object
     """
+    __slots__ = ()
+
     def __init__(self, name, world_interface, verbose=False):
         super(Pick, self).__init__(name, world_interface, verbose)
 
@@ -262,6 +349,8 @@ class Place(SmBehavior):
     """
     Places all objects held at current position
     """
+    __slots__ = ()
+
     def __init__(self, name, world_interface, verbose=False):
         super(Place, self).__init__(name, world_interface, verbose)
 
@@ -285,6 +374,8 @@ class RSequence(pt.composites.Selector):
 
     Author: Christopher Iliffe Sprague, sprague@kth.se
     """
+    __slots__ = ()
+
 
     def __init__(self, name="Sequence", children=None):
         super(RSequence, self).__init__(name=name, children=children)
@@ -297,7 +388,8 @@ class RSequence(pt.composites.Selector):
         Yields:
             :class:`~py_trees.behaviour.Behaviour`: a reference to itself or one of its children
         """
-        self.logger.debug("%s.tick()" % self.__class__.__name__)
+        if pt.logging.level < pt.logging.Level.INFO:
+            self.logger.debug("%s.tick()" % self.__class__.__name__)
         # Required behaviour for *all* behaviours and composites is
         # for tick() to check if it isn't running and initialise
         if self.status != pt.common.Status.RUNNING:
@@ -308,27 +400,58 @@ class RSequence(pt.composites.Selector):
         # run any work designated by a customized instance of this class
         self.update()
         previous = self.current_child
-        for child in self.children:
+        for index, child in enumerate(self.children):
+            if index > self.high_water:
+                self.high_water = index
             for node in child.tick():
                 yield node
                 if node is child and \
                     (node.status == pt.common.Status.RUNNING or node.status == pt.common.Status.FAILURE):
                     self.current_child = child
+                    self.current_index = index
                     self.status = node.status
                     if previous is None or previous != self.current_child:
                         # we interrupted, invalidate everything at a lower priority
-                        passed = False
-                        for sibling in self.children:
-                            if passed and sibling.status != pt.common.Status.INVALID:
-                                sibling.stop(pt.common.Status.INVALID)
-                            if sibling == self.current_child:
-                                passed = True
+                        self.stop_lower_priority(index)
                     yield self
                     return
         # all children succeded, set succeed ourselves and current child to the last bugger who failed us
         self.status = pt.common.Status.SUCCESS
         try:
             self.current_child = self.children[-1]
+            self.current_index = len(self.children) - 1
         except IndexError:
             self.current_child = None
         yield self
+
+    def tick_direct(self):
+        """
+        Same as tick but returns the status directly instead of yielding the ticked nodes
+        """
+        if type(self).tick is not RSequence.tick:
+            return pt.behaviour.Behaviour.tick_direct(self)
+        if pt.logging.level < pt.logging.Level.INFO:
+            self.logger.debug("%s.tick_direct()" % self.__class__.__name__)
+        if self.status != pt.common.Status.RUNNING:
+            self.initialise()
+        self.update()
+        previous = self.current_child
+        for index, child in enumerate(self.children):
+            if index > self.high_water:
+                self.high_water = index
+            status = child.tick_direct()
+            if status == pt.common.Status.RUNNING or status == pt.common.Status.FAILURE:
+                self.current_child = child
+                self.current_index = index
+                self.status = status
+                if previous is None or previous != self.current_child:
+                    # we interrupted, invalidate everything at a lower priority
+                    self.stop_lower_priority(index)
+                return status
+        self.status = pt.common.Status.SUCCESS
+        try:
+            self.current_child = self.children[-1]
+            self.current_index = len(self.children) - 1
+        except IndexError:
+            self.current_child = None
+        return self.status
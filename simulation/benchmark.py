@@ -0,0 +1,123 @@
+"""
+Benchmarks of the slowest phases of learning behavior trees
+Run with python -m simulation.benchmark
+"""
+from dataclasses import dataclass
+import random
+import time
+import tracemalloc
+import simulation.behavior_tree as behavior_tree
+import simulation.behaviors as behaviors
+import simulation.conveyor_kitting as sm
+from simulation.py_trees_interface import PyTree
+
+KITTING_TREES = [['s(', 'f(', 'battery level > 50?', 's(', 'move to CHARGE1!', 'charge!', ')', ')', \
+                        'f(', 'carried weight > 3?', 's(', 'move to CONVEYOR_LIGHT!', 'pick!', ')', ')', \
+                        'move to DELIVERY!', 'place!', ')'],
+                 ['s(', 'f(', 'battery level > 30?', 'sm(', 'move to CHARGE2!', 'charge!', ')', ')', \
+                        'f(', 'carried weight > 7?', \
+                              'fm(', 'sm(', 'conveyor heavy > 0?', 'move to CONVEYOR_HEAVY!', 'pick!', ')', \
+                                     's(', 'move to CONVEYOR_LIGHT!', 'pick!', ')', ')', ')', \
+                        'move to DELIVERY!', 'place!', ')']]
+"""
+Hand written trees solving the kitting task, used as typical trees in benchmarks
+"""
+
+@dataclass
+class GeneratorResult:
+    """
+    Result of generating random trees of one length with one method
+    """
+    method: str
+    length: int
+    trees: int = 0
+    candidates: int = 0
+    time: float = 0.0
+
+    def acceptance_rate(self):
+        """ Returns the fraction of candidate trees that were valid """
+        return self.trees / self.candidates if self.candidates > 0 else 0.0
+
+    def throughput(self):
+        """ Returns the number of valid trees generated per second """
+        return self.trees / self.time if self.time > 0 else 0.0
+
+    def __str__(self):
+        return "%-10s length: %4d trees: %6d acceptance rate: %6.4f trees/s: %10.1f" % \
+            (self.method, self.length, self.trees, self.acceptance_rate(), self.throughput())
+
+def benchmark_random(lengths, n_trees=100, max_time=10.0, seed=0):
+    """
+    Generates n_trees random trees of each length both with the constructive BT.random
+    and by rejection sampling as in BT.random_rejection, and returns a list of results.
+    Rejection sampling of each length stops after max_time seconds.
+    """
+    results = []
+    bt = behavior_tree.BT([])
+    for length in lengths:
+        random.seed(seed)
+        result = GeneratorResult('random', length)
+        start = time.time()
+        for _ in range(n_trees):
+            bt.random(length)
+        result.time = time.time() - start
+        result.trees = n_trees
+        result.candidates = n_trees
+        results.append(result)
+
+        random.seed(seed)
+        result = GeneratorResult('rejection', length)
+        start = time.time()
+        while result.trees < n_trees and time.time() - start < max_time:
+            bt.random_candidate(length)
+            result.candidates += 1
+            if bt.is_valid():
+                result.trees += 1
+        result.time = time.time() - start
+        results.append(result)
+    return results
+
+def benchmark_tick(trees=None, episodes=10, max_ticks=200):
+    """
+    Runs episodes of each tree with PyTree in seeded simulations and returns the number of ticks per second.
+    The kitting trees are used if no trees are given.
+    """
+    if trees is None:
+        trees = KITTING_TREES
+    ticks = 0
+    start = time.time()
+    for tree in trees:
+        for seed in range(episodes):
+            world = sm.Simulation(seed=seed)
+            pytree = PyTree(tree[:], behaviors=behaviors, world_interface=world)
+            ticks += pytree.run_bt(max_ticks=max_ticks)[0]
+    return ticks / (time.time() - start)
+
+def benchmark_construction(trees=None, repeats=1000):
+    """
+    Builds each tree repeats times with PyTree and returns the number of trees built per second
+    and the average memory in bytes held by one built tree.
+    The kitting trees are used if no trees are given.
+    """
+    if trees is None:
+        trees = KITTING_TREES
+    world = sm.Simulation(seed=0)
+    start = time.time()
+    for tree in trees:
+        for _ in range(repeats):
+            PyTree(tree[:], behaviors=behaviors, world_interface=world)
+    trees_per_second = len(trees) * repeats / (time.time() - start)
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    pytrees = [PyTree(tree[:], behaviors=behaviors, world_interface=world) for tree in trees for _ in range(100)]
+    memory = (tracemalloc.get_traced_memory()[0] - before) / len(pytrees)
+    tracemalloc.stop()
+    return trees_per_second, memory
+
+if __name__ == "__main__":
+    behavior_tree.load_settings_from_file('simulation/BT_SETTINGS.yaml')
+    for benchmark_result in benchmark_random([1, 5, 10, 15, 20, 30, 50]):
+        print(benchmark_result)
+    print("PyTree ticks/s: %.1f" % benchmark_tick(episodes=50))
+    print("PyTree trees/s: %.1f bytes/tree: %.0f" % benchmark_construction())
@@ -0,0 +1,348 @@
+"""
+Compiles behavior tree strings into a flat program and runs it with a small interpreter.
+The interpreter reproduces the statuses of the py_trees behaviors in simulation.behaviors
+without building any py_trees objects, so it can replace PyTree when only the
+fitness and the world trajectory are of interest.
+"""
+import re
+from dataclasses import dataclass
+import time
+import simulation.behavior_tree as behavior_tree
+import simulation.conveyor_kitting as sm
+
+#Status codes
+INVALID = 0
+SUCCESS = 1
+FAILURE = 2
+RUNNING = 3
+
+#Opcodes
+OP_FALLBACK = 0
+OP_FALLBACK_MEMORY = 1
+OP_SEQUENCE = 2
+OP_SEQUENCE_MEMORY = 3
+OP_AT_STATION = 4
+OP_GREATER_THAN = 5
+OP_LOWER_THAN = 6
+OP_IDLE = 7
+OP_CHARGE = 8
+OP_MOVETO = 9
+OP_PICK = 10
+OP_PLACE = 11
+OP_CONSTANT = 12
+
+COMPARISON_VARIABLES = {'battery level ': 'battery_level',
+                        'carried weight ': 'carried_weight',
+                        'carried light ': 'carried_light',
+                        'carried heavy ': 'carried_heavy',
+                        'conveyor light ': 'cnv_n_light',
+                        'conveyor heavy ': 'cnv_n_heavy'}
+
+#Lowest and highest value of the variable of each parameterized condition, keyed by the condition name,
+#for behavior_tree.BT.canonicalize
+CONDITION_RANGES = {name.strip(): sm.VARIABLE_RANGES[variable] for name, variable in COMPARISON_VARIABLES.items()}
+
+@dataclass
+class Program:
+    """
+    A behavior tree compiled into flat lists indexed by node, with nodes in the same order as in the string.
+    The subtree of node i occupies nodes i to end[i] - 1.
+    """
+    opcodes: list
+    args: list
+    children: list
+    end: list
+
+def get_instruction_from_string(string):
+    # pylint: disable=too-many-return-statements
+    """
+    Returns opcode, argument and whether the node has children given the string,
+    recognizing strings the same way as behaviors.get_node_from_string
+    """
+    if string in (behavior_tree.TRUE_NODE, behavior_tree.FALSE_NODE):
+        return OP_CONSTANT, SUCCESS if string == behavior_tree.TRUE_NODE else FAILURE, False
+    if 'at station ' in string:
+        return OP_AT_STATION, sm.get_station_from_string(string[11:]), False
+    for name, variable in COMPARISON_VARIABLES.items():
+        if name in string:
+            opcode = OP_LOWER_THAN if '<' in string else OP_GREATER_THAN
+            return opcode, (variable, int(re.findall(r'\d+', string)[0])), False
+
+    if 'idle' in string:
+        return OP_IDLE, None, False
+    if 'charge' in string:
+        return OP_CHARGE, None, False
+    if 'move to' in string:
+        return OP_MOVETO, sm.get_station_from_string(string[7:]), False
+    if 'pick' in string:
+        return OP_PICK, None, False
+    if 'place' in string:
+        return OP_PLACE, None, False
+
+    if string == 'f(':
+        return OP_FALLBACK, None, True
+    if string == 'fm(':
+        return OP_FALLBACK_MEMORY, None, True
+    if string == 's(':
+        return OP_SEQUENCE, None, True
+    if string == 'sm(':
+        return OP_SEQUENCE_MEMORY, None, True
+    raise Exception("Unexpected character", string)
+
+def compile_bt(string):
+    """
+    Compiles a behavior tree string into a program.
+    Missing up nodes at the end are accepted in the same way as PyTree.create_from_string does.
+    """
+    program = Program([], [], [], [])
+    stack = []
+    for node in string:
+        if node == ')':
+            if stack:
+                program.end[stack.pop()] = len(program.opcodes)
+            if not stack:
+                break
+            continue
+        index = len(program.opcodes)
+        opcode, arg, has_children = get_instruction_from_string(node)
+        program.opcodes.append(opcode)
+        program.args.append(arg)
+        program.children.append([])
+        program.end.append(index + 1)
+        if stack:
+            program.children[stack[-1]].append(index)
+        if has_children:
+            stack.append(index)
+        elif not stack:
+            break
+    for parent in stack:
+        program.end[parent] = len(program.opcodes)
+    program.children = [tuple(children) for children in program.children]
+    return program
+
+class CompiledTree:
+    """
+    A behavior tree compiled from a string, ticked by an interpreter keeping the
+    status and current child of every node in flat lists
+    """
+    def __init__(self, string, world_interface, verbose=False):
+        bt = behavior_tree.BT(string)
+        self.depth = bt.depth()
+        self.length = bt.length()
+        self.world_interface = world_interface
+        self.verbose = verbose
+        self.failed = False
+        self.timeout = False
+
+        self.program = compile_bt(string)
+        self.status = [INVALID] * len(self.program.opcodes)
+        self.current = [-1] * len(self.program.opcodes)
+
+    def reset(self, world_interface):
+        """
+        Prepares the tree for a new episode in world_interface, as if it had just been created
+        """
+        self.world_interface = world_interface
+        self.failed = False
+        self.timeout = False
+        self.status = [INVALID] * len(self.program.opcodes)
+        self.current = [-1] * len(self.program.opcodes)
+
+    def stop(self, node):
+        """
+        Invalidates node and its subtree. Since an invalid node only has invalid
+        children this is the same as stopping the children recursively.
+        """
+        status = self.status
+        current = self.current
+        for i in range(node, self.program.end[node]):
+            status[i] = INVALID
+            current[i] = -1
+
+    def stop_lower_priority(self, children, index):
+        """ Invalidates the children after index that are not already invalid """
+        status = self.status
+        for child in children[index + 1:]:
+            if status[child] != INVALID:
+                self.stop(child)
+
+    def tick_node(self, node):
+        # pylint: disable=too-many-branches, too-many-statements, too-many-locals
+        """
+        Ticks node and returns its new status. The subtree is walked with an explicit stack of
+        (control node, index of the child being ticked, current child before the tick) instead of
+        recursion, going down to the next child to tick and back up with the status it returned.
+        """
+        program = self.program
+        opcodes = program.opcodes
+        args = program.args
+        status = self.status
+        current = self.current
+        world_interface = self.world_interface
+        stack = []
+
+        while True:
+            opcode = opcodes[node]
+            if opcode >= OP_AT_STATION:
+                if opcode == OP_AT_STATION:
+                    result = SUCCESS if world_interface.at_station(args[node]) else FAILURE
+                elif opcode == OP_GREATER_THAN:
+                    variable, value = args[node]
+                    result = SUCCESS if getattr(world_interface.state, variable) > value else FAILURE
+                elif opcode == OP_LOWER_THAN:
+                    variable, value = args[node]
+                    result = SUCCESS if getattr(world_interface.state, variable) < value else FAILURE
+                elif opcode == OP_CONSTANT:
+                    result = args[node]
+                elif opcode == OP_CHARGE and world_interface.state.battery_level >= sm.MAX_BATTERY:
+                    result = SUCCESS
+                elif opcode == OP_MOVETO and world_interface.at_station(args[node]):
+                    result = SUCCESS
+                else:
+                    result = RUNNING
+                    if world_interface.ready_for_action:
+                        if opcode == OP_IDLE:
+                            world_interface.idle()
+                        elif opcode == OP_CHARGE:
+                            if not world_interface.charge():
+                                result = FAILURE
+                        elif opcode == OP_MOVETO:
+                            if not world_interface.moveto(args[node]):
+                                result = FAILURE
+                        elif opcode == OP_PICK:
+                            if not world_interface.pick():
+                                result = FAILURE
+                        elif not world_interface.place():
+                            result = FAILURE
+                status[node] = result
+            else:
+                children = program.children[node]
+                index = 0
+                if opcode == OP_SEQUENCE_MEMORY:
+                    if status[node] != RUNNING:
+                        current[node] = 0 if children else -1
+                        for child in children:
+                            if status[child] != INVALID:
+                                self.stop(child)
+                    else:
+                        index = current[node]
+                elif opcode != OP_SEQUENCE:
+                    if status[node] != RUNNING:
+                        current[node] = 0 if children else -1
+                    if opcode == OP_FALLBACK_MEMORY:
+                        for child in children[:current[node]]:
+                            self.stop(child)
+                        index = current[node]
+                if children:
+                    stack.append((node, index, current[node]))
+                    node = children[index]
+                    continue
+                #Without children sequences succeed and fallbacks fail
+                result = SUCCESS if opcode in (OP_SEQUENCE, OP_SEQUENCE_MEMORY) else FAILURE
+                status[node] = result
+
+            #Return result to the control nodes above until one has another child to tick
+            while stack:
+                node, index, previous = stack.pop()
+                opcode = opcodes[node]
+                children = program.children[node]
+                if opcode == OP_SEQUENCE_MEMORY:
+                    if result == SUCCESS and index + 1 < len(children):
+                        current[node] = index + 1
+                        stack.append((node, index + 1, previous))
+                        node = children[index + 1]
+                        break
+                    status[node] = result
+                    continue
+                if opcode == OP_SEQUENCE:
+                    halting = result != SUCCESS
+                    final = SUCCESS
+                else:
+                    halting = result != FAILURE
+                    final = FAILURE
+                if halting:
+                    current[node] = index
+                    status[node] = result
+                    if previous != index:
+                        self.stop_lower_priority(children, index)
+                    continue
+                if index + 1 < len(children):
+                    stack.append((node, index + 1, previous))
+                    node = children[index + 1]
+                    break
+                current[node] = len(children) - 1
+                status[node] = final
+                result = final
+            else:
+                return result
+
+    def tick(self):
+        """ Ticks the tree once and returns the status of the root """
+        return self.tick_node(0)
+
+    def get_steady_state(self):
+        """
+        Returns the status and current child of all nodes, which together with
+        the world state decide what happens on the next tick
+        """
+        return self.status[:], self.current[:]
+
+    def run_bt(self, max_ticks=200, max_time=10000.0, fast_forward=True):
+        # pylint: disable=too-many-branches
+        """
+        Function executing the behavior tree, stopping under the same conditions
+        and fast forwarding steady cycles as PyTree.run_bt
+        """
+        ticks = 0
+        max_straight_fails = max_ticks
+        straight_fails = 0
+        successes_required = max_ticks
+        successes = 0
+        status_ok = True
+        root_status = self.status[0]
+        steady_cycles = None
+        if fast_forward and not self.verbose and hasattr(self.world_interface, 'fast_forward'):
+            steady_cycles = sm.FastForward(max_ticks)
+
+        start = time.time()
+
+        while (root_status != FAILURE or straight_fails < max_straight_fails) and \
+              (root_status != SUCCESS or successes < successes_required) and \
+              ticks < max_ticks and status_ok:
+
+            status_ok = self.world_interface.get_feedback() #Wait for connection
+
+            if status_ok:
+                if self.verbose:
+                    print("Tick", ticks)
+                root_status = self.tick_node(0)
+                self.world_interface.send_references()
+
+                ticks += 1
+                if root_status == SUCCESS:
+                    successes += 1
+                else:
+                    successes = 0
+
+                if root_status == FAILURE:
+                    straight_fails += 1
+                else:
+                    straight_fails = 0
+
+                if steady_cycles is not None:
+                    ticks, successes, straight_fails = steady_cycles.after_tick(
+                        self.world_interface, self.get_steady_state, ticks, successes, straight_fails)
+
+                if time.time() - start > max_time:
+                    status_ok = False
+                    print("Max time expired")
+
+        if self.verbose:
+            print("Total episode ticks:", ticks)
+            print("Total episode time:", time.time()-start)
+
+        if ticks >= max_ticks:
+            self.timeout = True
+        if straight_fails >= max_straight_fails:
+            self.failed = True
+        return ticks, status_ok
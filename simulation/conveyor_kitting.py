@@ -1,7 +1,9 @@
 """
 Simulation of a robot performing kitting from two conveyors
 """
+import functools
 import random
+import warnings
 from dataclasses import dataclass
 from dataclasses import field
 from enum import IntEnum
@@ -13,6 +15,20 @@ MAX_LIGHT = 10
 HEAVY_WEIGHT = 4
 LIGHT_WEIGHT = 2
 ROBOT_SPEED = 5
+#Lowest and highest value that each state variable compared by conditions can take
+VARIABLE_RANGES = {'battery_level': (0, MAX_BATTERY),
+                   'carried_weight': (0, MAX_WEIGHT),
+                   'carried_light': (0, MAX_WEIGHT // LIGHT_WEIGHT),
+                   'carried_heavy': (0, MAX_WEIGHT // HEAVY_WEIGHT),
+                   'cnv_n_light': (0, MAX_LIGHT),
+                   'cnv_n_heavy': (0, MAX_HEAVY)}
+HEAVY_SPAWN_PROBABILITY = 0.06
+LIGHT_SPAWN_PROBABILITY = 0.12
+EPISODE_LENGTH = 200
+
+#Bits in the spawn schedule
+SPAWN_HEAVY = 1
+SPAWN_LIGHT = 2
 
 @dataclass
 class Pos:
@@ -29,6 +45,7 @@ class WorldState:
     """
     tick: int = 0
     robot_pos: Pos = field(default_factory=Pos)
+    station: int = field(default=-1, compare=False) #Station at robot_pos or -1, looked up by Simulation.get_station
     battery_level: int = MAX_BATTERY
     carried_weight: int = 0
     carried_light: int = 0
@@ -48,6 +65,12 @@ class Stations(IntEnum):
     CONVEYOR_LIGHT = 3
     DELIVERY = 4
 
+STATION_POSITIONS = ((2.0, 7.5), (23.0, 12.0), (12.0, 12.0), (12.0, 3.0), (21.0, 7.5))
+"""
+Coordinates of each station, indexed by Stations
+"""
+STATION_AT_POSITION = {position: station for station, position in enumerate(STATION_POSITIONS)}
+
 def get_station_from_string(string):
     """ Returns station index from string """
     if 'CHARGE1' in string:
@@ -67,63 +90,162 @@ def get_pos(station):
     """
     Returns pose of given station
     """
-    if station == Stations.CHARGE1:
-        return Pos(2, 7.5)
-    if station == Stations.CHARGE2:
-        return Pos(23, 12)
-    if station == Stations.CONVEYOR_HEAVY:
-        return Pos(12, 12)
-    if station == Stations.CONVEYOR_LIGHT:
-        return Pos(12, 3)
-    if station == Stations.DELIVERY:
-        return Pos(21, 7.5)
+    if 0 <= station < len(STATION_POSITIONS):
+        return Pos(*STATION_POSITIONS[station])
     print("ERROR, invalid station")
     return Pos(0, 0)
 
-def move_towards(station, state):
+def get_step(x, y, station):
     """
-    Moves towards given station
+    Returns the position after one step from x, y towards given station
     with super simple silly path planning
     """
     station_pos = get_pos(station)
-    if state.robot_pos != station_pos:
-        if state.robot_pos.y != station_pos.y:
-            if state.robot_pos.x != station_pos.x and \
-               (state.robot_pos.x < 12 or state.robot_pos.x > 21):
-                move_towards_x(state.robot_pos, station_pos)
-            else:
-                move_towards_y(state.robot_pos, station_pos)
-        elif state.robot_pos.x != station_pos.x:
-            move_towards_x(state.robot_pos, station_pos)
+    if y != station_pos.y:
+        if x != station_pos.x and (x < 12 or x > 21):
+            x = step_towards(x, station_pos.x)
+        else:
+            y = step_towards(y, station_pos.y)
+    elif x != station_pos.x:
+        x = step_towards(x, station_pos.x)
+    return x, y
+
+def step_towards(value, goal):
+    """
+    Returns value moved towards goal by at most the robot speed
+    """
+    if value < goal:
+        return min(value + ROBOT_SPEED, goal)
+    return max(value - ROBOT_SPEED, goal)
+
+def make_next_steps(positions):
+    """
+    Returns a table keyed by (x, y, station) with the position after one step towards the station
+    and the station at that position, for every position that can be reached from the given positions
+    """
+    next_steps = {}
+    positions = list(positions)
+    while positions:
+        x, y = positions.pop()
+        for station in Stations:
+            if (x, y, station) not in next_steps:
+                next_steps[(x, y, station)] = make_next_step(x, y, station)
+                positions.append(next_steps[(x, y, station)][:2])
+    return next_steps
+
+def make_next_step(x, y, station):
+    """ Returns the position after one step from x, y towards given station and the station there """
+    next_x, next_y = get_step(x, y, station)
+    return next_x, next_y, STATION_AT_POSITION.get((next_x, next_y), -1)
+
+NEXT_STEPS = make_next_steps([(Pos().x, Pos().y)] + list(STATION_POSITIONS))
+"""
+Next step table for all positions reachable from the start and the stations.
+It is not changed after import, steps from positions set from outside the simulation
+are kept in the bounded cache of get_off_table_step.
+"""
+
+@functools.lru_cache(maxsize=4096)
+def get_off_table_step(x, y, station):
+    """ Returns make_next_step for positions and stations that are not in NEXT_STEPS """
+    return make_next_step(x, y, station)
+
+def get_next_step(x, y, station):
+    """
+    Returns the position after one step from x, y towards given station and the station there,
+    looked up in NEXT_STEPS
+    """
+    next_step = NEXT_STEPS.get((x, y, station))
+    if next_step is None:
+        if 0 <= station < len(STATION_POSITIONS):
+            next_step = get_off_table_step(x, y, station)
+        else:
+            next_step = make_next_step(x, y, station)
+    return next_step
+
+@functools.lru_cache(maxsize=4096)
+def get_path(x, y, station):
+    """
+    Returns the position and station after each step when moving from x, y to given station.
+    Every step takes one tick and one unit of battery on top of the battery used by the tick,
+    so the length of the path is both the travel time and the extra battery cost.
+    """
+    path = []
+    while True:
+        next_x, next_y, next_station = get_next_step(x, y, station)
+        if next_x == x and next_y == y:
+            return tuple(path)
+        path.append((next_x, next_y, next_station))
+        x, y = next_x, next_y
+
+def move_towards(station, state):
+    """
+    Moves towards given station, looking up the step in NEXT_STEPS
+    """
+    robot_pos = state.robot_pos
+    next_x, next_y, _ = get_next_step(robot_pos.x, robot_pos.y, station)
+    if next_x != robot_pos.x or next_y != robot_pos.y:
+        robot_pos.x = next_x
+        robot_pos.y = next_y
         state.battery_level -= 1
 
 def move_towards_x(robot_pos, station_pos):
     """
-    Move towards station in x direction
+    Move towards station in x direction.
+    Deprecated, move_towards looks up whole steps in NEXT_STEPS
     """
-    if robot_pos.x < station_pos.x:
-        robot_pos.x = min(robot_pos.x + ROBOT_SPEED, station_pos.x)
-    else:
-        robot_pos.x = max(robot_pos.x - ROBOT_SPEED, station_pos.x)
+    warnings.warn('move_towards_x is deprecated, use move_towards', DeprecationWarning, stacklevel=2)
+    robot_pos.x = step_towards(robot_pos.x, station_pos.x)
 
 def move_towards_y(robot_pos, station_pos):
     """
-    Move towards station in y direction
+    Move towards station in y direction.
+    Deprecated, move_towards looks up whole steps in NEXT_STEPS
+    """
+    warnings.warn('move_towards_y is deprecated, use move_towards', DeprecationWarning, stacklevel=2)
+    robot_pos.y = step_towards(robot_pos.y, station_pos.y)
+
+def make_spawn_schedule(rng, length):
+    """
+    Draws which objects arrive on the conveyors for the given number of ticks.
+    Returns one byte per tick with SPAWN_HEAVY and SPAWN_LIGHT bits set for arrivals.
     """
-    if robot_pos.y < station_pos.y:
-        robot_pos.y = min(robot_pos.y + ROBOT_SPEED, station_pos.y)
-    else:
-        robot_pos.y = max(robot_pos.y - ROBOT_SPEED, station_pos.y)
+    schedule = bytearray(length)
+    for i in range(length):
+        if rng.random() < HEAVY_SPAWN_PROBABILITY:
+            schedule[i] |= SPAWN_HEAVY
+        if rng.random() < LIGHT_SPAWN_PROBABILITY:
+            schedule[i] |= SPAWN_LIGHT
+    return bytes(schedule)
+
+@functools.lru_cache(maxsize=1024)
+def get_spawn_schedule(seed, length=EPISODE_LENGTH):
+    """
+    Returns the spawn schedule of the given seed.
+    Cached so that every tree evaluated on the same seed shares one schedule.
+    """
+    return make_spawn_schedule(random.Random(seed), length)
 
 class Simulation:
     """
     Main simulation class
     """
-    def __init__(self, seed=None):
+    def __init__(self, seed=None, spawn_schedule=None):
         self.state = WorldState()
-        if seed is not None:
-            random.seed(seed)
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.seeded_schedule = spawn_schedule is None and seed is not None
+        if spawn_schedule is None:
+            if seed is not None:
+                spawn_schedule = get_spawn_schedule(seed)
+            else:
+                spawn_schedule = b''
+        self.spawn_schedule = spawn_schedule
         self.ready_for_action = False #At most one action each tick
+        #The state and position that state.station was last looked up for
+        self.station_state = None
+        self.station_x = None
+        self.station_y = None
 
     def get_feedback(self):
         # pylint: disable=no-self-use
@@ -143,18 +265,143 @@ class Simulation:
             self.ready_for_action = False
             self.step() #Step simulation even if no action taken
 
+    def extend_spawn_schedule(self):
+        """
+        Doubles the length of the spawn schedule when running past the end of it.
+        Seeded schedules continue the random sequence of the seed, other schedules
+        continue with draws from the simulation's own generator.
+        """
+        length = max(2 * len(self.spawn_schedule), EPISODE_LENGTH)
+        if self.seeded_schedule:
+            self.spawn_schedule = get_spawn_schedule(self.seed, length)
+        else:
+            self.spawn_schedule += make_spawn_schedule(self.rng, length - len(self.spawn_schedule))
+
+    def get_spawns(self, tick):
+        """ Returns the spawn schedule bits of the given tick """
+        while tick >= len(self.spawn_schedule):
+            self.extend_spawn_schedule()
+        return self.spawn_schedule[tick]
+
+    def get_steady_state(self):
+        """
+        Returns the parts of the state that decide what the robot can do,
+        that is everything except the tick and the blocked counters
+        """
+        state = self.state
+        return (state.robot_pos.x, state.robot_pos.y, state.battery_level, \
+                state.carried_weight, state.carried_light, state.carried_heavy, \
+                state.cnv_n_light, state.cnv_n_heavy, state.delivered_heavy, state.delivered_light)
+
+    def count_spawns(self, start, end):
+        """ Returns the number of heavy and light arrivals from tick start up to tick end """
+        while end > len(self.spawn_schedule):
+            self.extend_spawn_schedule()
+        both = self.spawn_schedule.count(SPAWN_HEAVY | SPAWN_LIGHT, start, end)
+        return self.spawn_schedule.count(SPAWN_HEAVY, start, end) + both, \
+               self.spawn_schedule.count(SPAWN_LIGHT, start, end) + both
+
+    def fast_forward(self, max_ticks, period=1):
+        """
+        Advances the simulation up to max_ticks ticks in a steady cycle, where ticking the robot
+        period times leaves get_steady_state unchanged, and returns the number of ticks advanced.
+        Only whole periods are skipped, so the robot ends up where the cycle started.
+        Only spawn accounting is done, so it stops before the first period with a tick where
+        an object would be added to a conveyor, since that could change what the robot does.
+        """
+        state = self.state
+        end = state.tick + max_ticks
+        while end > len(self.spawn_schedule):
+            self.extend_spawn_schedule()
+        #Arrivals that are added to conveyors that are not full
+        added = (SPAWN_HEAVY if state.cnv_n_heavy < MAX_HEAVY else 0) | \
+                (SPAWN_LIGHT if state.cnv_n_light < MAX_LIGHT else 0)
+        for spawns in (SPAWN_HEAVY, SPAWN_LIGHT, SPAWN_HEAVY | SPAWN_LIGHT):
+            if spawns & added:
+                index = self.spawn_schedule.find(spawns, state.tick, end)
+                if index >= 0:
+                    end = index
+        ticks = (end - state.tick) // period * period
+        heavy, light = self.count_spawns(state.tick, state.tick + ticks)
+        state.blocked_heavy += heavy
+        state.blocked_light += light
+        state.tick += ticks
+        self.ready_for_action = False
+        return ticks
+
+    def add_spawns(self, ticks):
+        """
+        Adds the spawns of the given number of ticks to the conveyors at once and advances the tick.
+        Only valid when nothing is picked in between, since objects are then added until the conveyors are full.
+        """
+        state = self.state
+        heavy, light = self.count_spawns(state.tick, state.tick + ticks)
+        added = min(heavy, MAX_HEAVY - state.cnv_n_heavy)
+        state.cnv_n_heavy += added
+        state.blocked_heavy += heavy - added
+        added = min(light, MAX_LIGHT - state.cnv_n_light)
+        state.cnv_n_light += added
+        state.blocked_light += light - added
+        state.tick += ticks
+
+    def forecast_move(self, station, max_ticks):
+        """
+        Returns a forecast of moving towards given station for at most max_ticks ticks.
+        The forecast is a dict with lists of station, battery_level, cnv_n_heavy and cnv_n_light
+        at the start of each tick in which the robot would still move, that is before arriving
+        and while there is battery left. Other parts of the state do not change while moving.
+        """
+        state = self.state
+        ticks = 0
+        if station >= 0:
+            path = get_path(state.robot_pos.x, state.robot_pos.y, station)
+            #Each tick of moving uses two units of battery
+            ticks = min(max_ticks, len(path), (state.battery_level + 1) // 2)
+        if ticks <= 0:
+            return {'station': [], 'battery_level': [], 'cnv_n_heavy': [], 'cnv_n_light': []}
+
+        cnv_n_heavy = []
+        cnv_n_light = []
+        heavy = state.cnv_n_heavy
+        light = state.cnv_n_light
+        for tick in range(state.tick, state.tick + ticks):
+            cnv_n_heavy.append(heavy)
+            cnv_n_light.append(light)
+            spawns = self.get_spawns(tick)
+            if spawns & SPAWN_HEAVY and heavy < MAX_HEAVY:
+                heavy += 1
+            if spawns & SPAWN_LIGHT and light < MAX_LIGHT:
+                light += 1
+        return {'station': [self.get_station()] + [step[2] for step in path[:ticks - 1]],
+                'battery_level': list(range(state.battery_level, state.battery_level - 2 * ticks, -2)),
+                'cnv_n_heavy': cnv_n_heavy,
+                'cnv_n_light': cnv_n_light}
+
+    def macro_move(self, station, ticks):
+        """
+        Moves towards given station for the given number of ticks at once,
+        with the same result as calling moveto once per tick.
+        The robot must keep moving for all the ticks, as in forecast_move.
+        """
+        state = self.state
+        state.robot_pos.x, state.robot_pos.y, _ = get_path(state.robot_pos.x, state.robot_pos.y, station)[ticks - 1]
+        state.battery_level = max(state.battery_level - 2 * ticks, 0)
+        self.add_spawns(ticks)
+        self.ready_for_action = False
+
     def step(self):
         """
         Step the simulation one timestep
         """
+        spawns = self.get_spawns(self.state.tick)
 
-        #Randomly add objects on conveyor
-        if random.random() < 0.06:
+        #Add objects on conveyor according to spawn schedule
+        if spawns & SPAWN_HEAVY:
             if self.state.cnv_n_heavy < MAX_HEAVY:
                 self.state.cnv_n_heavy += 1
             else:
                 self.state.blocked_heavy += 1
-        if random.random() < 0.12:
+        if spawns & SPAWN_LIGHT:
             if self.state.cnv_n_light < MAX_LIGHT:
                 self.state.cnv_n_light += 1
             else:
@@ -169,9 +416,26 @@ class Simulation:
         self.ready_for_action = False
         self.state.tick += 1
 
+    def get_station(self):
+        """
+        Returns the station the robot is currently at or -1.
+        The station is looked up again when the position has changed,
+        in place or not, or the state has been replaced.
+        """
+        state = self.state
+        robot_pos = state.robot_pos
+        if robot_pos.x != self.station_x or robot_pos.y != self.station_y or state is not self.station_state:
+            self.station_state = state
+            self.station_x = robot_pos.x
+            self.station_y = robot_pos.y
+            state.station = STATION_AT_POSITION.get((robot_pos.x, robot_pos.y), -1)
+        return state.station
+
     def at_station(self, station):
         """ Checks if robot is currently at given station """
-        return self.state.robot_pos == get_pos(station)
+        if station < 0:
+            return self.state.robot_pos == get_pos(station)
+        return self.get_station() == station
 
     def idle(self):
         """
@@ -183,8 +447,8 @@ class Simulation:
         """
         Robot attemps to charge at station
         """
-        if self.state.robot_pos == get_pos(Stations.CHARGE1) or \
-           self.state.robot_pos == get_pos(Stations.CHARGE2):
+        station = self.get_station()
+        if station == Stations.CHARGE1 or station == Stations.CHARGE2:
             self.state.battery_level += 10
             self.step()
             self.state.battery_level = min(MAX_BATTERY, self.state.battery_level)
@@ -206,7 +470,8 @@ class Simulation:
         Picks up an object if possible
         """
         if self.state.battery_level > 0:
-            if self.state.robot_pos == get_pos(Stations.CONVEYOR_HEAVY) and \
+            station = self.get_station()
+            if station == Stations.CONVEYOR_HEAVY and \
                 self.state.cnv_n_heavy > 0 and \
                 self.state.carried_weight + HEAVY_WEIGHT <= MAX_WEIGHT:
 
@@ -216,7 +481,7 @@ class Simulation:
                 self.state.battery_level -= 1
                 self.step()
                 return True
-            if self.state.robot_pos == get_pos(Stations.CONVEYOR_LIGHT) and \
+            if station == Stations.CONVEYOR_LIGHT and \
                 self.state.cnv_n_light > 0 and \
                 self.state.carried_weight + LIGHT_WEIGHT <= MAX_WEIGHT:
 
@@ -233,7 +498,7 @@ class Simulation:
         Places objects if possible
         """
         if self.state.battery_level > 0:
-            if self.state.robot_pos == get_pos(Stations.DELIVERY):
+            if self.get_station() == Stations.DELIVERY:
                 for _ in range(self.state.carried_light):
                     self.state.carried_light -= 1
                     self.state.carried_weight -= LIGHT_WEIGHT
@@ -247,3 +512,38 @@ class Simulation:
                 self.step()
                 return True
         return False
+
+class FastForward:
+    """
+    Finds steady cycles while a behavior tree runs in a Simulation, that is ticks that bring
+    the tree and the world back to an earlier state, and skips the following periods of them
+    with Simulation.fast_forward. Shared by the run_bt methods of the tree interpreters.
+    """
+    def __init__(self, max_ticks):
+        self.max_ticks = max_ticks
+        #The tick and tree state of the last visit to each world state
+        self.visits = {}
+
+    def after_tick(self, world_interface, get_tree_state, ticks, successes, straight_fails):
+        # pylint: disable=too-many-arguments
+        """
+        Called after every tick with the tick, success and fail counts of run_bt and a function
+        returning the state of the tree. Returns the counts after skipping any steady cycle.
+        """
+        world_state = world_interface.get_steady_state()
+        visit, visit_tree_state = self.visits.get(world_state, (None, None))
+        tree_state = None
+        if visit is not None:
+            tree_state = get_tree_state()
+        if visit is None or tree_state != visit_tree_state:
+            self.visits[world_state] = (ticks, tree_state)
+            return ticks, successes, straight_fails
+
+        #The last period ticks ended where they started, so the following periods repeat them
+        period = ticks - visit
+        skipped = world_interface.fast_forward(self.max_ticks - ticks, period)
+        if successes >= period:
+            successes += skipped
+        if straight_fails >= period:
+            straight_fails += skipped
+        return ticks + skipped, successes, straight_fails
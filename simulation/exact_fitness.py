@@ -0,0 +1,140 @@
+"""
+Exact expected fitness of a behavior tree over all spawn sequences.
+The tree and the world are deterministic apart from the arrivals on the conveyors,
+so the distribution over world and tree states can be carried forward one tick at a time,
+branching on the arrivals of each tick and merging states that are the same.
+"""
+from dataclasses import dataclass
+import math
+import simulation.compiled_bt as compiled_bt
+import simulation.conveyor_kitting as sm
+import simulation.fitness_function as fitness_function
+
+SPAWN_OUTCOMES = [(spawns, probability) for spawns, probability in
+                  [(0, (1 - sm.HEAVY_SPAWN_PROBABILITY) * (1 - sm.LIGHT_SPAWN_PROBABILITY)),
+                   (sm.SPAWN_HEAVY, sm.HEAVY_SPAWN_PROBABILITY * (1 - sm.LIGHT_SPAWN_PROBABILITY)),
+                   (sm.SPAWN_LIGHT, (1 - sm.HEAVY_SPAWN_PROBABILITY) * sm.LIGHT_SPAWN_PROBABILITY),
+                   (sm.SPAWN_HEAVY | sm.SPAWN_LIGHT, sm.HEAVY_SPAWN_PROBABILITY * sm.LIGHT_SPAWN_PROBABILITY)]
+                  if probability > 0.0]
+"""
+Spawn schedule bits of each possible outcome of a tick, with its probability
+"""
+
+@dataclass
+class ExactFitness:
+    """
+    Expected value and standard deviation of the fitness of a tree in one episode,
+    and the largest number of distinct states in any tick
+    """
+    mean: float
+    std: float
+    states: int
+
+    def __str__(self):
+        return "mean: %.6f std: %.6f states: %d" % (self.mean, self.std, self.states)
+
+class BranchingSimulation(sm.Simulation):
+    """
+    Simulation where stepping leaves out the arrivals on the conveyors, so that all outcomes
+    of them can be applied after the tick. Nothing in a tick reads the world after the step.
+    """
+    def step(self):
+        self.state.battery_level = max(self.state.battery_level - 1, 0)
+        self.ready_for_action = False
+        self.state.tick += 1
+
+def get_transition(world, tree, key, tick, fitness_coeff):
+    """
+    Ticks tree in world from the state key and returns the resulting robot and battery,
+    conveyor counts before arrivals, tree state and fitness from deliveries
+    """
+    world.state = state = sm.WorldState(tick, sm.Pos(key[0], key[1]), battery_level=key[2], \
+        carried_weight=key[3], carried_light=key[4], carried_heavy=key[5], cnv_n_light=key[6], cnv_n_heavy=key[7])
+    tree.status = list(key[8])
+    tree.current = list(key[9])
+    world.get_feedback()
+    failed = tree.tick() == compiled_bt.FAILURE and key[10]
+    world.send_references()
+    delivered = fitness_coeff.delivered_heavy * state.delivered_heavy + \
+                fitness_coeff.delivered_light * state.delivered_light
+    base = (state.robot_pos.x, state.robot_pos.y, state.battery_level, \
+            state.carried_weight, state.carried_light, state.carried_heavy)
+    return base, state.cnv_n_light, state.cnv_n_heavy, (tuple(tree.status), tuple(tree.current), failed), delivered
+
+def get_exact_fitness(individual, max_ticks=200, fitness_coeff=None, world_state=None):
+    # pylint: disable=too-many-locals
+    """
+    Returns the ExactFitness of individual in an episode of max_ticks ticks,
+    starting from world_state if given, or else from the usual start.
+    Fitness is linear in the delivered and blocked counters, so they are left out of the states
+    and only the first and second moments of their part of the fitness are kept for each state.
+    Apart from the rounding that compute_fitness does, the mean is the limit of the mean fitness
+    over more and more seeds.
+    """
+    if fitness_coeff is None:
+        fitness_coeff = fitness_function.Coefficients()
+    world = BranchingSimulation()
+    tree = compiled_bt.CompiledTree(individual[:], world_interface=world)
+    state = world.state if world_state is None else world_state
+    #State: robot x, robot y, battery, carried weight, light and heavy, conveyor light and heavy,
+    #node statuses, current children and whether every tick so far failed
+    start = (state.robot_pos.x, state.robot_pos.y, state.battery_level, state.carried_weight, \
+             state.carried_light, state.carried_heavy, state.cnv_n_light, state.cnv_n_heavy, \
+             tuple(tree.status), tuple(tree.current), True)
+    #Probability of the state, and expected fitness and squared fitness from the counters times the probability
+    counters = fitness_coeff.delivered_heavy * state.delivered_heavy + \
+               fitness_coeff.delivered_light * state.delivered_light + \
+               fitness_coeff.blocked_heavy * state.blocked_heavy + fitness_coeff.blocked_light * state.blocked_light
+    layer = {start: (1.0, counters, counters * counters)}
+    max_states = 1
+    start_tick = state.tick
+    #What a tick does only depends on the state, so it is done once for every state that comes up
+    transitions = {}
+    for tick in range(max_ticks):
+        next_layer = {}
+        for key, (probability, moment1, moment2) in layer.items():
+            transition = transitions.get(key)
+            if transition is None:
+                transition = get_transition(world, tree, key, start_tick + tick, fitness_coeff)
+                transitions[key] = transition
+            base, cnv_n_light, cnv_n_heavy, tree_state, delivered = transition
+
+            for spawns, spawn_probability in SPAWN_OUTCOMES:
+                reward = delivered
+                light = cnv_n_light
+                heavy = cnv_n_heavy
+                if spawns & sm.SPAWN_HEAVY:
+                    if heavy < sm.MAX_HEAVY:
+                        heavy += 1
+                    else:
+                        reward += fitness_coeff.blocked_heavy
+                if spawns & sm.SPAWN_LIGHT:
+                    if light < sm.MAX_LIGHT:
+                        light += 1
+                    else:
+                        reward += fitness_coeff.blocked_light
+
+                next_key = base + (light, heavy) + tree_state
+                next_probability = probability * spawn_probability
+                next_moment1 = spawn_probability * (moment1 + probability * reward)
+                next_moment2 = spawn_probability * (moment2 + 2 * reward * moment1 + reward * reward * probability)
+                total = next_layer.get(next_key)
+                if total is None:
+                    next_layer[next_key] = [next_probability, next_moment1, next_moment2]
+                else:
+                    total[0] += next_probability
+                    total[1] += next_moment1
+                    total[2] += next_moment2
+        layer = next_layer
+        max_states = max(max_states, len(layer))
+
+    #Every episode runs all ticks and times out, so only failing differs between them apart from the counters
+    constant = fitness_coeff.length * tree.length + fitness_coeff.depth * tree.depth + \
+               fitness_coeff.ticks * max_ticks + fitness_coeff.timeout
+    mean = 0.0
+    square = 0.0
+    for key, (probability, moment1, moment2) in layer.items():
+        value = constant + (fitness_coeff.failed if key[10] else 0.0)
+        mean += value * probability + moment1
+        square += value * value * probability + 2 * value * moment1 + moment2
+    return ExactFitness(mean, math.sqrt(max(square - mean * mean, 0.0)), max_states)
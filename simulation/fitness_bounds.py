@@ -0,0 +1,266 @@
+"""
+Static upper bounds on the fitness of behavior trees, cheap enough to compute before simulating.
+The statuses each node can return are over-approximated from the tree structure and the limits
+of the world, which gives the actions the tree can ever take and where the robot can ever be.
+Deliveries are then bounded by the best value per tick of any load the robot can carry,
+and by the arrivals on the conveyors.
+"""
+from dataclasses import dataclass
+import math
+import simulation.behavior_tree as behavior_tree
+import simulation.compiled_bt as compiled_bt
+import simulation.conveyor_kitting as sm
+import simulation.fitness_function as fitness_function
+
+START_POSITION = (sm.Pos().x, sm.Pos().y)
+DELIVERY_POSITION = sm.STATION_POSITIONS[sm.Stations.DELIVERY]
+
+@dataclass
+class StaticAnalysis:
+    # pylint: disable=too-many-instance-attributes
+    """
+    What a tree can ever do in an episode from the usual start.
+    root_statuses are the statuses the root can return, stations those the robot can reach.
+    """
+    root_statuses: set
+    stations: set
+    move_targets: set
+    pick_light: bool
+    pick_heavy: bool
+    place: bool
+    charge: bool
+
+    def can_deliver(self):
+        """ Returns True if the tree can ever deliver anything """
+        return self.place and (self.pick_light or self.pick_heavy)
+
+def get_ranges(pick_light, pick_heavy):
+    """
+    Returns the lowest and highest value of each variable of the comparison conditions,
+    given which objects can be picked
+    """
+    max_light = sm.MAX_WEIGHT // sm.LIGHT_WEIGHT if pick_light else 0
+    max_heavy = sm.MAX_WEIGHT // sm.HEAVY_WEIGHT if pick_heavy else 0
+    max_weight = max(sm.HEAVY_WEIGHT * heavy + sm.LIGHT_WEIGHT * light \
+                     for heavy, light in get_loads(max_heavy, max_light))
+    return dict(sm.VARIABLE_RANGES, carried_weight=(0, max_weight), carried_light=(0, max_light), \
+                carried_heavy=(0, max_heavy))
+
+def get_loads(max_heavy, max_light):
+    """ Returns every number of heavy and light objects that can be carried at once, including none """
+    return [(heavy, light) for heavy in range(max_heavy + 1) for light in range(max_light + 1) \
+            if sm.HEAVY_WEIGHT * heavy + sm.LIGHT_WEIGHT * light <= sm.MAX_WEIGHT]
+
+def get_statuses(program, node, stations, ranges, ticked):
+    # pylint: disable=too-many-return-statements
+    """
+    Returns the set of statuses node can return when ticked, and adds node and
+    every node below it that can be ticked to the set ticked
+    """
+    ticked.add(node)
+    opcode = program.opcodes[node]
+    if opcode == compiled_bt.OP_AT_STATION:
+        if program.args[node] in stations:
+            return {compiled_bt.SUCCESS, compiled_bt.FAILURE}
+        return {compiled_bt.FAILURE}
+    if opcode in (compiled_bt.OP_GREATER_THAN, compiled_bt.OP_LOWER_THAN):
+        variable, value = program.args[node]
+        low, high = ranges[variable]
+        if opcode == compiled_bt.OP_GREATER_THAN:
+            succeeds, fails = high > value, low <= value
+        else:
+            succeeds, fails = low < value, high >= value
+        return {status for status, possible in ((compiled_bt.SUCCESS, succeeds), (compiled_bt.FAILURE, fails)) \
+                if possible}
+    if opcode == compiled_bt.OP_CONSTANT:
+        return {program.args[node]}
+    if opcode == compiled_bt.OP_IDLE:
+        return {compiled_bt.RUNNING}
+    if opcode in (compiled_bt.OP_PICK, compiled_bt.OP_PLACE):
+        return {compiled_bt.RUNNING, compiled_bt.FAILURE}
+    if opcode in (compiled_bt.OP_CHARGE, compiled_bt.OP_MOVETO):
+        return {compiled_bt.SUCCESS, compiled_bt.RUNNING, compiled_bt.FAILURE}
+
+    #Later children are only ticked if every earlier child can return the status that continues
+    if opcode in (compiled_bt.OP_SEQUENCE, compiled_bt.OP_SEQUENCE_MEMORY):
+        continuing = compiled_bt.SUCCESS
+    else:
+        continuing = compiled_bt.FAILURE
+    statuses = set()
+    for child in program.children[node]:
+        child_statuses = get_statuses(program, child, stations, ranges, ticked)
+        statuses |= child_statuses - {continuing}
+        if continuing not in child_statuses:
+            return statuses
+    statuses.add(continuing)
+    return statuses
+
+def get_reachable_positions(targets, start=START_POSITION):
+    """ Returns every position the robot can reach from start by moving towards the stations in targets """
+    positions = {start}
+    stack = [start]
+    while stack:
+        x, y = stack.pop()
+        for target in targets:
+            next_x, next_y, _ = sm.get_next_step(x, y, target)
+            if (next_x, next_y) not in positions:
+                positions.add((next_x, next_y))
+                stack.append((next_x, next_y))
+    return positions
+
+def get_distance(start, goal, targets):
+    """
+    Returns the lowest number of moves from position start to position goal
+    when moving towards the stations in targets, or infinity if goal can't be reached
+    """
+    distances = {start: 0}
+    queue = [start]
+    for x, y in queue:
+        if (x, y) == goal:
+            return distances[goal]
+        for target in targets:
+            next_x, next_y, _ = sm.get_next_step(x, y, target)
+            if (next_x, next_y) not in distances:
+                distances[(next_x, next_y)] = distances[(x, y)] + 1
+                queue.append((next_x, next_y))
+    return math.inf
+
+def analyze(individual):
+    """
+    Returns the StaticAnalysis of individual.
+    Which conditions can succeed depends on where the robot can go and what it can pick,
+    which in turn depends on which nodes can be ticked, so the analysis is repeated until nothing changes.
+    """
+    program = compiled_bt.compile_bt(individual)
+    stations = set()
+    pick_light = False
+    pick_heavy = False
+    while True:
+        ticked = set()
+        root_statuses = get_statuses(program, 0, stations, get_ranges(pick_light, pick_heavy), ticked)
+        opcodes = {program.opcodes[node] for node in ticked}
+        move_targets = {program.args[node] for node in ticked if program.opcodes[node] == compiled_bt.OP_MOVETO}
+        move_targets.discard(-1)
+        reachable = {sm.STATION_AT_POSITION.get(position, -1) for position in get_reachable_positions(move_targets)}
+        reachable.discard(-1)
+        picks = compiled_bt.OP_PICK in opcodes
+        analysis = StaticAnalysis(root_statuses, reachable, move_targets, \
+                                  picks and sm.Stations.CONVEYOR_LIGHT in reachable, \
+                                  picks and sm.Stations.CONVEYOR_HEAVY in reachable, \
+                                  compiled_bt.OP_PLACE in opcodes and sm.Stations.DELIVERY in reachable, \
+                                  compiled_bt.OP_CHARGE in opcodes and \
+                                  (sm.Stations.CHARGE1 in reachable or sm.Stations.CHARGE2 in reachable))
+        if (reachable, analysis.pick_light, analysis.pick_heavy) == (stations, pick_light, pick_heavy):
+            return analysis
+        stations, pick_light, pick_heavy = reachable, analysis.pick_light, analysis.pick_heavy
+
+def get_tour_length(start, conveyors, targets):
+    """
+    Returns the lowest number of moves from position start through all conveyors,
+    in either order, and on to the delivery station
+    """
+    positions = [sm.STATION_POSITIONS[conveyor] for conveyor in conveyors]
+    orders = [positions] if len(positions) < 2 else [positions, positions[::-1]]
+    return min(sum(get_distance(a, b, targets) for a, b in zip([start] + order, order + [DELIVERY_POSITION])) \
+               for order in orders)
+
+def get_delivery_rate(analysis, fitness_coeff):
+    """
+    Returns the highest fitness from deliveries per tick of any load, the most ticks the first load
+    can save by starting from the start position instead of at the delivery station, and the value
+    of the best load that can only be picked on the way from the start, since moving towards one station
+    can pass another. A load takes a tick for each object picked, one for placing and the moves
+    from the delivery station through the conveyors it is picked from and back.
+    """
+    rate = 0.0
+    saving = 0
+    once = 0.0
+    max_heavy = sm.MAX_WEIGHT // sm.HEAVY_WEIGHT if analysis.pick_heavy else 0
+    max_light = sm.MAX_WEIGHT // sm.LIGHT_WEIGHT if analysis.pick_light else 0
+    for heavy, light in get_loads(max_heavy, max_light):
+        value = fitness_coeff.delivered_heavy * heavy + fitness_coeff.delivered_light * light
+        if value <= 0.0:
+            continue
+        conveyors = ([sm.Stations.CONVEYOR_HEAVY] if heavy > 0 else []) + \
+                    ([sm.Stations.CONVEYOR_LIGHT] if light > 0 else [])
+        tour = get_tour_length(DELIVERY_POSITION, conveyors, analysis.move_targets)
+        first_tour = get_tour_length(START_POSITION, conveyors, analysis.move_targets)
+        if math.isinf(first_tour):
+            continue
+        if math.isinf(tour):
+            once = max(once, value)
+            continue
+        rate = max(rate, value / (heavy + light + 1 + tour))
+        saving = max(saving, tour - first_tour)
+    return rate, saving, once
+
+def get_arrivals(seed, max_ticks):
+    """
+    Returns the number of heavy and light arrivals in an episode of max_ticks ticks with seed
+    """
+    schedule = sm.get_spawn_schedule(seed, max(sm.EPISODE_LENGTH, max_ticks))[:max_ticks]
+    return sum(1 for spawns in schedule if spawns & sm.SPAWN_HEAVY), \
+           sum(1 for spawns in schedule if spawns & sm.SPAWN_LIGHT)
+
+def get_blocked_bound(coefficient, arrivals, capacity, picked):
+    """
+    Returns an upper bound on the fitness from blocked objects of one kind, given the lowest and highest
+    number of arrivals. Objects that are never picked fill the conveyor, and all later arrivals are blocked.
+    """
+    low, high = arrivals
+    if picked:
+        low = 0
+    else:
+        low, high = max(low - capacity, 0), max(high - capacity, 0)
+    return max(coefficient * low, coefficient * high)
+
+def get_fitness_bound(individual, seeds=None, max_ticks=200, fitness_coeff=None):
+    """
+    Returns an upper bound on the mean fitness of individual over episodes of max_ticks ticks
+    with the seeds, or on the fitness of any episode if seeds is None.
+    Every episode runs all max_ticks ticks and times out, so only deliveries, blocked objects
+    and failing are bounded, the length, depth, ticks and timeout terms are exact.
+    With seeds, the bound is the fitness of trees that can't pick and whose root can't fail,
+    or can only fail.
+    Without charging, every move, pick and place uses two units of battery and no action
+    can be taken on an empty battery, which limits the number of ticks with actions.
+    """
+    if fitness_coeff is None:
+        fitness_coeff = fitness_function.Coefficients()
+    bt = behavior_tree.BT(individual)
+    analysis = analyze(individual)
+    constant = fitness_coeff.length * bt.length() + fitness_coeff.depth * bt.depth() + \
+               fitness_coeff.ticks * max_ticks + fitness_coeff.timeout
+    if analysis.root_statuses == {compiled_bt.FAILURE}:
+        constant += fitness_coeff.failed
+    elif compiled_bt.FAILURE in analysis.root_statuses:
+        constant += max(fitness_coeff.failed, 0.0)
+
+    rate = 0.0
+    saving = 0
+    once = 0.0
+    if analysis.can_deliver():
+        rate, saving, once = get_delivery_rate(analysis, fitness_coeff)
+    action_ticks = max_ticks if analysis.charge else min(max_ticks, (sm.MAX_BATTERY + 1) // 2)
+    bounds = []
+    for seed in [None] if seeds is None else seeds:
+        #Any schedule can have from none to max_ticks arrivals of each kind
+        if seed is None:
+            heavy, light = (0, max_ticks), (0, max_ticks)
+        else:
+            heavy, light = [(arrivals, arrivals) for arrivals in get_arrivals(seed, max_ticks)]
+        delivered = 0.0
+        if analysis.can_deliver():
+            delivered = min(rate * (action_ticks + saving) + once, \
+                            max(fitness_coeff.delivered_heavy, 0.0) * heavy[1] * analysis.pick_heavy + \
+                            max(fitness_coeff.delivered_light, 0.0) * light[1] * analysis.pick_light)
+        blocked = get_blocked_bound(fitness_coeff.blocked_heavy, heavy, sm.MAX_HEAVY, analysis.pick_heavy) + \
+                  get_blocked_bound(fitness_coeff.blocked_light, light, sm.MAX_LIGHT, analysis.pick_light)
+        bounds.append(constant + delivered + blocked)
+    return sum(bounds) / len(bounds)
+
+def get_threshold(fitness, top_k):
+    """ Returns the top_k:th best of fitness, or minus infinity if there are fewer """
+    if top_k <= 0 or len(fitness) < top_k:
+        return -math.inf
+    return sorted(fitness, reverse=True)[top_k - 1]
@@ -0,0 +1,111 @@
+"""
+Memoization of fitness evaluations.
+Results are kept in a bounded in memory LRU with an optional sqlite file behind it,
+so that evaluations survive restarts.
+"""
+from collections import OrderedDict
+from dataclasses import astuple
+import hashlib
+import sqlite3
+import simulation.fitness_function as fitness_function
+
+def get_key(individual, seed, max_ticks, fitness_coeff=None):
+    """
+    Returns a stable hash of everything that determines the fitness of an episode.
+    Coefficients of None and the default coefficients give the same key.
+    """
+    if fitness_coeff is None:
+        fitness_coeff = fitness_function.Coefficients()
+    key = repr((tuple(individual), seed, max_ticks, astuple(fitness_coeff)))
+    return hashlib.sha256(key.encode()).hexdigest()
+
+class FitnessCache:
+    """
+    LRU cache of fitness values keyed by get_key, optionally backed by a sqlite file
+    """
+    def __init__(self, max_size=100000, path=None, commit_interval=100):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evaluation_time = 0.0
+        self.commit_interval = commit_interval
+        self.uncommitted = 0
+        self.connection = None
+        if path is not None:
+            self.connection = sqlite3.connect(path)
+            self.connection.execute("CREATE TABLE IF NOT EXISTS fitness (key TEXT PRIMARY KEY, fitness REAL)")
+            self.connection.commit()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def get(self, key):
+        """
+        Returns the cached fitness for key or None if not cached, and counts the hit or miss
+        """
+        fitness = self.entries.get(key)
+        if fitness is not None:
+            self.entries.move_to_end(key)
+        elif self.connection is not None:
+            row = self.connection.execute("SELECT fitness FROM fitness WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                fitness = row[0]
+                self.add_entry(key, fitness)
+
+        if fitness is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return fitness
+
+    def put(self, key, fitness, evaluation_time=0.0):
+        """
+        Stores the fitness of key. The evaluation time is used to estimate the time saved by hits.
+        """
+        self.evaluation_time += evaluation_time
+        self.add_entry(key, fitness)
+        if self.connection is not None:
+            self.connection.execute("INSERT OR REPLACE INTO fitness VALUES (?, ?)", (key, fitness))
+            self.uncommitted += 1
+            if self.uncommitted >= self.commit_interval:
+                self.flush()
+
+    def add_entry(self, key, fitness):
+        """ Adds entry to the in memory cache, dropping the least recently used entry when full """
+        self.entries[key] = fitness
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def saved_time(self):
+        """
+        Returns an estimate of the simulation time saved by the cache,
+        based on the average time of the evaluations that were stored
+        """
+        if self.misses == 0:
+            return 0.0
+        return self.hits * self.evaluation_time / self.misses
+
+    def flush(self):
+        """ Commits stored entries to the sqlite file """
+        if self.connection is not None:
+            self.connection.commit()
+            self.uncommitted = 0
+
+    def close(self):
+        """ Commits and closes the sqlite file """
+        if self.connection is not None:
+            self.flush()
+            self.connection.close()
+            self.connection = None
+
+    def __str__(self):
+        return "hits: %d misses: %d entries: %d saved time: %.2fs" % \
+            (self.hits, self.misses, len(self.entries), self.saved_time())
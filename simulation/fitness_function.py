@@ -19,6 +19,16 @@ class Coefficients:
     failed: float = 0.0
     timeout: float = 0.0
 
+@dataclass
+class EpisodeTree:
+    """
+    The results of a tree in one episode, as read by compute_fitness
+    """
+    depth: int
+    length: int
+    failed: bool
+    timeout: bool
+
 def compute_fitness(world_interface, behavior_tree, ticks, coeff=None, verbose=False):
     # pylint: disable=too-many-arguments
     """ Retrieve values and compute fitness """
@@ -0,0 +1,287 @@
+"""
+Genetic programming of behavior trees, built on the operators of behavior_tree.BT
+Run with python -m simulation.gp
+"""
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+import math
+import os
+import pickle
+import random
+import statistics
+import time
+import simulation.behavior_tree as behavior_tree
+import simulation.fitness_bounds as fitness_bounds
+import simulation.notebook_interface as notebook_interface
+
+MAX_TRIES = 20
+"""
+Number of attempts at making a valid new individual before a parent is copied instead
+"""
+
+@dataclass
+class GpParameters:
+    # pylint: disable=too-many-instance-attributes
+    """
+    Parameters of the genetic programming loop.
+    selection is 'tournament', where the best of tournament_size random individuals is a parent,
+    or 'elitist', where parents are drawn from the n_parents best individuals.
+    The n_elites best individuals are always copied to the next generation.
+    Every individual is evaluated by the mean fitness over one episode for each seed.
+    With prune_top_k, individuals whose static fitness bound is below the prune_top_k:th best
+    fitness found so far are not simulated, see evaluate. Pruned individuals rank below every
+    simulated one and are left out of the hall of fame and the statistics.
+    """
+    n_population: int = 16
+    n_generations: int = 20
+    ind_start_length: int = 8
+    selection: str = 'tournament'
+    tournament_size: int = 3
+    n_parents: int = 8
+    n_elites: int = 1
+    crossover_probability: float = 0.5
+    mutation_probability: float = 0.5
+    hall_of_fame_size: int = 5
+    seeds: list = field(default_factory=lambda: [0, 1, 2])
+    max_ticks: int = 200
+    fitness_coeff: object = None
+    compiled: bool = True
+    prune_top_k: int = 0
+    workers: int = 1
+    checkpoint_path: str = None
+    checkpoint_interval: int = 1
+    rng_seed: int = None
+    verbose: bool = False
+
+@dataclass
+class GenerationStats:
+    """
+    Statistics of one generation, the fitness is that of the simulated individuals
+    """
+    generation: int
+    best_fitness: float
+    mean_fitness: float
+    evaluations: int
+    time: float
+    pruned: int = 0
+
+    def __str__(self):
+        return "generation: %4d best: %8.3f mean: %8.3f evaluations: %5d pruned: %5d time: %6.2fs" % \
+            (self.generation, self.best_fitness, self.mean_fitness, self.evaluations, self.pruned, self.time)
+
+@dataclass
+class GpState:
+    """
+    Everything needed to continue a run, as stored in checkpoints
+    """
+    generation: int = 0
+    population: list = field(default_factory=list)
+    fitness: dict = field(default_factory=dict)
+    pruned: dict = field(default_factory=dict)
+    hall_of_fame: list = field(default_factory=list)
+    stats: list = field(default_factory=list)
+    random_state: tuple = None
+
+    def best(self):
+        """ Returns the best individual found and its fitness """
+        if not self.hall_of_fame:
+            return None, None
+        fitness, individual = self.hall_of_fame[0]
+        return list(individual), fitness
+
+    def evaluations(self):
+        """ Returns the number of individuals evaluated """
+        return sum(stats.evaluations for stats in self.stats)
+
+    def time(self):
+        """ Returns the total time of all generations """
+        return sum(stats.time for stats in self.stats)
+
+    def generations_per_second(self):
+        """ Returns the number of generations run per second """
+        return len(self.stats) / self.time() if self.time() > 0 else 0.0
+
+    def evaluations_per_second(self):
+        """ Returns the number of individuals evaluated per second """
+        return self.evaluations() / self.time() if self.time() > 0 else 0.0
+
+    def __str__(self):
+        return "generations: %d evaluations: %d generations/s: %.2f evaluations/s: %.1f best: %s" % \
+            (len(self.stats), self.evaluations(), self.generations_per_second(), \
+             self.evaluations_per_second(), self.best()[1])
+
+def mutate(individual):
+    """
+    Returns a copy of individual with one node changed, added or deleted,
+    or an unchanged copy if no valid tree was found
+    """
+    bt = behavior_tree.BT(individual)
+    for _ in range(MAX_TRIES):
+        bt.set(individual)
+        index = random.randrange(len(bt.bt))
+        operator = random.choice([bt.change_node, bt.add_node, bt.delete_node])
+        operator(index)
+        if len(bt.bt) > 0 and bt.is_valid():
+            bt.trim()
+            if bt.bt != individual and bt.is_valid():
+                return bt.bt
+    return individual[:]
+
+def crossover(individual1, individual2):
+    """
+    Returns two children made by swapping random subtrees below the roots of the two individuals,
+    or unchanged copies if no valid pair was found
+    """
+    bt1 = behavior_tree.BT(individual1)
+    bt2 = behavior_tree.BT(individual2)
+    indices1 = [index for index in range(1, len(individual1)) if bt1.is_subtree(index)]
+    indices2 = [index for index in range(1, len(individual2)) if bt2.is_subtree(index)]
+    if indices1 and indices2:
+        for _ in range(MAX_TRIES):
+            bt1.set(individual1)
+            bt2.set(individual2)
+            bt1.swap_subtrees(bt2, random.choice(indices1), random.choice(indices2))
+            if bt1.is_valid() and bt2.is_valid():
+                return bt1.bt, bt2.bt
+    return individual1[:], individual2[:]
+
+def select(population, fitness, parameters):
+    """
+    Returns one parent selected from population as given by parameters.selection
+    """
+    if parameters.selection == 'tournament':
+        contestants = random.sample(range(len(population)), min(parameters.tournament_size, len(population)))
+        return population[max(contestants, key=lambda i: fitness[i])]
+    if parameters.selection == 'elitist':
+        ranked = sorted(range(len(population)), key=lambda i: fitness[i], reverse=True)
+        return population[random.choice(ranked[:max(1, parameters.n_parents)])]
+    raise ValueError('Unknown selection: ' + str(parameters.selection))
+
+def update_hall_of_fame(hall_of_fame, population, fitness, size):
+    """
+    Returns the size best distinct individuals of hall_of_fame and population
+    as a list of (fitness, individual) with the best first.
+    Individuals with fitness -inf, which were pruned, are left out.
+    """
+    entries = dict((individual, entry_fitness) for entry_fitness, individual in hall_of_fame)
+    for individual, individual_fitness in zip(population, fitness):
+        if individual_fitness > -math.inf:
+            entries[tuple(individual)] = individual_fitness
+    return sorted(((entry_fitness, individual) for individual, entry_fitness in entries.items()), \
+                  key=lambda entry: entry[0], reverse=True)[:size]
+
+def evaluate(population, state, parameters, executor=None):
+    """
+    Returns the fitness of each individual in population, the mean over parameters.seeds.
+    Individuals not evaluated before are simulated, through executor if given,
+    and their fitness is kept in state. Also returns the number of individuals simulated and pruned.
+    Pruned individuals can't beat the parameters.prune_top_k:th best simulated fitness in state,
+    so they are not simulated and get fitness -inf, which ranks them below every simulated
+    individual. Their fitness bounds are kept in state.pruned.
+    """
+    threshold = fitness_bounds.get_threshold(list(state.fitness.values()), parameters.prune_top_k)
+    new = {}
+    pruned = 0
+    for individual in population:
+        key = tuple(individual)
+        if key in state.fitness or key in state.pruned or key in new:
+            continue
+        bound = fitness_bounds.get_fitness_bound(individual, parameters.seeds, parameters.max_ticks, \
+                                                 parameters.fitness_coeff) if threshold > -math.inf else math.inf
+        if bound < threshold:
+            state.pruned[key] = bound
+            pruned += 1
+        else:
+            new[key] = individual
+    tasks = [(individual[:], parameters.seeds, parameters.max_ticks, False, parameters.fitness_coeff, \
+              parameters.compiled) for individual in new.values()]
+    if executor is not None:
+        results = executor.map(notebook_interface.run_episodes, tasks)
+    else:
+        results = map(notebook_interface.run_episodes, tasks)
+    for key, episodes in zip(new, results):
+        state.fitness[key] = statistics.mean(episodes)
+    return [state.fitness.get(tuple(individual), -math.inf) for individual in population], len(new), pruned
+
+def next_generation(population, fitness, parameters):
+    """
+    Returns the next population, with the elites copied and the rest made by crossover and mutation
+    """
+    ranked = sorted(range(len(population)), key=lambda i: fitness[i], reverse=True)
+    offspring = [population[i][:] for i in ranked[:parameters.n_elites]]
+    while len(offspring) < parameters.n_population:
+        parent1 = select(population, fitness, parameters)
+        parent2 = select(population, fitness, parameters)
+        if random.random() < parameters.crossover_probability:
+            children = crossover(parent1, parent2)
+        else:
+            children = (parent1[:], parent2[:])
+        for child in children:
+            if random.random() < parameters.mutation_probability:
+                child = mutate(child)
+            if len(offspring) < parameters.n_population:
+                offspring.append(child)
+    return offspring
+
+def save_checkpoint(state, path):
+    """ Saves state to path, replacing the previous checkpoint only when fully written """
+    with open(path + '.tmp', 'wb') as file:
+        pickle.dump(state, file)
+    os.replace(path + '.tmp', path)
+
+def load_checkpoint(path):
+    """ Returns the state saved at path """
+    with open(path, 'rb') as file:
+        return pickle.load(file)
+
+def run(parameters):
+    """
+    Runs the genetic programming loop and returns the final GpState.
+    If parameters.checkpoint_path exists, the run continues from the saved state.
+    With several workers, each generation is evaluated in a pool of worker processes.
+    Assumes that the behavior tree settings are loaded.
+    """
+    if parameters.checkpoint_path is not None and os.path.exists(parameters.checkpoint_path):
+        state = load_checkpoint(parameters.checkpoint_path)
+        random.setstate(state.random_state)
+    else:
+        if parameters.rng_seed is not None:
+            random.seed(parameters.rng_seed)
+        state = GpState()
+        state.population = [behavior_tree.BT([]).random(parameters.ind_start_length) \
+                            for _ in range(parameters.n_population)]
+
+    executor = None
+    if parameters.workers > 1:
+        executor = ProcessPoolExecutor(max_workers=parameters.workers, initializer=notebook_interface.init_worker, \
+                                       initargs=(behavior_tree.SETTINGS_FILE,))
+    try:
+        while state.generation < parameters.n_generations:
+            start = time.time()
+            fitness, evaluations, pruned = evaluate(state.population, state, parameters, executor)
+            state.hall_of_fame = update_hall_of_fame(state.hall_of_fame, state.population, fitness, \
+                                                     parameters.hall_of_fame_size)
+            state.population = next_generation(state.population, fitness, parameters)
+            simulated = [individual_fitness for individual_fitness in fitness if individual_fitness > -math.inf]
+            state.stats.append(GenerationStats(state.generation, max(simulated, default=-math.inf), \
+                                               statistics.mean(simulated) if simulated else -math.inf, \
+                                               evaluations, time.time() - start, pruned))
+            state.generation += 1
+            if parameters.verbose:
+                print(state.stats[-1])
+
+            if parameters.checkpoint_path is not None and \
+               (state.generation % parameters.checkpoint_interval == 0 or \
+                state.generation == parameters.n_generations):
+                state.random_state = random.getstate()
+                save_checkpoint(state, parameters.checkpoint_path)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return state
+
+if __name__ == "__main__":
+    behavior_tree.load_settings_from_file('simulation/BT_SETTINGS.yaml')
+    result = run(GpParameters(rng_seed=0, workers=os.cpu_count(), verbose=True))
+    print(result)
+    print("Best individual:", result.best()[0])
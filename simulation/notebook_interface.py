@@ -2,33 +2,186 @@
 A simple simulation environment for running behavior trees
 """
 
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+import statistics
+import time
+
 #Imports that define the environment
 from simulation.py_trees_interface import PyTree
+import simulation.behavior_tree as behavior_tree
 import simulation.behaviors as behaviors
+import simulation.compiled_bt as compiled_bt
 import simulation.conveyor_kitting as sm
+import simulation.fitness_cache as fitness_cache
 import simulation.fitness_function as fitness_function
 
+@dataclass
+class BatchFitness:
+    """
+    Fitness of one individual evaluated over several seeds
+    """
+    seeds: list
+    fitness: list
+    mean: float
+    std: float
+
+def init_worker(settings_file):
+    """ Loads the behavior tree settings in a freshly started worker process """
+    if settings_file is not None:
+        behavior_tree.load_settings_from_file(settings_file)
+
+def run_episodes(task):
+    """
+    Runs one episode for each seed and returns the list of fitness values.
+    The tree is built once and reset between episodes.
+    Task is a tuple of (individual, seeds, max_ticks, verbose, fitness_coeff, compiled).
+    """
+    individual, seeds, max_ticks, verbose, fitness_coeff, compiled = task
+    environment = Environment(verbose=verbose, fitness_coeff=fitness_coeff, compiled=compiled)
+    return [environment.get_fitness(individual, max_ticks=max_ticks, seed=seed) for seed in seeds]
+
 class Environment():
-    """ Class defining the environment in which the individual operates """
-    def __init__(self, seed=None, verbose=False, fitness_coeff=None):
+    """
+    Class defining the environment in which the individual operates.
+    If a fitness_cache.FitnessCache is given, seeded evaluations are looked up in it
+    before simulating and world_interface and pytree are then not updated on hits.
+    Evaluations with a given spawn schedule are not cached.
+    The tree of the last run is kept and reset when the same individual is run again.
+    """
+    def __init__(self, seed=None, verbose=False, fitness_coeff=None, compiled=False, cache=None):
+        # pylint: disable=too-many-arguments
         self.seed = seed
         self.verbose = verbose
         self.fitness_coeff = fitness_coeff
+        self.compiled = compiled
+        self.cache = cache
         self.world_interface = None
         self.pytree = None
+        self.tree = None
+        self.tree_individual = None
 
-    def get_fitness(self, individual, max_ticks=200, show_world=False, seed=None):
-        """ Run the simulation and return the fitness """
+    def get_fitness(self, individual, max_ticks=200, show_world=False, seed=None, spawn_schedule=None):
+        # pylint: disable=too-many-arguments
+        """
+        Run the simulation and return the fitness.
+        If a spawn schedule is given, it is used instead of the schedule of the seed.
+        """
         if seed is not None:
             self.seed = seed
-        self.world_interface = sm.Simulation(seed=self.seed)
-        self.pytree = PyTree(individual[:], behaviors=behaviors, \
-            world_interface=self.world_interface, verbose=self.verbose)
+        key = None
+        if self.cache is not None and self.seed is not None and not show_world and spawn_schedule is None:
+            key = fitness_cache.get_key(individual, self.seed, max_ticks, self.fitness_coeff)
+            fitness = self.cache.get(key)
+            if fitness is not None:
+                return fitness
+
+        start = time.time()
+        tree, ticks = self.run(individual, max_ticks=max_ticks, show_world=show_world, spawn_schedule=spawn_schedule)
+        fitness = fitness_function.compute_fitness(self.world_interface, tree, ticks, self.fitness_coeff)
+        if key is not None:
+            self.cache.put(key, fitness, time.time() - start)
+        return fitness
+
+    def run(self, individual, max_ticks=200, show_world=False, spawn_schedule=None):
+        """ Run the simulation in a new world and return the tree and the number of ticks """
+        self.world_interface = sm.Simulation(seed=self.seed, spawn_schedule=spawn_schedule)
+        #Same result as the py_trees path, without building any py_trees objects
+        compiled = self.compiled and not show_world
+        tree_individual = (tuple(individual), compiled)
+        if self.tree_individual == tree_individual:
+            self.tree.reset(self.world_interface)
+        elif compiled:
+            self.tree = compiled_bt.CompiledTree(individual[:], world_interface=self.world_interface, \
+                verbose=self.verbose)
+        else:
+            self.tree = PyTree(individual[:], behaviors=behaviors, \
+                world_interface=self.world_interface, verbose=self.verbose)
+        self.tree_individual = tree_individual
+        tree = self.tree
+
+        if compiled:
+            #No py_trees tree belongs to this world
+            self.pytree = None
+            ticks, _ = tree.run_bt(max_ticks=max_ticks)
+        else:
+            self.pytree = tree
+
+            # run the Behavior Tree
+            ticks, _ = self.pytree.run_bt(max_ticks=max_ticks, show_world=show_world)
+        return tree, ticks
+
+    def get_population_fitness(self, population, max_ticks=200):
+        """
+        Returns the fitness of each individual in the population.
+        Individuals with the same canonical form behave the same, so with a seed only
+        one of them is simulated and the others only differ in the depth and length terms.
+        """
+        if self.seed is None:
+            return [self.get_fitness(individual, max_ticks=max_ticks) for individual in population]
+
+        fitness = []
+        episodes = {}
+        for individual in population:
+            key = None
+            if self.cache is not None:
+                key = fitness_cache.get_key(individual, self.seed, max_ticks, self.fitness_coeff)
+                cached = self.cache.get(key)
+                if cached is not None:
+                    fitness.append(cached)
+                    continue
+
+            start = time.time()
+            bt = behavior_tree.BT(individual)
+            canonical = behavior_tree.BT(individual).canonicalize(compiled_bt.CONDITION_RANGES)
+            canonical_hash = behavior_tree.get_hash(canonical)
+            if canonical_hash not in episodes:
+                tree, ticks = self.run(canonical, max_ticks=max_ticks)
+                episodes[canonical_hash] = (self.world_interface, tree.failed, tree.timeout, ticks)
+            world_interface, failed, timeout, ticks = episodes[canonical_hash]
+            episode_tree = fitness_function.EpisodeTree(bt.depth(), bt.length(), failed, timeout)
+            fitness.append(fitness_function.compute_fitness(world_interface, episode_tree, ticks, self.fitness_coeff))
+            if key is not None:
+                self.cache.put(key, fitness[-1], time.time() - start)
+        return fitness
+
+    def get_fitness_batch(self, individual, seeds, workers=1, max_ticks=200):
+        """
+        Run the simulation once for each seed and return per seed fitness with mean and std.
+        Every episode runs in a fresh world with a reset tree so the result is the same whether
+        the episodes are run serially or spread out over a pool of worker processes.
+        """
+        seeds = list(seeds)
+        fitness = [None] * len(seeds)
+        keys = [None] * len(seeds)
+        if self.cache is not None:
+            for i, seed in enumerate(seeds):
+                if seed is not None:
+                    keys[i] = fitness_cache.get_key(individual, seed, max_ticks, self.fitness_coeff)
+                    fitness[i] = self.cache.get(keys[i])
+        missing = [i for i in range(len(seeds)) if fitness[i] is None]
 
-        # run the Behavior Tree
-        ticks, _ = self.pytree.run_bt(max_ticks=max_ticks, show_world=show_world)
+        start = time.time()
+        if workers > 1 and len(missing) > 1:
+            #Each task builds the tree once and runs a chunk of seeds
+            chunksize = max(1, len(missing) // (4 * workers))
+            tasks = [(individual[:], [seeds[i] for i in missing[j:j + chunksize]], max_ticks, \
+                      self.verbose, self.fitness_coeff, self.compiled) for j in range(0, len(missing), chunksize)]
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, \
+                                     initargs=(behavior_tree.SETTINGS_FILE,)) as executor:
+                results = [result for chunk in executor.map(run_episodes, tasks) for result in chunk]
+        else:
+            results = run_episodes((individual, [seeds[i] for i in missing], max_ticks, \
+                                    self.verbose, self.fitness_coeff, self.compiled))
+        evaluation_time = (time.time() - start) / max(1, len(missing))
+        for i, result in zip(missing, results):
+            fitness[i] = result
+            if keys[i] is not None:
+                self.cache.put(keys[i], result, evaluation_time)
 
-        return fitness_function.compute_fitness(self.world_interface, self.pytree, ticks, self.fitness_coeff)
+        if len(fitness) == 0:
+            return BatchFitness(seeds, fitness, 0.0, 0.0)
+        return BatchFitness(seeds, fitness, statistics.mean(fitness), statistics.pstdev(fitness))
 
     def step(self, individual, show_world=False):
         """ Run the simulation and return the fitness """
@@ -4,6 +4,8 @@ Interfaces to py_trees from behavior tree strings
 import time
 import py_trees as pt
 import simulation.behavior_tree as behavior_tree
+import simulation.conveyor_kitting as sm
+import simulation.trace_recorder as trace_recorder
 import UI.draw_world as draw_world
 
 class PyTree(pt.trees.BehaviourTree):
@@ -78,17 +80,101 @@ class PyTree(pt.trees.BehaviourTree):
             if has_children:
                 #Node is a control node or decorator with children - add subtree via string and then add to parent
                 newnode = self.create_from_string(string, newnode)
-                node.add_child(newnode)
+                node.add_children([newnode])
             else:
                 #Node is a leaf/action node - add to parent, then keep looking for siblings
-                node.add_child(newnode)
+                node.add_children([newnode])
 
         #This return is only reached if there are too few up nodes
         return node
 
-    def run_bt(self, max_ticks=200, max_time=10000.0, show_world=False):
+    def reset(self, world_interface=None):
         """
-        Function executing the behavior tree
+        Prepares the tree for a new episode in world_interface, as if it had just been created.
+        All nodes are invalidated, which also clears the memory of composites,
+        and leaves are rebound to the new world interface.
+        """
+        self.world_interface = world_interface
+        self.failed = False
+        self.timeout = False
+        self.count = 0
+        self.root.stop(pt.common.Status.INVALID)
+        for node in self.root.iterate():
+            if hasattr(node, 'world_interface'):
+                node.world_interface = world_interface
+
+    def get_steady_state(self):
+        """
+        Returns the status and current child of all nodes, which together with
+        the world state decide what happens on the next tick
+        """
+        return [(node.status, getattr(node, 'current_child', None)) for node in self.root.iterate()]
+
+    def get_running_leaf(self):
+        """ Returns the leaf that the tree is running, following the current children from the root, or None """
+        node = self.root
+        while node is not None and node.status is pt.common.Status.RUNNING:
+            if not node.children:
+                return node
+            node = node.current_child
+        return None
+
+    def get_macro_ticks(self, leaf, max_ticks):
+        """
+        Returns for how many of the next ticks the running leaf can be macro stepped.
+        The leaves that are ticked before it must keep their status over the forecast of the leaf,
+        so any other action or leaf without get_steady_ticks prevents macro steps. Children before
+        the current child of memory composites are not ticked, but a memory selector stops them
+        when it resumes, so that has to be done with a normal tick first.
+        """
+        forecast = leaf.get_forecast(max_ticks)
+        ticks = len(forecast['station'])
+        if ticks == 0:
+            return 0
+
+        conditions = []
+        node = self.root
+        while node is not leaf:
+            index = node.get_current_index()
+            if not getattr(node, 'memory', False):
+                stack = node.children[:index]
+            elif isinstance(node, pt.composites.Selector) and \
+                 any(child.status is not pt.common.Status.INVALID for child in node.children[:index]):
+                return 0
+            else:
+                stack = []
+            while stack:
+                other = stack.pop()
+                #Invalid nodes only have invalid children
+                if other.status is pt.common.Status.INVALID:
+                    continue
+                if other.children:
+                    stack.extend(other.children)
+                elif hasattr(other, 'get_steady_ticks'):
+                    conditions.append(other)
+                else:
+                    return 0
+            node = node.current_child
+
+        for condition in conditions:
+            if ticks == 0:
+                break
+            ticks = min(ticks, condition.get_steady_ticks(forecast))
+        return ticks
+
+    def run_bt(self, max_ticks=200, max_time=10000.0, show_world=False, fast_forward=True, macro_steps=False, \
+               recorder=None):
+        # pylint: disable=too-many-branches, too-many-statements, too-many-arguments
+        """
+        Function executing the behavior tree.
+        If a trace_recorder.TraceRecorder is given, the state after every tick is recorded.
+        If show_world is set, the episode is recorded and rendered to an animation afterwards.
+        If fast_forward is set and the world interface supports it, ticks that bring
+        the tree and the world back to an earlier state are repeated by skipping
+        whole periods of them with the same result.
+        If macro_steps is set, ticks where the tree would keep running a leaf with
+        a macro_step method, like a MoveTo, are done in one step with the same result.
+        Neither is done while recording, so that no tick is missing from the record.
         """
         ticks = 0
         max_straight_fails = max_ticks
@@ -96,8 +182,15 @@ class PyTree(pt.trees.BehaviourTree):
         successes_required = max_ticks
         successes = 0
         status_ok = True
-        if show_world:
-            world = draw_world.WorldUI(animate=True)
+        if show_world and recorder is None:
+            recorder = trace_recorder.TraceRecorder()
+        #Skipped ticks would be missing from the recording
+        steady_cycles = None
+        if fast_forward and recorder is None and not self.verbose and hasattr(self.world_interface, 'fast_forward'):
+            steady_cycles = sm.FastForward(max_ticks)
+        macro_steps = macro_steps and recorder is None and not self.verbose
+        if recorder is not None:
+            recorder.start(self)
 
         start = time.time()
 
@@ -110,11 +203,11 @@ class PyTree(pt.trees.BehaviourTree):
             if status_ok:
                 if self.verbose:
                     print("Tick", ticks)
-                self.root.tick_once()
+                self.root.tick_direct()
                 self.world_interface.send_references()
 
-                if show_world:
-                    world.animate_state(self.world_interface.state)
+                if recorder is not None:
+                    recorder.record(self)
 
                 ticks += 1
                 if self.root.status is pt.common.Status.SUCCESS:
@@ -127,6 +220,19 @@ class PyTree(pt.trees.BehaviourTree):
                 else:
                     straight_fails = 0
 
+                if steady_cycles is not None:
+                    ticks, successes, straight_fails = steady_cycles.after_tick(
+                        self.world_interface, self.get_steady_state, ticks, successes, straight_fails)
+
+                if macro_steps:
+                    leaf = self.get_running_leaf()
+                    if hasattr(leaf, 'macro_step'):
+                        #The root is running, so the success and fail counts stay at zero
+                        skipped = self.get_macro_ticks(leaf, max_ticks - ticks)
+                        if skipped > 0:
+                            leaf.macro_step(skipped)
+                            ticks += skipped
+
                 if time.time() - start > max_time:
                     status_ok = False
                     print("Max time expired")
@@ -136,7 +242,10 @@ class PyTree(pt.trees.BehaviourTree):
             print("Total episode time:", time.time()-start)
 
         if show_world:
-            world.animate()
+            trace = recorder.get_trace()
+            draw_world.render_trace(trace[trace['episode'] == recorder.episode])
+            world = draw_world.WorldUI()
+            world.add_state(self.world_interface.state)
             world.save_world('testworld')
 
         if ticks >= max_ticks:
@@ -156,7 +265,7 @@ class PyTree(pt.trees.BehaviourTree):
         status_ok = self.world_interface.get_feedback() #Wait for connection
 
         if status_ok:
-            self.root.tick_once()
+            self.root.tick_direct()
             self.world_interface.send_references()
 
             if show_world:
@@ -0,0 +1,95 @@
+"""
+Racing of candidate behavior trees over many seeds.
+All candidates are run on a few seeds, candidates that are clearly worse than the best are dropped,
+and only the remaining candidates are run on more seeds, until the best are separated from the rest.
+"""
+from dataclasses import dataclass
+import math
+import statistics
+import simulation.notebook_interface as notebook_interface
+
+@dataclass
+class RacingResult:
+    """
+    Result of a race. fitness holds the fitness of each candidate on the seeds it was run on,
+    ranking the indices of the candidates still in the race with the best mean first.
+    """
+    fitness: list
+    ranking: list
+    separated: bool
+    episodes: int
+    full_episodes: int
+
+    def get_mean(self, index):
+        """ Returns the mean fitness of the candidate at index """
+        return statistics.mean(self.fitness[index])
+
+    def budget_fraction(self):
+        """ Returns the fraction of the episodes of a full evaluation that were run """
+        return self.episodes / self.full_episodes if self.full_episodes > 0 else 0.0
+
+    def __str__(self):
+        return "episodes: %d of %d (%.1f%%) candidates left: %d separated: %s" % \
+            (self.episodes, self.full_episodes, 100 * self.budget_fraction(), len(self.ranking), self.separated)
+
+def get_bounds(fitness, z=1.96):
+    """
+    Returns the lower and upper confidence bounds of the mean of fitness,
+    using the normal approximation with z standard errors
+    """
+    mean = statistics.mean(fitness)
+    if len(fitness) < 2:
+        return -math.inf, math.inf
+    half_width = z * statistics.stdev(fitness) / math.sqrt(len(fitness))
+    return mean - half_width, mean + half_width
+
+def is_separated(bounds, ranking, top_k):
+    """
+    Returns True if the lower bound of every one of the top_k first in ranking
+    is above the upper bound of every other candidate in ranking
+    """
+    if len(ranking) <= top_k:
+        return True
+    return min(bounds[i][0] for i in ranking[:top_k]) > max(bounds[i][1] for i in ranking[top_k:])
+
+def race(candidates, seeds, environment=None, initial_seeds=5, seeds_per_round=5, discard_fraction=0.5, \
+         top_k=1, z=1.96, max_ticks=200, workers=1):
+    # pylint: disable=too-many-arguments, too-many-locals
+    """
+    Races the candidates over seeds, in order, and returns a RacingResult.
+    Every round, candidates whose upper bound is below the lower bounds of all the top_k best are dropped,
+    as is discard_fraction of the others outside the top_k, those with the lowest upper bounds first.
+    The remaining candidates are run on seeds_per_round more seeds, until the top_k are separated
+    from the others, all seeds are used or only the top_k are left.
+    Episodes are run with environment.get_fitness_batch, so a fitness cache in the environment is used,
+    and by default with compiled trees.
+    """
+    if environment is None:
+        environment = notebook_interface.Environment(compiled=True)
+    seeds = list(seeds)
+    fitness = [[] for _ in candidates]
+    ranking = list(range(len(candidates)))
+    episodes = 0
+    n_seeds = min(initial_seeds, len(seeds))
+    while True:
+        for i in ranking:
+            new_seeds = seeds[len(fitness[i]):n_seeds]
+            fitness[i] += environment.get_fitness_batch(candidates[i], new_seeds, workers, max_ticks).fitness
+            episodes += len(new_seeds)
+
+        bounds = {i: get_bounds(fitness[i], z) for i in ranking}
+        ranking.sort(key=lambda i: statistics.mean(fitness[i]), reverse=True)
+        separated = is_separated(bounds, ranking, top_k)
+        if separated or n_seeds >= len(seeds):
+            break
+
+        threshold = min(bounds[i][0] for i in ranking[:top_k])
+        others = [i for i in ranking[top_k:] if bounds[i][1] >= threshold]
+        others.sort(key=lambda i: bounds[i][1], reverse=True)
+        others = set(others[:len(others) - int(discard_fraction * len(others))])
+        ranking = ranking[:top_k] + [i for i in ranking[top_k:] if i in others]
+        if len(ranking) <= top_k:
+            break
+        n_seeds = min(n_seeds + seeds_per_round, len(seeds))
+
+    return RacingResult(fitness, ranking, separated, episodes, len(candidates) * len(seeds))
@@ -0,0 +1,17 @@
+"""
+Fixtures shared by the simulation tests
+"""
+import pytest
+import simulation.behavior_tree as behavior_tree
+
+@pytest.fixture
+def bt_settings():
+    """
+    Loads the behavior tree settings of the kitting task for the test,
+    and restores the settings loaded before the test, if any, afterwards
+    """
+    previous_settings = behavior_tree.SETTINGS_FILE
+    behavior_tree.load_settings_from_file('simulation/BT_SETTINGS.yaml')
+    yield
+    if previous_settings is not None:
+        behavior_tree.load_settings_from_file(previous_settings)
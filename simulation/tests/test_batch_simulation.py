@@ -0,0 +1,81 @@
+"""
+Tests the vectorized batch simulation against the scalar simulation
+"""
+import random
+import simulation.batch_simulation as batch_simulation
+import simulation.behavior_tree as behavior_tree
+import simulation.conveyor_kitting as simulation
+import simulation.notebook_interface as notebook_interface
+
+def test_actions():
+    """
+    Tests that random actions give the same states as in the scalar simulation
+    """
+    seeds = list(range(8))
+    batch = batch_simulation.BatchSimulation(seeds)
+    sims = [simulation.Simulation(seed=seed) for seed in seeds]
+    rng = random.Random(0)
+
+    for _ in range(300):
+        action = rng.choice(['idle', 'charge', 'moveto', 'pick', 'place'])
+        station = rng.choice(list(simulation.Stations))
+        mask = batch.ready_for_action.copy()
+        mask[:] = [rng.random() < 0.7 for _ in seeds]
+        if action == 'moveto':
+            success = batch.moveto(station, mask)
+        else:
+            success = getattr(batch, action)(mask)
+
+        for i, sim in enumerate(sims):
+            if mask[i]:
+                if action == 'moveto':
+                    assert success[i] == sim.moveto(station)
+                elif action == 'idle':
+                    sim.idle()
+                else:
+                    assert success[i] == getattr(sim, action)()
+            assert batch.get_state(i) == sim.state
+
+def test_spawn_schedule():
+    """
+    Tests that the batch follows the spawn schedules beyond one episode
+    """
+    batch = batch_simulation.BatchSimulation([3, 4])
+    sims = [simulation.Simulation(seed=3), simulation.Simulation(seed=4)]
+    for _ in range(3 * simulation.EPISODE_LENGTH):
+        batch.idle(batch.ready_for_action | True)
+        for sim in sims:
+            sim.idle()
+    for i, sim in enumerate(sims):
+        assert batch.get_state(i) == sim.state
+
+    batch = batch_simulation.BatchSimulation([None], spawn_schedules=[bytes([simulation.SPAWN_LIGHT] * 5)])
+    for _ in range(5):
+        batch.idle(batch.ready_for_action | True)
+    assert batch.get_state(0).cnv_n_light == 5
+
+def test_get_fitness(bt_settings):
+    """
+    Tests that running trees in a batch gives the same fitness as running them one seed at a time
+    """
+    individuals = [['idle!'],
+                   ['s(', 'f(', 'battery level > 50?', 's(', 'move to CHARGE1!', 'charge!', ')', ')', \
+                          'f(', 'carried weight > 3?', 's(', 'move to CONVEYOR_LIGHT!', 'pick!', ')', ')', \
+                          'move to DELIVERY!', 'place!', ')'],
+                   ['s(', 'f(', 'battery level > 30?', 'sm(', 'move to CHARGE2!', 'charge!', ')', ')', \
+                          'f(', 'carried weight > 7?', \
+                                'fm(', 'sm(', 'conveyor heavy > 0?', 'move to CONVEYOR_HEAVY!', 'pick!', ')', \
+                                       's(', 'move to CONVEYOR_LIGHT!', 'pick!', ')', ')', ')', \
+                          'move to DELIVERY!', 'place!', ')'],
+                   ['f(', 'at station CHARGE1?', behavior_tree.TRUE_NODE, ')'],
+                   ['s(', 'move to CHARGE2!', behavior_tree.FALSE_NODE, 'idle!', ')']]
+    random.seed(5)
+    for length in range(2, 20, 3):
+        individuals.append(behavior_tree.BT([]).random(length))
+
+    seeds = list(range(10))
+    for individual in individuals:
+        fitness = batch_simulation.get_fitness(individual, seeds)
+        for seed in seeds:
+            environment = notebook_interface.Environment(seed=seed)
+            assert environment.get_fitness(individual) == fitness[seed]
@@ -4,6 +4,7 @@ Unit test for behavior_tree.py
 import random
 import pytest
 import simulation.behavior_tree as behavior_tree
+import simulation.benchmark as benchmark
 from simulation.py_trees_interface import PyTree
 import simulation.tests.behaviors_states as behaviors
 behavior_tree.load_settings_from_file('simulation/tests/BT_TEST_SETTINGS.yaml')
@@ -19,6 +20,17 @@ def test_is_parameterized_condition_node():
     assert not behavior_tree.is_parameterized_condition_node('d < f')
     assert not behavior_tree.is_parameterized_condition_node('c0')
 
+def test_node_sets():
+    """ Tests that node sets and the token cache follow the loaded settings """
+    assert behavior_tree.CONTROL_SET == frozenset(['f(', 's('])
+    assert behavior_tree.UP_SET == frozenset([')'])
+    assert behavior_tree.get_parameterized_condition_name('value check < 15?') == 'value check'
+    assert behavior_tree.get_parameterized_condition_name('f < 4?') is None
+    assert behavior_tree.PARAMETERIZED_CONDITION_CACHE['f < 4?'] is None
+
+    behavior_tree.load_settings_from_file('simulation/tests/BT_TEST_SETTINGS.yaml')
+    assert 'f < 4?' not in behavior_tree.PARAMETERIZED_CONDITION_CACHE
+
 def test_is_condition_node():
     """ Tests is_condition_node function """
     assert behavior_tree.is_condition_node('d > 5?')
@@ -55,6 +67,36 @@ def test_random():
         assert bt.length() == length
         assert bt.is_valid()
 
+    for length in [50, 200, 1000]:
+        bt.random(length)
+        assert bt.length() == length
+        assert bt.is_valid()
+        #Conditions are never last children
+        for i in range(1, len(bt.bt)):
+            if bt.bt[i] == ')':
+                assert not behavior_tree.is_condition_node(bt.bt[i - 1])
+
+def test_random_rejection():
+    """ Tests random_rejection function """
+    bt = behavior_tree.BT([])
+
+    random.seed(1337)
+
+    for length in range(1, 6):
+        bt.random_rejection(length)
+        assert bt.length() == length
+        assert bt.is_valid()
+
+def test_benchmark_random():
+    """ Tests that the random tree benchmark counts trees and candidates """
+    results = benchmark.benchmark_random([1, 4], n_trees=5)
+    assert [(result.method, result.length) for result in results] == \
+        [('random', 1), ('rejection', 1), ('random', 4), ('rejection', 4)]
+    for result in results:
+        assert result.trees == 5
+        assert result.candidates >= result.trees
+    assert results[0].acceptance_rate() == 1.0
+
 def test_is_valid():
     """ Tests is_valid function """
     bt = behavior_tree.BT([])
@@ -125,6 +167,33 @@ def test_subtree_is_valid():
 
     assert bt.is_subtree_valid(['s(', 'f(', 'c0', ')', ')', ')'], True, True)
 
+    #String is not consumed
+    string = ['s(', 'f(', 'a0', ')', ')', ')']
+    assert bt.is_subtree_valid(string, True, True)
+    assert string == ['s(', 'f(', 'a0', ')', ')', ')']
+
+def test_find_violation():
+    """ Tests find_violation function """
+    bt = behavior_tree.BT([])
+    assert bt.find_violation() == (0, 'empty tree')
+
+    assert bt.set(['s(', 'c0', 'f(', 'c0', 'a0', ')', 'a0', ')']).find_violation() is None
+    assert bt.set(['a0', 'a0']).find_violation() == (1, 'node after the root')
+    assert bt.set(['s(', 'a0', ')', ')']).find_violation() == (3, 'node after the root')
+    assert bt.set([')', 'a0']).find_violation() == (0, 'up without control node')
+    assert bt.set(['s(', 'f(', ')', 'a0', ')']).find_violation() == (2, 'up directly after control node')
+    assert bt.set(['s(', 'c0', 'x', ')']).find_violation() == (2, 'unknown node')
+    assert bt.set(['x']).find_violation() == (0, 'unknown node')
+    assert bt.set(['s(', 'c0', 'c0', 'a0', ')']).find_violation() == (2, 'identical conditions')
+    assert bt.set(['f(', 'c0', 'f(', 'c1', 'a0', ')', ')']).find_violation() == (2, 'fallback in fallback')
+    assert bt.set(['s(', 'c0', 's(', 'c1', 'a0', ')', ')']).find_violation() == (2, 'sequence in sequence')
+    assert bt.set(['s(', 'f(', 'c0', 'a0', ')', 'a0']).find_violation() == (6, 'missing up')
+
+    #Long trees
+    bt.set(['s('] + ['f(', 'c0', 's(', 'c1', 'a0', ')', ')'] * 1000 + [')'])
+    assert bt.is_valid()
+    assert bt.depth() == 3
+
 def test_close():
     """ Tests close function """
     bt = behavior_tree.BT([])
@@ -179,6 +248,53 @@ def test_trim():
     bt.trim()
     assert bt.bt == ['s(', 'a0', 'a1', ')']
 
+    bt.set(['s(', 'a0', 'f(', 'f(', 's(', 'a1', 'a2', ')', ')', ')', 'f(', ')', ')'])
+    bt.trim()
+    assert bt.bt == ['s(', 'a0', 'a1', 'a2', ')']
+
+    deep = ['s(', 'a0', 'f(', 'a1'] * 1000 + ['a2'] + [')', ')'] * 1000
+    bt.set(deep)
+    bt.trim()
+    assert bt.bt == deep
+
+def test_canonicalize():
+    """ Tests canonicalize function """
+    bt = behavior_tree.BT([])
+
+    #Single children and nested control nodes of the same type
+    bt.set(['s(', 'a0', 's(', 'c0', 'f(', 'a1', ')', ')', 'a2', ')'])
+    assert bt.canonicalize() == ['s(', 'a0', 'c0', 'a1', 'a2', ')']
+
+    #Normalized parameters and repeated conditions
+    bt.set(['f(', 'd < 5.5?', 'd < 5?', 'e > 10?', 'a0', ')'])
+    assert bt.canonicalize() == ['f(', 'd < 5?', 'e > 10?', 'a0', ')']
+
+    #Constant conditions, with d and e between 0 and 100 in the world
+    ranges = {'d': (0, 100), 'e': (0, 100)}
+    bt.set(['f(', 'd < 0?', 'a0', 'e > 100?', 'a1', ')'])
+    assert bt.canonicalize(ranges) == ['f(', 'a0', 'a1', ')']
+    bt.set(['f(', 'c0', 'd < 101?', 'a0', ')'])
+    assert bt.canonicalize(ranges) == ['f(', 'c0', behavior_tree.TRUE_NODE, ')']
+    assert bt.canonicalize(ranges) == ['f(', 'c0', behavior_tree.TRUE_NODE, ')']
+    bt.set(['s(', 'a0', 'e < 0?', 'a1', 'a2', ')'])
+    assert bt.canonicalize(ranges) == ['s(', 'a0', behavior_tree.FALSE_NODE, ')']
+    bt.set(['s(', 'f(', 'd > 200?', 'e < 0?', ')', 'a0', ')'])
+    assert bt.canonicalize(ranges) == [behavior_tree.FALSE_NODE]
+    assert bt.canonicalize(ranges) == [behavior_tree.FALSE_NODE]
+
+    #Only the given ranges decide what is constant, not the min and max in the settings
+    bt.set(['f(', 'd < 0?', 'd > 50?', 'a0', ')'])
+    assert bt.canonicalize() == ['f(', 'd < 0?', 'd > 50?', 'a0', ')']
+    assert bt.canonicalize({'d': (0, 50)}) == ['a0']
+    bt.set(['f(', 'e > 150?', 'a0', ')'])
+    assert bt.canonicalize({'e': (0, 200)}) == ['f(', 'e > 150?', 'a0', ')']
+
+    assert bt.canonicalize() == bt.canonicalize()
+    assert behavior_tree.BT(['s(', 'a0', 's(', 'a1', ')', ')']).canonical_hash() == \
+           behavior_tree.BT(['s(', 'a0', 'a1', ')']).canonical_hash()
+    assert behavior_tree.BT(['s(', 'a0', 'a1', ')']).canonical_hash() != \
+           behavior_tree.BT(['s(', 'a1', 'a0', ')']).canonical_hash()
+
 def test_depth():
     """ Tests bt_depth function """
     bt = behavior_tree.BT([])
@@ -319,6 +435,29 @@ def test_delete_node():
     bt.set(['s(', 'a0', ')']).delete_node(2)
     assert bt.bt == ['s(', 'a0', ')']
 
+def test_get_index():
+    """ Tests get_index function """
+    bt = behavior_tree.BT(['s(', 'a0', 'f(', 'a0', ')', 'a0', ')'])
+    parents, children, up_nodes = bt.get_index()
+    assert parents == [None, 0, 0, 2, 2, 0, 0]
+    assert children == [[1, 2, 5], [], [3], [], [], [], []]
+    assert up_nodes == [6, None, 4, None, None, None, None]
+    assert bt.get_index() is bt.get_index()
+
+    #Tables are rebuilt when the bt is changed through BT or assigned
+    bt.add_node(1, 'a1')
+    assert bt.find_children(0) == [1, 2, 3, 6]
+    assert bt.find_up_node(3) == 5
+    bt.delete_node(3)
+    assert bt.find_children(0) == [1, 2, 3]
+    bt.bt = ['f(', 'a0', ')']
+    assert bt.find_up_node(0) == 2
+
+    #Changes made in place from outside must invalidate the tables
+    bt.bt.insert(1, 'a1')
+    bt.invalidate_index()
+    assert bt.find_children(0) == [1, 2]
+
 def test_find_parent():
     """ Tests find_parent function """
     bt = behavior_tree.BT([])
@@ -264,7 +264,8 @@ def test_moveto():
 
 def test_pick():
     """ Tests pick behavior """
-    sm = simulation.Simulation()
+    #Nothing arrives on the conveyors in the first ticks of seed 0
+    sm = simulation.Simulation(seed=0)
     behavior, _ = behaviors.get_node_from_string("pick", sm)
     behavior.initialise()
     sm.state.robot_pos = simulation.get_pos(simulation.Stations.CONVEYOR_HEAVY)
@@ -0,0 +1,85 @@
+"""
+Tests the compiled behavior tree interpreter against the py_trees implementation
+"""
+import random
+import py_trees as pt
+import simulation.behavior_tree as behavior_tree
+import simulation.behaviors as behaviors
+import simulation.compiled_bt as compiled_bt
+import simulation.conveyor_kitting as sm
+import simulation.notebook_interface as notebook_interface
+from simulation.py_trees_interface import PyTree
+
+STATUS_CODES = {pt.common.Status.INVALID: compiled_bt.INVALID,
+                pt.common.Status.SUCCESS: compiled_bt.SUCCESS,
+                pt.common.Status.FAILURE: compiled_bt.FAILURE,
+                pt.common.Status.RUNNING: compiled_bt.RUNNING}
+
+def get_nodes(node):
+    """ Returns the nodes of a py tree in the same order as in the string """
+    nodes = [node]
+    for child in node.children:
+        nodes += get_nodes(child)
+    return nodes
+
+def test_compile_bt():
+    """
+    Tests the layout of compiled programs
+    """
+    program = compiled_bt.compile_bt(['s(', 'f(', 'battery level > 50?', 'charge!', ')', 'idle!', ')'])
+    assert program.opcodes == [compiled_bt.OP_SEQUENCE, compiled_bt.OP_FALLBACK, \
+                               compiled_bt.OP_GREATER_THAN, compiled_bt.OP_CHARGE, compiled_bt.OP_IDLE]
+    assert program.args[2] == ('battery_level', 50)
+    assert program.children == [(1, 4), (2, 3), (), (), ()]
+    assert program.end == [5, 4, 3, 4, 5]
+
+    #Missing up nodes are closed at the end and nodes after the root are ignored, like in PyTree
+    program = compiled_bt.compile_bt(['fm(', 'sm(', 'move to DELIVERY!', 'place!'])
+    assert program.children == [(1,), (2, 3), (), ()]
+    assert program.end == [4, 4, 3, 4]
+    assert compiled_bt.compile_bt(['idle!', 'pick!']).opcodes == [compiled_bt.OP_IDLE]
+    assert compiled_bt.compile_bt(['at station CHARGE2?']).args == [sm.Stations.CHARGE2]
+    assert compiled_bt.compile_bt([behavior_tree.TRUE_NODE]).args == [compiled_bt.SUCCESS]
+    assert compiled_bt.compile_bt([behavior_tree.FALSE_NODE]).args == [compiled_bt.FAILURE]
+
+def test_node_status(bt_settings):
+    """
+    Tests that all nodes get the same status and current child as in py_trees on every tick
+    """
+    random.seed(2)
+    for _ in range(20):
+        individual = behavior_tree.BT([]).random(random.randint(1, 20))
+        seed = random.randint(0, 100)
+        py_world = sm.Simulation(seed=seed)
+        compiled_world = sm.Simulation(seed=seed)
+        pytree = PyTree(individual[:], behaviors=behaviors, world_interface=py_world)
+        tree = compiled_bt.CompiledTree(individual[:], world_interface=compiled_world)
+        nodes = get_nodes(pytree.root)
+        for _ in range(100):
+            pytree.root.tick_once()
+            py_world.send_references()
+            tree.tick()
+            compiled_world.send_references()
+            assert [STATUS_CODES[node.status] for node in nodes] == tree.status
+            for node, current in zip(nodes, tree.current):
+                current_child = getattr(node, 'current_child', None)
+                if current_child is None:
+                    assert current == -1
+                else:
+                    assert node.children.index(current_child) == current
+            assert py_world.state == compiled_world.state
+
+def test_compiled_fitness(bt_settings):
+    """
+    Tests that the compiled environment gives the same fitness as the py_trees environment
+    """
+    individual = ['s(', 'f(', 'battery level > 30?', 'sm(', 'move to CHARGE2!', 'charge!', ')', ')', \
+                        'f(', 'carried weight > 7?', \
+                              'fm(', 'sm(', 'conveyor heavy > 0?', 'move to CONVEYOR_HEAVY!', 'pick!', ')', \
+                                     's(', 'move to CONVEYOR_LIGHT!', 'pick!', ')', ')', ')', \
+                        'move to DELIVERY!', 'place!', ')']
+    for seed in range(5):
+        environment = notebook_interface.Environment(seed=seed)
+        compiled_environment = notebook_interface.Environment(seed=seed, compiled=True)
+        assert compiled_environment.get_fitness(individual) == environment.get_fitness(individual)
+        assert compiled_environment.world_interface.state == environment.world_interface.state
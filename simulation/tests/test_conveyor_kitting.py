@@ -1,6 +1,8 @@
 """
 Testing simulation of a robot performing kitting from two conveyors
 """
+import random
+import pytest
 import simulation.conveyor_kitting as simulation
 
 def test_moveto():
@@ -45,7 +47,7 @@ def test_pick():
     """
     Tests pick function
     """
-    sim = simulation.Simulation()
+    sim = simulation.Simulation(seed=0)
     for _ in range(10):
         sim.moveto(simulation.Stations.CONVEYOR_LIGHT)
     sim.state.cnv_n_light += 1
@@ -89,3 +91,130 @@ def test_place():
     assert sim.place()
     assert sim.state.carried_light == 0
     assert sim.state.carried_heavy == 0
+
+def test_spawn_schedule():
+    """
+    Tests that spawns follow the precomputed schedule of the seed
+    """
+    schedule = simulation.get_spawn_schedule(1)
+    assert len(schedule) == simulation.EPISODE_LENGTH
+    assert schedule == simulation.make_spawn_schedule(random.Random(1), simulation.EPISODE_LENGTH)
+    assert simulation.get_spawn_schedule(1, 2 * simulation.EPISODE_LENGTH)[:simulation.EPISODE_LENGTH] == schedule
+
+    sim = simulation.Simulation(seed=1)
+    assert sim.spawn_schedule is schedule
+    random.seed(2) #Global random state must not affect the simulation
+    for tick in range(2 * simulation.EPISODE_LENGTH):
+        heavy = sim.state.cnv_n_heavy + sim.state.blocked_heavy
+        light = sim.state.cnv_n_light + sim.state.blocked_light
+        spawns = simulation.get_spawn_schedule(1, 2 * simulation.EPISODE_LENGTH)[tick]
+        random.random()
+        sim.idle()
+        assert sim.state.cnv_n_heavy + sim.state.blocked_heavy == heavy + bool(spawns & simulation.SPAWN_HEAVY)
+        assert sim.state.cnv_n_light + sim.state.blocked_light == light + bool(spawns & simulation.SPAWN_LIGHT)
+
+    sim = simulation.Simulation(spawn_schedule=bytes([simulation.SPAWN_HEAVY | simulation.SPAWN_LIGHT] * 3))
+    for _ in range(3):
+        sim.idle()
+    assert sim.state.cnv_n_heavy == 3
+    assert sim.state.cnv_n_light == 3
+
+    #Unseeded simulations draw from their own generator, in chunks as the episode goes on
+    random.seed(3)
+    state = random.getstate()
+    sim = simulation.Simulation()
+    for _ in range(3 * simulation.EPISODE_LENGTH):
+        sim.idle()
+    assert random.getstate() == state
+    assert len(sim.spawn_schedule) == 4 * simulation.EPISODE_LENGTH
+
+def test_fast_forward():
+    """
+    Tests that fast forwarding only does spawn accounting and stops before objects are added to conveyors
+    """
+    sim = simulation.Simulation(spawn_schedule=bytes([simulation.SPAWN_HEAVY, simulation.SPAWN_LIGHT, 0]))
+    sim.state.cnv_n_heavy = simulation.MAX_HEAVY
+    steady_state = sim.get_steady_state()
+    assert sim.fast_forward(10) == 1
+    assert sim.state.tick == 1
+    assert sim.state.blocked_heavy == 1
+    assert sim.get_steady_state() == steady_state
+
+    sim.state.cnv_n_light = simulation.MAX_LIGHT
+    assert sim.fast_forward(1) == 1
+    assert sim.state.blocked_light == 1
+    assert sim.fast_forward(1) == 1
+    assert sim.state.tick == 3
+
+    #Only whole periods are skipped
+    sim = simulation.Simulation(spawn_schedule=bytes([simulation.SPAWN_HEAVY] * 7 + [simulation.SPAWN_LIGHT]))
+    sim.state.cnv_n_heavy = simulation.MAX_HEAVY
+    assert sim.fast_forward(100, period=3) == 6
+    assert sim.state.blocked_heavy == 6
+    assert sim.fast_forward(100, period=3) == 0
+    assert sim.fast_forward(1) == 1
+    assert sim.fast_forward(100, period=3) == 0
+    assert sim.state.tick == 7
+
+def test_station_table():
+    """
+    Tests that the station is kept up to date when moving and when the position is set from outside
+    """
+    assert simulation.get_pos(simulation.Stations.DELIVERY) is not simulation.get_pos(simulation.Stations.DELIVERY)
+    for (x, y, station), (next_x, next_y, next_station) in simulation.NEXT_STEPS.items():
+        assert simulation.get_step(x, y, station) == (next_x, next_y)
+        assert next_station == simulation.STATION_AT_POSITION.get((next_x, next_y), -1)
+
+    sim = simulation.Simulation()
+    assert sim.get_station() == -1
+    while sim.moveto(simulation.Stations.CONVEYOR_LIGHT) and sim.get_station() == -1:
+        pass
+    assert sim.at_station(simulation.Stations.CONVEYOR_LIGHT)
+    assert sim.state.robot_pos == simulation.get_pos(simulation.Stations.CONVEYOR_LIGHT)
+
+    sim.state.robot_pos = simulation.get_pos(simulation.Stations.CHARGE2)
+    assert sim.at_station(simulation.Stations.CHARGE2)
+    assert not sim.at_station(simulation.Stations.CONVEYOR_LIGHT)
+    sim.state.robot_pos.x, sim.state.robot_pos.y = simulation.STATION_POSITIONS[simulation.Stations.DELIVERY]
+    assert sim.at_station(simulation.Stations.DELIVERY)
+    sim.state.robot_pos.x = 7.0
+    assert sim.get_station() == -1
+
+    #Steps from positions off the table are cached without growing the table
+    table_size = len(simulation.NEXT_STEPS)
+    sim.state.robot_pos = simulation.Pos(7.0, 3.0)
+    assert sim.get_station() == -1
+    sim.moveto(simulation.Stations.CONVEYOR_LIGHT)
+    assert sim.at_station(simulation.Stations.CONVEYOR_LIGHT)
+    assert len(simulation.NEXT_STEPS) == table_size
+
+    robot_pos = simulation.Pos(7.0, 3.0)
+    with pytest.deprecated_call():
+        simulation.move_towards_x(robot_pos, simulation.get_pos(simulation.Stations.CONVEYOR_LIGHT))
+    assert robot_pos.x == simulation.get_step(7.0, 3.0, simulation.Stations.CONVEYOR_LIGHT)[0]
+
+def test_macro_move():
+    """
+    Tests that moving several ticks at once gives the same state as moving one tick at a time
+    """
+    for seed in range(5):
+        for station in simulation.Stations:
+            for battery_level in [1, 4, simulation.MAX_BATTERY]:
+                sim = simulation.Simulation(seed=seed)
+                macro_sim = simulation.Simulation(seed=seed)
+                sim.state.battery_level = battery_level
+                macro_sim.state.battery_level = battery_level
+                forecast = macro_sim.forecast_move(station, 100)
+                ticks = len(forecast['station'])
+                for i in range(ticks):
+                    assert forecast['station'][i] == sim.get_station()
+                    assert forecast['battery_level'][i] == sim.state.battery_level
+                    assert forecast['cnv_n_heavy'][i] == sim.state.cnv_n_heavy
+                    assert forecast['cnv_n_light'][i] == sim.state.cnv_n_light
+                    assert not sim.at_station(station)
+                    assert sim.moveto(station)
+                assert sim.at_station(station) or not sim.moveto(station)
+                if ticks > 0:
+                    macro_sim.macro_move(station, ticks)
+                assert macro_sim.state == sim.state
+                assert macro_sim.get_station() == sim.get_station()
@@ -0,0 +1,94 @@
+"""
+Tests exact fitness over all spawn sequences
+"""
+import itertools
+import math
+import random
+import simulation.behavior_tree as behavior_tree
+import simulation.behaviors as behaviors
+import simulation.benchmark as benchmark
+import simulation.compiled_bt as compiled_bt
+import simulation.conveyor_kitting as sm
+import simulation.exact_fitness as exact_fitness
+import simulation.fitness_function as fitness_function
+import simulation.gp as gp
+import simulation.notebook_interface as notebook_interface
+from simulation.py_trees_interface import PyTree
+
+INDIVIDUAL = ['s(', 'f(', 'battery level > 50?', 's(', 'move to CHARGE1!', 'charge!', ')', ')', \
+                    'f(', 'carried weight > 3?', 's(', 'move to CONVEYOR_LIGHT!', 'pick!', ')', ')', \
+                    'move to DELIVERY!', 'place!', ')']
+
+def set_start(world):
+    """ Sets a start state with the robot carrying at a conveyor close to full """
+    state = world.state
+    state.robot_pos = sm.get_pos(sm.Stations.CONVEYOR_LIGHT)
+    state.cnv_n_light = 9
+    state.cnv_n_heavy = 10
+    state.carried_light = 1
+    state.carried_weight = 2
+    state.battery_level = 4
+    state.delivered_light = 3
+    state.blocked_heavy = 1
+
+def get_enumerated_fitness(individual, max_ticks, fitness_coeff, start=None, compiled=False):
+    # pylint: disable=too-many-arguments
+    """ Returns mean and standard deviation of fitness by running every spawn sequence """
+    probabilities = dict(exact_fitness.SPAWN_OUTCOMES)
+    mean = 0.0
+    square = 0.0
+    for sequence in itertools.product(list(probabilities), repeat=max_ticks):
+        probability = math.prod(probabilities[spawns] for spawns in sequence)
+        world = sm.Simulation(seed=1, spawn_schedule=bytes(sequence))
+        if start is not None:
+            start(world)
+        if compiled:
+            tree = compiled_bt.CompiledTree(individual[:], world_interface=world)
+        else:
+            tree = PyTree(individual[:], behaviors=behaviors, world_interface=world)
+        ticks, _ = tree.run_bt(max_ticks=max_ticks)
+        fitness = fitness_function.compute_fitness(world, tree, ticks, fitness_coeff)
+        mean += probability * fitness
+        square += probability * fitness * fitness
+    return mean, math.sqrt(max(square - mean * mean, 0.0))
+
+def test_exact_fitness(bt_settings):
+    """
+    Tests that the exact fitness is the same as running every spawn sequence of a short episode
+    """
+    fitness_coeff = fitness_function.Coefficients(failed=-3.0, timeout=1.5, ticks=0.01, depth=0.3)
+    for individual in [['conveyor light > 0?'], INDIVIDUAL, \
+                       ['f(', 'conveyor heavy > 0?', 'sm(', 'move to CONVEYOR_HEAVY!', 'pick!', ')', ')']]:
+        exact = exact_fitness.get_exact_fitness(individual, 5, fitness_coeff)
+        mean, std = get_enumerated_fitness(individual, 5, fitness_coeff)
+        assert math.isclose(exact.mean, mean, abs_tol=1e-9)
+        assert math.isclose(exact.std, std, abs_tol=1e-6)
+
+    for individual in [INDIVIDUAL, ['s(', 'pick!', 'move to DELIVERY!', 'place!', ')'], ['idle!']]:
+        world = sm.Simulation()
+        set_start(world)
+        exact = exact_fitness.get_exact_fitness(individual, 5, fitness_coeff, world.state)
+        mean, std = get_enumerated_fitness(individual, 5, fitness_coeff, set_start)
+        assert math.isclose(exact.mean, mean, abs_tol=1e-9)
+        assert math.isclose(exact.std, std, abs_tol=1e-6)
+        assert exact.states > 1
+
+    #Random and mutated trees with other coefficients
+    random.seed(4)
+    for i in range(10):
+        if i % 2 == 0:
+            individual = behavior_tree.BT([]).random(random.randint(1, 20))
+        else:
+            individual = gp.mutate(random.choice(benchmark.KITTING_TREES))
+        fitness_coeff = fitness_function.Coefficients(*[random.uniform(-3.0, 3.0) for _ in range(9)])
+        world = sm.Simulation()
+        set_start(world)
+        exact = exact_fitness.get_exact_fitness(individual, 5, fitness_coeff, world.state)
+        mean, std = get_enumerated_fitness(individual, 5, fitness_coeff, set_start, compiled=True)
+        assert math.isclose(exact.mean, mean, abs_tol=1e-9)
+        assert math.isclose(exact.std, std, abs_tol=1e-4)
+
+    #Close to the mean over many seeds in a longer episode
+    exact = exact_fitness.get_exact_fitness(INDIVIDUAL, 30)
+    batch = notebook_interface.Environment(compiled=True).get_fitness_batch(INDIVIDUAL, range(400), max_ticks=30)
+    assert abs(batch.mean - exact.mean) < 4 * exact.std / math.sqrt(400)
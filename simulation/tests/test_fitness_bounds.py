@@ -0,0 +1,89 @@
+"""
+Tests static fitness bounds
+"""
+import math
+import random
+import simulation.behavior_tree as behavior_tree
+import simulation.benchmark as benchmark
+import simulation.exact_fitness as exact_fitness
+import simulation.fitness_bounds as fitness_bounds
+import simulation.fitness_function as fitness_function
+import simulation.gp as gp
+import simulation.notebook_interface as notebook_interface
+
+INDIVIDUAL = ['s(', 'f(', 'battery level > 50?', 's(', 'move to CHARGE1!', 'charge!', ')', ')', \
+                    'f(', 'carried weight > 3?', 's(', 'move to CONVEYOR_LIGHT!', 'pick!', ')', ')', \
+                    'move to DELIVERY!', 'place!', ')']
+
+def test_analyze(bt_settings):
+    """
+    Tests what trees are found to be able to do
+    """
+    analysis = fitness_bounds.analyze(INDIVIDUAL)
+    assert analysis.can_deliver()
+    assert analysis.pick_light and not analysis.pick_heavy
+    assert analysis.charge
+
+    assert not fitness_bounds.analyze(['s(', 'move to CONVEYOR_LIGHT!', 'pick!', ')']).can_deliver()
+    #Carried heavy is at most two, so the place is never ticked
+    analysis = fitness_bounds.analyze(['s(', 'move to CONVEYOR_HEAVY!', 'pick!', 'carried heavy > 2?', \
+                                       'move to DELIVERY!', 'place!', ')'])
+    assert analysis.pick_heavy and not analysis.place
+
+    #The heavy conveyor is passed on the way to CHARGE2
+    analysis = fitness_bounds.analyze(['f(', 's(', 'at station CONVEYOR_HEAVY?', 'pick!', ')', \
+                                       'move to CHARGE2!', ')'])
+    assert analysis.pick_heavy
+    assert analysis.stations == {2, 1}
+    assert analysis.root_statuses == {1, 2, 3}
+
+    analysis = fitness_bounds.analyze(['s(', 'at station DELIVERY?', 'idle!', ')'])
+    assert analysis.root_statuses == {2}
+    analysis = fitness_bounds.analyze(['f(', behavior_tree.FALSE_NODE, behavior_tree.TRUE_NODE, 'idle!', ')'])
+    assert analysis.root_statuses == {1}
+
+def test_fitness_bound(bt_settings):
+    """
+    Tests that bounds are above the simulated fitness, and exact for trees that can't deliver
+    """
+    fitness_coeff = fitness_function.Coefficients(failed=-3.0, timeout=1.5, ticks=0.01, depth=0.3)
+    environment = notebook_interface.Environment(compiled=True, fitness_coeff=fitness_coeff)
+    seeds = [0, 1, 2]
+    for individual in [['idle!'], ['at station DELIVERY?'], ['s(', 'move to DELIVERY!', 'place!', ')']]:
+        bound = fitness_bounds.get_fitness_bound(individual, seeds, fitness_coeff=fitness_coeff)
+        assert math.isclose(bound, environment.get_fitness_batch(individual, seeds).mean)
+
+    random.seed(0)
+    individuals = [INDIVIDUAL] + [behavior_tree.BT([]).random(random.randint(1, 20)) for _ in range(200)]
+    for individual in individuals:
+        bound = fitness_bounds.get_fitness_bound(individual, seeds, fitness_coeff=fitness_coeff)
+        assert environment.get_fitness_batch(individual, seeds).mean <= bound + 1e-9
+        assert bound <= fitness_bounds.get_fitness_bound(individual, fitness_coeff=fitness_coeff)
+
+    #Mutated and crossed over kitting trees deliver, checked per seed with other coefficients and episode lengths
+    population = [tree[:] for tree in benchmark.KITTING_TREES]
+    for _ in range(150):
+        if random.random() < 0.5:
+            population.append(gp.mutate(random.choice(population)))
+        else:
+            population.append(gp.crossover(random.choice(population), random.choice(population))[0])
+        fitness_coeff = fitness_function.Coefficients(*[random.uniform(-3.0, 3.0) for _ in range(9)])
+        max_ticks = random.choice([20, 200, 400])
+        environment = notebook_interface.Environment(compiled=True, fitness_coeff=fitness_coeff)
+        seed = random.randrange(1000)
+        bound = fitness_bounds.get_fitness_bound(population[-1], [seed], max_ticks, fitness_coeff)
+        assert environment.get_fitness(population[-1], max_ticks=max_ticks, seed=seed) <= bound + 1e-9
+        assert bound <= fitness_bounds.get_fitness_bound(population[-1], None, max_ticks, fitness_coeff) + 1e-9
+
+    assert fitness_bounds.get_threshold([1.0, 3.0, 2.0], 2) == 2.0
+    assert fitness_bounds.get_threshold([1.0], 2) == -math.inf
+
+def test_expected_fitness_bound(bt_settings):
+    """
+    Tests that bounds over any spawn sequence are above the exact expected fitness
+    """
+    fitness_coeff = fitness_function.Coefficients(failed=-3.0, timeout=1.5, ticks=0.01, depth=0.3)
+    for individual in [INDIVIDUAL, ['idle!'], ['f(', 'conveyor heavy > 0?', 'sm(', 'move to CONVEYOR_HEAVY!', \
+                                                'pick!', ')', ')']]:
+        exact = exact_fitness.get_exact_fitness(individual, 30, fitness_coeff)
+        assert exact.mean <= fitness_bounds.get_fitness_bound(individual, None, 30, fitness_coeff) + 1e-9
@@ -0,0 +1,69 @@
+"""
+Tests the fitness cache
+"""
+import simulation.fitness_cache as fitness_cache
+import simulation.fitness_function as fitness_function
+import simulation.notebook_interface as notebook_interface
+
+INDIVIDUAL = ['s(', 'f(', 'battery level > 50?', 's(', 'move to CHARGE1!', 'charge!', ')', ')', \
+                    'f(', 'carried weight > 3?', 's(', 'move to CONVEYOR_LIGHT!', 'pick!', ')', ')', \
+                    'move to DELIVERY!', 'place!', ')']
+
+def test_get_key():
+    """
+    Tests that keys depend on everything that affects the fitness
+    """
+    key = fitness_cache.get_key(['idle!'], 0, 200)
+    assert key == fitness_cache.get_key(['idle!'], 0, 200, fitness_function.Coefficients())
+    assert key != fitness_cache.get_key(['idle!'], 1, 200)
+    assert key != fitness_cache.get_key(['idle!'], 0, 100)
+    assert key != fitness_cache.get_key(['pick!'], 0, 200)
+    assert key != fitness_cache.get_key(['idle!'], 0, 200, fitness_function.Coefficients(length=-0.1))
+
+def test_lru():
+    """
+    Tests that the least recently used entry is dropped
+    """
+    cache = fitness_cache.FitnessCache(max_size=2)
+    cache.put('a', 1.0)
+    cache.put('b', 2.0)
+    assert cache.get('a') == 1.0
+    cache.put('c', 3.0)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1.0
+    assert cache.get('c') == 3.0
+    assert len(cache) == 2
+    assert cache.hits == 3
+    assert cache.misses == 1
+
+def test_sqlite(tmp_path):
+    """
+    Tests that entries survive closing and reopening the cache file
+    """
+    path = str(tmp_path / 'fitness.sqlite')
+    with fitness_cache.FitnessCache(path=path) as cache:
+        cache.put('a', -1.5)
+    with fitness_cache.FitnessCache(path=path) as cache:
+        assert cache.get('a') == -1.5
+        assert cache.get('b') is None
+
+def test_environment_cache(bt_settings):
+    """
+    Tests that the environment uses the cache for seeded evaluations
+    """
+    cache = fitness_cache.FitnessCache()
+    environment = notebook_interface.Environment(seed=3, cache=cache)
+    fitness = environment.get_fitness(INDIVIDUAL)
+    assert environment.get_fitness(INDIVIDUAL) == fitness
+    assert cache.hits == 1
+    assert cache.misses == 1
+    assert cache.saved_time() > 0.0
+
+    batch = environment.get_fitness_batch(INDIVIDUAL, [2, 3, 4])
+    assert batch.fitness == notebook_interface.Environment().get_fitness_batch(INDIVIDUAL, [2, 3, 4]).fitness
+    assert cache.hits == 2
+    assert cache.misses == 3
+
+    #Unseeded episodes are random and never cached
+    notebook_interface.Environment(cache=cache).get_fitness(INDIVIDUAL)
+    assert cache.hits + cache.misses == 5
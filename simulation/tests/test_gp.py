@@ -0,0 +1,119 @@
+"""
+Tests the genetic programming loop
+"""
+import math
+import random
+import statistics
+import simulation.behavior_tree as behavior_tree
+import simulation.gp as gp
+import simulation.notebook_interface as notebook_interface
+
+INDIVIDUAL = ['s(', 'f(', 'battery level > 50?', 's(', 'move to CHARGE1!', 'charge!', ')', ')', \
+                    'f(', 'carried weight > 3?', 's(', 'move to CONVEYOR_LIGHT!', 'pick!', ')', ')', \
+                    'move to DELIVERY!', 'place!', ')']
+
+def get_parameters(**kwargs):
+    """ Returns parameters of a small and quick run """
+    return gp.GpParameters(n_population=6, n_generations=4, seeds=[0, 1], max_ticks=50, rng_seed=3, **kwargs)
+
+def test_operators(bt_settings):
+    """
+    Tests that mutation and crossover only make valid trees
+    """
+    random.seed(0)
+    for _ in range(100):
+        individual = behavior_tree.BT([]).random(random.randint(1, 10))
+        mutated = gp.mutate(individual)
+        assert behavior_tree.BT(mutated).is_valid()
+        child1, child2 = gp.crossover(INDIVIDUAL, individual)
+        assert behavior_tree.BT(child1).is_valid()
+        assert behavior_tree.BT(child2).is_valid()
+    assert gp.mutate(INDIVIDUAL) != INDIVIDUAL
+    assert gp.crossover(['idle!'], INDIVIDUAL) == (['idle!'], INDIVIDUAL)
+
+def test_run(bt_settings):
+    """
+    Tests a short run, and that elites keep the best fitness from getting worse
+    """
+    state = gp.run(get_parameters())
+    assert state.generation == 4
+    assert len(state.population) == 6
+    assert all(behavior_tree.BT(individual).is_valid() for individual in state.population)
+    best_fitness = [stats.best_fitness for stats in state.stats]
+    assert best_fitness == sorted(best_fitness)
+
+    hall_of_fame = [fitness for fitness, _ in state.hall_of_fame]
+    assert hall_of_fame == sorted(hall_of_fame, reverse=True)
+    assert len({individual for _, individual in state.hall_of_fame}) == len(state.hall_of_fame)
+    best, fitness = state.best()
+    assert fitness == best_fitness[-1] == state.fitness[tuple(best)]
+    assert state.evaluations() == len(state.fitness)
+    assert state.evaluations_per_second() > 0.0
+
+    elitist = gp.run(get_parameters(selection='elitist', n_parents=2))
+    assert elitist.generation == 4
+
+def test_checkpoint(bt_settings, tmp_path):
+    """
+    Tests that a run continued from a checkpoint, and a run evaluated in worker processes,
+    give the same result as an uninterrupted serial run
+    """
+    state = gp.run(get_parameters())
+
+    path = str(tmp_path / 'gp.pickle')
+    parameters = get_parameters(checkpoint_path=path)
+    parameters.n_generations = 2
+    assert gp.run(parameters).generation == 2
+    parameters.n_generations = 4
+    continued = gp.run(parameters)
+    assert continued.generation == 4
+    assert continued.population == state.population
+    assert continued.hall_of_fame == state.hall_of_fame
+    assert gp.load_checkpoint(path).population == state.population
+
+    parallel = gp.run(get_parameters(workers=2))
+    assert parallel.population == state.population
+    assert parallel.hall_of_fame == state.hall_of_fame
+
+    #Pruning and elitist selection continue the same way
+    state = gp.run(get_parameters(selection='elitist', n_parents=3, prune_top_k=2))
+    path = str(tmp_path / 'pruned.pickle')
+    parameters = get_parameters(selection='elitist', n_parents=3, prune_top_k=2, checkpoint_path=path)
+    parameters.n_generations = 2
+    gp.run(parameters)
+    parameters.n_generations = 4
+    continued = gp.run(parameters)
+    assert continued.population == state.population
+    assert continued.fitness == state.fitness
+    assert continued.pruned == state.pruned
+    assert [stats.pruned for stats in continued.stats] == [stats.pruned for stats in state.stats]
+
+def test_pruning(bt_settings):
+    """
+    Tests that individuals that can't beat the best found are pruned, and that pruned individuals
+    are never selected over simulated ones or enter the hall of fame, also when prune_top_k is smaller
+    """
+    parameters = get_parameters(prune_top_k=2)
+    parameters.n_generations = 6
+    state = gp.run(parameters)
+    assert len(state.pruned) == sum(stats.pruned for stats in state.stats) >= 3
+    assert state.evaluations() == len(state.fitness)
+    assert not set(state.pruned) & set(state.fitness)
+    assert len(state.hall_of_fame) == parameters.hall_of_fame_size
+    for fitness, individual in state.hall_of_fame:
+        episodes = notebook_interface.run_episodes((list(individual), parameters.seeds, parameters.max_ticks, \
+                                                    False, None, True))
+        assert fitness == statistics.mean(episodes)
+
+    #Pruned individuals rank below every simulated one, even the worst
+    worst = min(state.fitness, key=state.fitness.get)
+    population = [list(individual) for individual in list(state.pruned)[:3]] + [list(worst)]
+    fitness, evaluations, pruned = gp.evaluate(population, state, parameters)
+    assert evaluations == 0 and pruned == 0
+    assert fitness == [-math.inf] * 3 + [state.fitness[worst]]
+    parameters.tournament_size = len(population)
+    assert gp.select(population, fitness, parameters) == list(worst)
+    parameters.selection = 'elitist'
+    parameters.n_parents = 1
+    assert gp.select(population, fitness, parameters) == list(worst)
+    assert gp.update_hall_of_fame([], population, fitness, 5) == [(state.fitness[worst], worst)]
@@ -2,6 +2,7 @@
 Tests running complete trees via the notebook interface
 """
 
+import pytest
 import simulation.notebook_interface as notebook_interface
 import simulation.behavior_tree as behavior_tree
 import simulation.fitness_function as fitness_function
@@ -84,3 +85,51 @@ def test_step():
         environment.step(individual)
 
     assert state == environment.world_interface.state
+
+def test_get_fitness_batch():
+    """
+    Test running several seeds, serially and in parallel
+    """
+    environment = notebook_interface.Environment(verbose=False)
+
+    individual = ['s(', 'f(', 'battery level > 50', 's(', 'move to CHARGE1', 'charge', ')', ')', \
+                        'f(', 'carried weight > 0', 's(', 'move to CONVEYOR_LIGHT', 'pick', ')', ')', \
+                        'move to DELIVERY', 'place', ')']
+    seeds = range(6)
+
+    serial = environment.get_fitness_batch(individual, seeds)
+    parallel = environment.get_fitness_batch(individual, seeds, workers=2)
+    assert serial == parallel
+    assert serial.seeds == list(seeds)
+    assert len(serial.fitness) == len(seeds)
+
+    for seed, fitness in zip(seeds, serial.fitness):
+        assert notebook_interface.Environment(seed=seed).get_fitness(individual) == fitness
+    assert serial.mean == pytest.approx(sum(serial.fitness) / len(seeds))
+
+def test_get_population_fitness(bt_settings):
+    """
+    Test that individuals that behave the same are simulated once and get the right fitness
+    """
+    individual = ['s(', 'f(', 'battery level > 50?', 's(', 'move to CHARGE1!', 'charge!', ')', ')', \
+                        'f(', 'carried weight > 0?', 's(', 'move to CONVEYOR_LIGHT!', 'pick!', ')', ')', \
+                        'move to DELIVERY!', 'place!', ')']
+    population = [individual,
+                  ['s(', 's(', 'battery level < 101?', ')'] + individual[1:],
+                  ['f(', 'battery level < 0?', 's(', 'move to CONVEYOR_HEAVY!', 'pick!', ')', ')'],
+                  ['f(', 'at station CHARGE1?', 'carried heavy < 3?', 'idle!', ')'],
+                  ['s(', 'move to CHARGE2!', 'carried light > 5?', 'idle!', ')'],
+                  individual]
+    for compiled in [False, True]:
+        environment = notebook_interface.Environment(seed=2, compiled=compiled)
+        fitness = environment.get_population_fitness(population)
+        assert fitness == [notebook_interface.Environment(seed=2).get_fitness(individual) \
+                           for individual in population]
+
+    #The compiled path leaves no py_trees tree from an earlier run behind
+    environment = notebook_interface.Environment(seed=2)
+    environment.get_fitness(individual)
+    assert environment.pytree is not None
+    environment.compiled = True
+    environment.get_fitness(individual)
+    assert environment.pytree is None
@@ -1,9 +1,15 @@
 """
 Unit test for py_trees_interface.py
 """
+import random
 import pytest
 import py_trees as pt
 import simulation.behavior_tree as behavior_tree
+import simulation.behaviors as kitting_behaviors
+import simulation.benchmark as benchmark
+import simulation.compiled_bt as compiled_bt
+import simulation.conveyor_kitting as sm
+import simulation.notebook_interface as notebook_interface
 import simulation.py_trees_interface as interface
 import simulation.tests.behaviors_states as behaviors
 
@@ -62,3 +68,187 @@ def test_get_bt_from_root():
     bt = ['f(', 'f(', 'a', ')', 'a', ')']
     py_tree = interface.PyTree(bt[:], behaviors=behaviors)
     assert py_tree.get_bt_from_root() == bt
+
+def test_tick_logging(capsys):
+    """ Tests that ticking gives the same statuses whether debug messages are logged or not """
+    previous_level = pt.logging.level
+    try:
+        for level, logged in [(pt.logging.Level.INFO, False), (pt.logging.Level.DEBUG, True)]:
+            pt.logging.level = level
+            failure = pt.behaviours.Failure()
+            root = pt.composites.Selector('Fallback', children=[failure, pt.behaviours.Success()])
+            root.tick_once()
+            assert root.status == pt.common.Status.SUCCESS
+            assert failure.status == pt.common.Status.FAILURE
+            assert ('Selector.tick()' in capsys.readouterr().out) == logged
+
+            #The iterator is created again when accessed after stopping
+            root.stop()
+            assert failure.status == pt.common.Status.INVALID
+            assert list(root.iterator)[-1] is root
+            assert root.status == pt.common.Status.SUCCESS
+    finally:
+        pt.logging.level = previous_level
+
+def get_nodes(node):
+    """ Returns node and all nodes below it """
+    nodes = [node]
+    for child in node.children:
+        nodes += get_nodes(child)
+    return nodes
+
+def test_tick_direct(bt_settings):
+    """ Tests that ticking directly gives the same statuses as ticking through generators """
+    random.seed(3)
+    for _ in range(20):
+        individual = behavior_tree.BT([]).random(random.randint(1, 20))
+        seed = random.randint(0, 100)
+        worlds = [sm.Simulation(seed=seed), sm.Simulation(seed=seed)]
+        trees = [interface.PyTree(individual[:], behaviors=kitting_behaviors, world_interface=world) \
+                 for world in worlds]
+        nodes = [get_nodes(tree.root) for tree in trees]
+        for _ in range(100):
+            trees[0].root.tick_once()
+            assert trees[1].root.tick_direct() == trees[1].root.status
+            for world in worlds:
+                world.send_references()
+            for node, direct_node in zip(*nodes):
+                assert node.status == direct_node.status
+                assert (node.children.index(node.current_child) if getattr(node, 'current_child', None) else None) \
+                    == (direct_node.children.index(direct_node.current_child) \
+                        if getattr(direct_node, 'current_child', None) else None)
+            assert worlds[0].state == worlds[1].state
+
+    #Parallel, decorators and behaviours overriding tick
+    for policy in [pt.common.ParallelPolicy.SuccessOnAll(), pt.common.ParallelPolicy.SuccessOnOne()]:
+        roots = [pt.composites.Parallel(policy=policy, children=[ \
+                    pt.decorators.Inverter(pt.behaviours.Count(fail_until=0, running_until=2, success_until=4)), \
+                    pt.decorators.OneShot(pt.behaviours.Count(fail_until=0, running_until=1, success_until=2)), \
+                    pt.behaviours.SuccessEveryN('Every3', n=3)]) for _ in range(2)]
+        for _ in range(10):
+            roots[0].tick_once()
+            roots[1].tick_direct()
+            assert [node.status for node in roots[0].iterate()] == [node.status for node in roots[1].iterate()]
+
+    #The tree ticks directly unless a visitor needs to see the traversed nodes
+    tree = pt.trees.BehaviourTree(pt.composites.Sequence(children=[pt.behaviours.Success(), pt.behaviours.Running()]))
+    visitor = pt.visitors.SnapshotVisitor()
+    tree.add_visitor(visitor)
+    tree.tick()
+    assert tree.root.status == pt.common.Status.RUNNING
+    assert len(visitor.visited) == 3
+
+def test_current_index():
+    """ Tests that composites track the index of the current child and the range of ticked children """
+    children = [pt.behaviours.SuccessEveryN('Every2', n=2), pt.behaviours.Running(), pt.behaviours.Running()]
+    root = pt.composites.Selector(children=children)
+    root.tick_direct()
+    assert root.current_child is children[1]
+    assert root.get_current_index() == 1
+    assert root.high_water == 1
+
+    #Interrupted by the first child, only the ticked child is stopped
+    root.tick_direct()
+    assert root.get_current_index() == 0
+    assert children[1].status == pt.common.Status.INVALID
+    assert root.high_water == 0
+
+    #Changing the children is detected
+    root.insert_child(pt.behaviours.Failure(), 0)
+    assert root.get_current_index() == 1
+    assert root.high_water == 3
+    root.stop()
+    assert root.high_water == -1
+
+def test_lazy_attributes(bt_settings):
+    """ Tests that ids, loggers and blackboards are created on first access and that nodes have no dicts """
+    tree = interface.PyTree(['s(', 'battery level > 10?', 'sm(', 'move to DELIVERY!', 'place!', ')', ')'], \
+                            behaviors=kitting_behaviors, world_interface=sm.Simulation(seed=0))
+    nodes = get_nodes(tree.root)
+    for node in nodes:
+        assert not hasattr(node, '__dict__')
+        assert node._id is None # pylint: disable=protected-access
+    assert len({node.id for node in nodes}) == len(nodes)
+    assert tree.root.id == tree.root.id
+    assert tree.root.logger.prefix.startswith('Sequence')
+    assert tree.root.blackboards == []
+    assert tree.root.add_child(pt.behaviours.Success()) == tree.root.children[-1].id
+
+def test_reset(bt_settings):
+    """ Tests that running a reset tree gives the same results as running a freshly built tree """
+    random.seed(4)
+    individuals = [behavior_tree.BT([]).random(random.randint(1, 20)) for _ in range(20)] + \
+                  [benchmark.KITTING_TREES[1][:]]
+    for individual in individuals:
+        tree = interface.PyTree(individual[:], behaviors=kitting_behaviors, world_interface=None)
+        for seed in range(3):
+            world = sm.Simulation(seed=seed)
+            tree.reset(world)
+            fresh_world = sm.Simulation(seed=seed)
+            fresh_tree = interface.PyTree(individual[:], behaviors=kitting_behaviors, world_interface=fresh_world)
+            assert tree.run_bt(max_ticks=50) == fresh_tree.run_bt(max_ticks=50)
+            assert world.state == fresh_world.state
+            assert [node.status for node in tree.root.iterate()] == \
+                   [node.status for node in fresh_tree.root.iterate()]
+
+        for compiled in [False, True]:
+            environment = notebook_interface.Environment(compiled=compiled)
+            reused = [environment.get_fitness(individual, seed=seed) for seed in range(3)]
+            assert reused == [notebook_interface.Environment(seed=seed, compiled=compiled).get_fitness(individual) \
+                              for seed in range(3)]
+
+def test_fast_forward(bt_settings):
+    """ Tests that fast forwarding steady cycles gives the same results as ticking every tick """
+    random.seed(5)
+    #The last tree keeps moving between DELIVERY and CHARGE1 once the conveyors are full
+    individuals = [behavior_tree.BT([]).random(random.randint(1, 20)) for _ in range(30)] + \
+                  [['idle!'], ['s(', 'move to CHARGE1!', 'charge!', ')'], \
+                   ['f(', 's(', 'battery level > 50?', 'move to DELIVERY!', ')', \
+                          's(', 'move to CHARGE1!', 'charge!', ')', ')']]
+    for individual in individuals:
+        for seed in range(2):
+            results = []
+            for tree_class in [interface.PyTree, compiled_bt.CompiledTree]:
+                for fast_forward in [False, True]:
+                    world = sm.Simulation(seed=seed)
+                    if tree_class is interface.PyTree:
+                        tree = tree_class(individual[:], behaviors=kitting_behaviors, world_interface=world)
+                    else:
+                        tree = tree_class(individual[:], world_interface=world)
+                    results.append((tree.run_bt(max_ticks=300, fast_forward=fast_forward), \
+                                    world.state, tree.failed, tree.timeout))
+            assert results[1:] == results[:1] * 3
+
+    #Most of the cycles are skipped
+    world = sm.Simulation(seed=0)
+    tree = compiled_bt.CompiledTree(individuals[-1][:], world_interface=world)
+    steps = []
+    send_references = world.send_references
+    world.send_references = lambda: steps.append(send_references())
+    tree.run_bt(max_ticks=2000)
+    assert world.state.tick == 2000
+    assert len(steps) < 500
+
+def test_macro_steps(bt_settings):
+    """ Tests that macro stepping moves gives the same results as ticking every tick """
+    random.seed(6)
+    individuals = [behavior_tree.BT([]).random(random.randint(1, 30)) for _ in range(50)] + \
+                  [tree[:] for tree in benchmark.KITTING_TREES]
+    for individual in individuals:
+        for seed in range(2):
+            results = []
+            for macro in [False, True]:
+                world = sm.Simulation(seed=seed)
+                tree = interface.PyTree(individual[:], behaviors=kitting_behaviors, world_interface=world)
+                results.append((tree.run_bt(macro_steps=macro), world.state, tree.failed, tree.timeout, \
+                                [node.status for node in tree.root.iterate()]))
+            assert results[0] == results[1]
+
+    #The kitting tree moves to delivery with only conditions on carried weight and battery before it
+    tree = interface.PyTree(benchmark.KITTING_TREES[0][:], behaviors=kitting_behaviors, \
+                            world_interface=sm.Simulation(seed=0))
+    tree.world_interface.state.carried_weight = 4
+    tree.step_bt()
+    leaf = tree.get_running_leaf()
+    assert isinstance(leaf, kitting_behaviors.MoveTo)
+    assert tree.get_macro_ticks(leaf, 100) == 2
@@ -0,0 +1,61 @@
+"""
+Tests racing of candidates over seeds
+"""
+import math
+import random
+import simulation.fitness_cache as fitness_cache
+import simulation.gp as gp
+import simulation.notebook_interface as notebook_interface
+import simulation.racing as racing
+
+INDIVIDUAL = ['s(', 'f(', 'battery level > 50?', 's(', 'move to CHARGE1!', 'charge!', ')', ')', \
+                    'f(', 'carried weight > 3?', 's(', 'move to CONVEYOR_LIGHT!', 'pick!', ')', ')', \
+                    'move to DELIVERY!', 'place!', ')']
+
+def test_bounds():
+    """
+    Tests confidence bounds and separation
+    """
+    assert racing.get_bounds([1.0]) == (-math.inf, math.inf)
+    assert racing.get_bounds([1.0, 1.0, 1.0]) == (1.0, 1.0)
+    lower, upper = racing.get_bounds([0.0, 2.0])
+    assert lower < 1.0 < upper
+    assert racing.get_bounds([0.0, 2.0], z=1.0) == (1.0 - 1.0, 1.0 + 1.0)
+
+    bounds = {0: (5.0, 7.0), 1: (3.0, 4.0), 2: (3.5, 4.5)}
+    assert racing.is_separated(bounds, [0, 2, 1], 1)
+    assert not racing.is_separated(bounds, [0, 2, 1], 2)
+    assert racing.is_separated(bounds, [0], 1)
+
+def test_race(bt_settings):
+    """
+    Tests that the race finds the best candidate in a fraction of the episodes of a full evaluation
+    """
+    candidates = [['idle!'], ['s(', 'move to CONVEYOR_LIGHT!', 'pick!', ')'], INDIVIDUAL, ['charge!']]
+    cache = fitness_cache.FitnessCache()
+    environment = notebook_interface.Environment(compiled=True, cache=cache)
+    result = racing.race(candidates, range(40), environment, initial_seeds=4, seeds_per_round=4)
+    assert result.ranking[0] == 2
+    assert result.separated
+    assert result.full_episodes == 160
+    assert result.episodes == sum(len(fitness) for fitness in result.fitness) < result.full_episodes
+    assert result.budget_fraction() < 0.5
+    assert cache.misses == result.episodes
+
+    full = environment.get_fitness_batch(INDIVIDUAL, range(len(result.fitness[2])))
+    assert result.get_mean(2) == full.mean
+
+    #The best of close competitors is the best of the full evaluation
+    random.seed(2)
+    candidates = [INDIVIDUAL] + [gp.mutate(INDIVIDUAL) for _ in range(11)]
+    result = racing.race(candidates, range(40), environment, initial_seeds=4, seeds_per_round=4)
+    full = [environment.get_fitness_batch(candidate, range(40)).mean for candidate in candidates]
+    assert full[result.ranking[0]] == max(full)
+    assert result.budget_fraction() < 0.5
+
+    #Nothing is separated when every candidate is the same
+    result = racing.race([['idle!']] * 3, range(8), environment, initial_seeds=4, seeds_per_round=4, \
+                         discard_fraction=0.0)
+    assert not result.separated
+    assert len(result.ranking) == 3
+    assert result.episodes == result.full_episodes
@@ -0,0 +1,70 @@
+"""
+Tests the episode trace recorder
+"""
+import numpy as np
+import simulation.behaviors as behaviors
+import simulation.compiled_bt as compiled_bt
+import simulation.conveyor_kitting as sm
+import simulation.trace_recorder as trace_recorder
+from simulation.py_trees_interface import PyTree
+
+INDIVIDUAL = ['s(', 'f(', 'battery level > 50?', 's(', 'move to CHARGE1!', 'charge!', ')', ')', \
+                    'f(', 'carried weight > 3?', 's(', 'move to CONVEYOR_LIGHT!', 'pick!', ')', ')', \
+                    'move to DELIVERY!', 'place!', ')']
+
+def run_episode(recorder, seed, fast_forward=False, macro_steps=False):
+    """ Runs one recorded episode and returns the world and tree """
+    world = sm.Simulation(seed=seed)
+    tree = PyTree(INDIVIDUAL[:], behaviors=behaviors, world_interface=world)
+    tree.run_bt(max_ticks=100, fast_forward=fast_forward, macro_steps=macro_steps, recorder=recorder)
+    return world, tree
+
+def test_record(bt_settings):
+    """
+    Tests that every tick is recorded with the state after the tick
+    """
+    recorder = trace_recorder.TraceRecorder()
+    world, tree = run_episode(recorder, seed=0)
+    trace = recorder.get_trace()
+    assert trace.dtype == trace_recorder.TRACE_DTYPE
+    assert len(trace) == 100
+    assert list(trace['tick']) == list(range(1, 101))
+    assert (trace['episode'] == 0).all()
+    assert trace['delivered_light'][-1] == world.state.delivered_light
+    assert trace['blocked_heavy'][-1] == world.state.blocked_heavy
+    assert trace['robot_x'][-1] == world.state.robot_pos.x
+    assert trace['root_status'][-1] == trace_recorder.STATUS_CODES[tree.root.status]
+    assert (np.diff(trace['battery_level']) != 0).any()
+
+    #Active leaves are indices of leaves in the tree string without up nodes
+    names = [node.name for node in trace_recorder.get_nodes(tree.root)]
+    assert {names[leaf] for leaf in trace['active_leaf']} <= {'battery level > 50?', 'move to CHARGE1!', 'charge!', \
+        'carried weight > 3?', 'move to CONVEYOR_LIGHT!', 'pick!', 'move to DELIVERY!', 'place!'}
+    assert names[trace['active_leaf'][0]] == 'move to CONVEYOR_LIGHT!'
+    assert trace['root_status'][0] == compiled_bt.RUNNING
+
+def test_trace_file(bt_settings, tmp_path):
+    """
+    Tests that episodes are appended to the trace file and can be read back memory mapped
+    """
+    path = str(tmp_path / 'trace.bin')
+    with trace_recorder.TraceRecorder(path, flush_interval=30) as recorder:
+        assert len(recorder.get_trace()) == 0
+        run_episode(recorder, seed=0)
+        run_episode(recorder, seed=1)
+    trace = trace_recorder.read_trace(path)
+    assert isinstance(trace, np.memmap)
+    assert len(trace) == 200
+    assert list(np.unique(trace['episode'])) == [0, 1]
+
+    in_memory = trace_recorder.TraceRecorder()
+    run_episode(in_memory, seed=0)
+    assert (trace[:100] == in_memory.get_trace()).all()
+
+    #Appending to an existing file, no ticks are skipped while recording
+    with trace_recorder.TraceRecorder(path) as recorder:
+        world, _ = run_episode(recorder, seed=2, fast_forward=True, macro_steps=True)
+    trace = trace_recorder.read_trace(path)
+    assert len(trace) == 300
+    assert list(trace['tick'][200:]) == list(range(1, 101))
+    assert trace['tick'][-1] == world.state.tick
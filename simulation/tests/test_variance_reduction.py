@@ -0,0 +1,89 @@
+"""
+Tests common random numbers and variance reduction of fitness comparisons
+"""
+import statistics
+import pytest
+import simulation.conveyor_kitting as sm
+import simulation.notebook_interface as notebook_interface
+import simulation.variance_reduction as variance_reduction
+
+INDIVIDUAL = ['s(', 'f(', 'battery level > 50?', 's(', 'move to CHARGE1!', 'charge!', ')', ')', \
+                    'f(', 'carried weight > 3?', 's(', 'move to CONVEYOR_LIGHT!', 'pick!', ')', ')', \
+                    'move to DELIVERY!', 'place!', ')']
+
+def count_spawns(schedule, spawn):
+    """ Returns the number of ticks in schedule with the spawn bit set """
+    return sum(1 for spawns in schedule if spawns & spawn)
+
+def test_schedules():
+    """
+    Tests the spawn schedules of each method
+    """
+    assert variance_reduction.get_binomial_quantile(10, 0.5, 0.0) == 0
+    assert variance_reduction.get_binomial_quantile(10, 0.5, 0.5) == 5
+    assert variance_reduction.get_binomial_quantile(10, 0.5, 0.9999) == 10
+
+    assert variance_reduction.get_spawn_schedules([3, 4], 'crn', 100) == \
+        [sm.get_spawn_schedule(3, 100), sm.get_spawn_schedule(4, 100)]
+
+    schedule, antithetic = variance_reduction.get_spawn_schedules([3, 4], 'antithetic', 500)
+    assert schedule == sm.get_spawn_schedule(3, 500)
+    assert len(antithetic) == 500
+    #Arrivals are unlikely, so the antithetic schedule never has them on the same ticks
+    for spawn in [sm.SPAWN_HEAVY, sm.SPAWN_LIGHT]:
+        assert count_spawns(antithetic, spawn) > 0
+        assert not any(a & b & spawn for a, b in zip(schedule, antithetic))
+    with pytest.raises(ValueError):
+        variance_reduction.get_spawn_schedules([3, 4, 5], 'antithetic')
+
+    schedules = variance_reduction.get_spawn_schedules(range(10), 'stratified', 200)
+    assert schedules == variance_reduction.get_spawn_schedules(range(10), 'stratified', 200)
+    heavy = [count_spawns(schedule, sm.SPAWN_HEAVY) for schedule in schedules]
+    light = [count_spawns(schedule, sm.SPAWN_LIGHT) for schedule in schedules]
+    assert heavy == sorted(heavy)
+    assert light != sorted(light)
+    assert abs(sum(heavy) / 10 - 200 * sm.HEAVY_SPAWN_PROBABILITY) < 2
+    assert abs(sum(light) / 10 - 200 * sm.LIGHT_SPAWN_PROBABILITY) < 3
+
+def test_evaluate(bt_settings):
+    """
+    Tests that candidates are compared on common schedules with lower variance than independent ones
+    """
+    variant = INDIVIDUAL[:]
+    variant[2] = 'battery level > 30?'
+    candidates = [INDIVIDUAL, variant, ['idle!']]
+    environment = notebook_interface.Environment(compiled=True)
+    evaluation = variance_reduction.evaluate(candidates, range(20), environment=environment)
+    assert evaluation.fitness[0] == environment.get_fitness_batch(INDIVIDUAL, range(20)).fitness
+    assert evaluation.get_ranking()[-1] == 2
+    assert evaluation.get_difference_variance(0, 1) < evaluation.get_independent_variance(0, 1)
+    assert evaluation.variance_reduction() > 1.0
+
+    for method in ['antithetic', 'stratified']:
+        evaluation = variance_reduction.evaluate(candidates, range(20), method, environment=environment)
+        assert len(evaluation.fitness[0]) == 20
+        assert evaluation.get_ranking()[-1] == 2
+        assert evaluation.variance_reduction() > 1.0
+        assert evaluation.method in str(evaluation)
+
+def test_replicates(bt_settings):
+    """
+    Tests that the mean difference between two similar candidates varies less over replicates on common
+    schedules than on independent ones, and that evaluations estimate that variance
+    """
+    variant = INDIVIDUAL[:]
+    variant[2] = 'battery level > 30?'
+    environment = notebook_interface.Environment(compiled=True)
+    common = []
+    independent = []
+    estimates = []
+    for replicate in range(30):
+        seeds = range(20 * replicate, 20 * replicate + 10)
+        evaluation = variance_reduction.evaluate([INDIVIDUAL, variant], seeds, max_ticks=100, environment=environment)
+        means = evaluation.get_means()
+        common.append(means[0] - means[1])
+        estimates.append(evaluation.get_difference_variance(0, 1))
+        other_seeds = range(20 * replicate + 10, 20 * replicate + 20)
+        independent.append(means[0] - environment.get_fitness_batch(variant, other_seeds, max_ticks=100).mean)
+    assert statistics.variance(common) < statistics.variance(independent) / 2
+    assert statistics.variance(common) / 2 < statistics.mean(estimates) < 2 * statistics.variance(common)
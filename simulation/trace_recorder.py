@@ -0,0 +1,122 @@
+"""
+Recording of per tick episode traces in a compact binary format.
+Every record has the same width, so trace files can be appended to while recording
+and read back by memory mapping without parsing.
+"""
+from operator import attrgetter
+import os
+import numpy as np
+import py_trees as pt
+import simulation.compiled_bt as compiled_bt
+
+TRACE_DTYPE = np.dtype([('episode', np.int32),
+                        ('tick', np.int32),
+                        ('battery_level', np.int16),
+                        ('carried_weight', np.int16),
+                        ('carried_light', np.int16),
+                        ('carried_heavy', np.int16),
+                        ('cnv_n_light', np.int16),
+                        ('cnv_n_heavy', np.int16),
+                        ('delivered_heavy', np.int32),
+                        ('delivered_light', np.int32),
+                        ('blocked_heavy', np.int32),
+                        ('blocked_light', np.int32),
+                        ('robot_x', np.float32),
+                        ('robot_y', np.float32),
+                        ('active_leaf', np.int16),
+                        ('root_status', np.int8)])
+"""
+Layout of one record. active_leaf is the index of the leaf reached by following the current
+children from the root, counting nodes in the order of the tree string, or -1 if there is none.
+root_status uses the status codes of compiled_bt.
+"""
+
+STATUS_CODES = {pt.common.Status.INVALID: compiled_bt.INVALID,
+                pt.common.Status.SUCCESS: compiled_bt.SUCCESS,
+                pt.common.Status.FAILURE: compiled_bt.FAILURE,
+                pt.common.Status.RUNNING: compiled_bt.RUNNING}
+
+get_state_values = attrgetter('tick', 'battery_level', 'carried_weight', 'carried_light', 'carried_heavy', \
+                              'cnv_n_light', 'cnv_n_heavy', 'delivered_heavy', 'delivered_light', \
+                              'blocked_heavy', 'blocked_light')
+
+def get_nodes(node):
+    """ Returns node and all nodes below it in the order of the tree string """
+    nodes = []
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        stack.extend(reversed(node.children))
+    return nodes
+
+def read_trace(path):
+    """
+    Returns the records of a trace file as a read only memory mapped array of TRACE_DTYPE
+    """
+    if os.path.getsize(path) == 0:
+        #Empty files can not be memory mapped
+        return np.zeros(0, dtype=TRACE_DTYPE)
+    return np.memmap(path, dtype=TRACE_DTYPE, mode='r')
+
+class TraceRecorder:
+    """
+    Records the world state, active leaf and root status after every tick of PyTree.run_bt.
+    Records are buffered as tuples and, if a path is given, appended to that file every
+    flush_interval records. Without a path all records are kept and returned by get_trace.
+    PyTree.run_bt neither fast forwards nor takes macro steps while recording, so every tick is recorded.
+    """
+    def __init__(self, path=None, flush_interval=10000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.file = open(path, 'ab') if path is not None else None
+        self.buffer = []
+        self.episode = -1
+        self.leaf_index = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def start(self, tree, episode=None):
+        """
+        Starts recording a new episode of tree, numbered after the previous one unless given
+        """
+        self.episode = self.episode + 1 if episode is None else episode
+        self.leaf_index = {node: index for index, node in enumerate(get_nodes(tree.root)) if not node.children}
+
+    def record(self, tree):
+        """ Records the state after a tick of tree """
+        node = tree.root
+        while node.children and node.current_child is not None:
+            node = node.current_child
+        robot_pos = tree.world_interface.state.robot_pos
+        self.buffer.append((self.episode,) + get_state_values(tree.world_interface.state) + \
+                           (robot_pos.x, robot_pos.y, self.leaf_index.get(node, -1), STATUS_CODES[tree.root.status]))
+        if self.file is not None and len(self.buffer) >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """ Appends the buffered records to the trace file """
+        if self.file is not None and self.buffer:
+            np.array(self.buffer, dtype=TRACE_DTYPE).tofile(self.file)
+            self.file.flush()
+            self.buffer = []
+
+    def get_trace(self):
+        """
+        Returns all records as an array of TRACE_DTYPE, memory mapped from the file if there is one
+        """
+        if self.path is None:
+            return np.array(self.buffer, dtype=TRACE_DTYPE)
+        self.flush()
+        return read_trace(self.path)
+
+    def close(self):
+        """ Writes the remaining records and closes the trace file """
+        if self.file is not None:
+            self.flush()
+            self.file.close()
+            self.file = None
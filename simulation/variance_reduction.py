@@ -0,0 +1,163 @@
+"""
+Lower variance comparisons of behavior trees.
+All candidates are run on the same spawn schedule for each seed index, common random numbers,
+so that differences in fitness come from the trees and not from the arrivals on the conveyors.
+The schedules can also be drawn as antithetic pairs or stratified on the number of arrivals.
+"""
+from dataclasses import dataclass
+import math
+import random
+import statistics
+import simulation.conveyor_kitting as sm
+import simulation.notebook_interface as notebook_interface
+
+METHODS = ('crn', 'antithetic', 'stratified')
+"""
+crn: the usual schedule of each seed.
+antithetic: pairs of seed indices share one sequence of random numbers, where the second of the pair
+            has arrivals when the first is unlikely to and the other way around.
+stratified: the numbers of heavy and light arrivals in each episode are drawn from equally likely strata
+            of their distributions, in a latin hypercube over the seed indices, at uniformly random ticks.
+"""
+
+def get_binomial_quantile(n, p, q):
+    """ Returns the smallest k where the probability of at most k successes in n trials of probability p is q """
+    cumulative = 0.0
+    for k in range(n + 1):
+        cumulative += math.comb(n, k) * p ** k * (1.0 - p) ** (n - k)
+        if cumulative >= q:
+            return k
+    return n
+
+def make_antithetic_schedules(seed, length):
+    """
+    Returns a pair of spawn schedules from the random numbers of seed,
+    the first of them the same as conveyor_kitting.get_spawn_schedule
+    """
+    rng = random.Random(seed)
+    schedule = bytearray(length)
+    antithetic = bytearray(length)
+    for i in range(length):
+        draw = rng.random()
+        if draw < sm.HEAVY_SPAWN_PROBABILITY:
+            schedule[i] |= sm.SPAWN_HEAVY
+        if 1.0 - draw < sm.HEAVY_SPAWN_PROBABILITY:
+            antithetic[i] |= sm.SPAWN_HEAVY
+        draw = rng.random()
+        if draw < sm.LIGHT_SPAWN_PROBABILITY:
+            schedule[i] |= sm.SPAWN_LIGHT
+        if 1.0 - draw < sm.LIGHT_SPAWN_PROBABILITY:
+            antithetic[i] |= sm.SPAWN_LIGHT
+    return bytes(schedule), bytes(antithetic)
+
+def make_stratified_schedules(seeds, length):
+    """
+    Returns one spawn schedule for each seed, where the number of heavy arrivals of seed index i
+    is drawn from the i:th of len(seeds) equally likely strata and light arrivals from a shuffled stratum
+    """
+    strata = list(range(len(seeds)))
+    random.Random(repr(tuple(seeds))).shuffle(strata)
+    schedules = []
+    for i, seed in enumerate(seeds):
+        rng = random.Random(seed)
+        n_heavy = get_binomial_quantile(length, sm.HEAVY_SPAWN_PROBABILITY, (i + rng.random()) / len(seeds))
+        n_light = get_binomial_quantile(length, sm.LIGHT_SPAWN_PROBABILITY, (strata[i] + rng.random()) / len(seeds))
+        schedule = bytearray(length)
+        for tick in rng.sample(range(length), n_heavy):
+            schedule[tick] |= sm.SPAWN_HEAVY
+        for tick in rng.sample(range(length), n_light):
+            schedule[tick] |= sm.SPAWN_LIGHT
+        schedules.append(bytes(schedule))
+    return schedules
+
+def get_spawn_schedules(seeds, method='crn', length=sm.EPISODE_LENGTH):
+    """
+    Returns the spawn schedule of each seed index for the given method, see METHODS.
+    Antithetic pairs are made from the first seed of each pair, and need an even number of seeds.
+    Episodes running past length continue with random arrivals from their seed.
+    """
+    seeds = list(seeds)
+    if method == 'crn':
+        return [sm.get_spawn_schedule(seed, length) for seed in seeds]
+    if method == 'antithetic':
+        if len(seeds) % 2 != 0:
+            raise ValueError('Antithetic schedules need an even number of seeds')
+        return [schedule for seed in seeds[::2] for schedule in make_antithetic_schedules(seed, length)]
+    if method == 'stratified':
+        return make_stratified_schedules(seeds, length)
+    raise ValueError('Unknown method: ' + str(method))
+
+@dataclass
+class Evaluation:
+    """
+    Fitness of candidates evaluated on the same spawn schedules, fitness[candidate][seed index]
+    """
+    method: str
+    fitness: list
+
+    def get_means(self):
+        """ Returns the mean fitness of each candidate """
+        return [statistics.mean(fitness) for fitness in self.fitness]
+
+    def get_ranking(self):
+        """ Returns the indices of the candidates with the best mean fitness first """
+        means = self.get_means()
+        return sorted(range(len(means)), key=lambda i: means[i], reverse=True)
+
+    def get_difference_variance(self, first, second):
+        """
+        Returns the estimated variance of the difference in mean fitness of two candidates.
+        Antithetic pairs are averaged before estimating. Stratified episodes are estimated in pairs
+        of neighbouring strata, which overestimates the variance.
+        """
+        differences = [a - b for a, b in zip(self.fitness[first], self.fitness[second])]
+        if self.method == 'antithetic':
+            pairs = [(differences[i] + differences[i + 1]) / 2 for i in range(0, len(differences), 2)]
+            return statistics.variance(pairs) / len(pairs)
+        if self.method == 'stratified':
+            return sum((differences[i] - differences[i + 1]) ** 2 for i in range(0, len(differences) - 1, 2)) / \
+                   (2 * (len(differences) // 2) * len(differences))
+        return statistics.variance(differences) / len(differences)
+
+    def get_independent_variance(self, first, second):
+        """
+        Returns the estimated variance of the difference in mean fitness of two candidates
+        if each had been run on its own independently drawn spawn schedules
+        """
+        return (statistics.variance(self.fitness[first]) + statistics.variance(self.fitness[second])) / \
+               len(self.fitness[first])
+
+    def variance_reduction(self):
+        """
+        Returns how many times lower the variance of differences between candidates is than with
+        independent schedules, summed over all pairs of candidates.
+        Candidates that behave alike gain the most, for candidates that behave differently it can be close to one.
+        """
+        pairs = [(first, second) for first in range(len(self.fitness)) \
+                 for second in range(first + 1, len(self.fitness))]
+        independent = sum(self.get_independent_variance(*pair) for pair in pairs)
+        reduced = sum(self.get_difference_variance(*pair) for pair in pairs)
+        if reduced == 0.0:
+            return math.inf if independent > 0.0 else 1.0
+        return independent / reduced
+
+    def __str__(self):
+        return "method: %s episodes: %d variance reduction: %.2f" % \
+            (self.method, sum(len(fitness) for fitness in self.fitness), self.variance_reduction())
+
+def evaluate(candidates, seeds, method='crn', max_ticks=200, environment=None):
+    """
+    Runs every candidate on the spawn schedule of each seed index for the given method,
+    and returns an Evaluation. Needs at least two seeds.
+    With crn, the episodes are the usual seeded ones and may be taken from a cache in the environment.
+    """
+    if environment is None:
+        environment = notebook_interface.Environment(compiled=True)
+    seeds = list(seeds)
+    if method == 'crn':
+        schedules = [None] * len(seeds)
+    else:
+        schedules = get_spawn_schedules(seeds, method, max_ticks)
+    fitness = [[environment.get_fitness(candidate, max_ticks=max_ticks, seed=seed, spawn_schedule=schedule) \
+                for seed, schedule in zip(seeds, schedules)] for candidate in candidates]
+    return Evaluation(method, fitness)